@@ -0,0 +1,234 @@
+"""
+ASGI entry point
+
+    uvicorn api.asgi:application --workers 4
+
+The read endpoints the app polls most (home.dashboard, habits.get,
+moods.today) are served on the event loop with api/database_async.py, so
+their queries are awaited together instead of holding a thread each while
+they wait on the database. Every other route goes to the Flask app
+(api/index.py) through asgiref's WSGI adapter, unchanged.
+"""
+import asyncio
+import os
+from urllib.parse import parse_qs
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+from api import database_async as db
+from api import metrics
+from api.database import cache, user_scopes, verify_token as verify_access_token
+from api.index import app
+from api.routes.auth import PROFILE_COLUMNS
+from api.routes.habits import current_habits
+from api.routes.home import DASHBOARD_CACHE_TTL, check_dashboard_user, dashboard_payload, status_or_default
+from api.routes.moods import with_utc_suffix
+from api.routes.plant import new_plant
+from api.warmup import warm_up
+
+# Loaders: the async twins of load_status, load_mood, load_habits and load_plant
+
+async def load_status(user_id, date):
+    result = await db.select(
+        'home_status',
+        filters={'user_id': int(user_id), 'date': date},
+        single=True
+    )
+    return status_or_default(result)
+
+async def load_mood(user_id, date):
+    result = await db.select(
+        'daily_moods',
+        filters={'user_id': int(user_id), 'date': date},
+        single=True
+    )
+    return with_utc_suffix(result)
+
+async def load_habits(user_id, frequency=None):
+    filters = {'user_id': int(user_id)}
+    if frequency:
+        filters['frequency'] = frequency
+    return current_habits(await db.select('habits', filters=filters))
+
+async def load_plant(user_id):
+    plant = await db.select(
+        'plant_progress',
+        filters={'user_id': int(user_id)},
+        single=True
+    )
+    if not plant:
+        # Auto-create plant row (a concurrent request may have won the race)
+        plant = new_plant(user_id)
+        await db.upsert('plant_progress', plant, on_conflict=['user_id'], ignore_duplicates=True)
+    return plant
+
+async def load_dashboard(user, date):
+    user_id = user['id']
+    status, mood, habits, plant = await asyncio.gather(
+        load_status(user_id, date),
+        load_mood(user_id, date),
+        load_habits(user_id),
+        load_plant(user_id)
+    )
+    return dashboard_payload({
+        'status': status,
+        'mood': mood,
+        'habits': habits,
+        'plant': plant,
+        'user': user
+    })
+
+async def current_user(headers):
+    """
+    The verified user of the Authorization header, like the verify_token decorator
+
+    Returns:
+        (user, None), or (None, (status, body)) to respond with
+    """
+    token = headers.get('authorization')
+    if not token:
+        return None, (401, {'error': 'No token provided'})
+    if token.startswith('Bearer '):
+        token = token[7:]
+    # Verified locally when possible; the remote check would block the loop
+    user = await asyncio.to_thread(verify_access_token, token)
+    if not user:
+        return None, (401, {'error': 'Invalid token'})
+    return user, None
+
+# Routes: (status, JSON body) from the query string arguments and the
+# request headers (lowercase names)
+
+async def get_dashboard(args, headers):
+    """Get everything the home screen needs in one call (requires authentication)"""
+    auth_user, error = await current_user(headers)
+    if error:
+        return error
+    try:
+        date = args.get('date')  # Expected format: yyyy-MM-dd
+
+        if not date:
+            return 400, {'error': 'date required'}
+
+        user = await db.select(
+            'users',
+            columns=PROFILE_COLUMNS,
+            filters={'auth_id': str(auth_user.user.id)},
+            single=True
+        )
+        error = check_dashboard_user(user, args.get('userId'))
+        if error:
+            return error[0], {'error': error[1]}
+
+        dashboard = await cache.aget_or_load(
+            f"dashboard:{user['id']}:{date}",
+            lambda: load_dashboard(user, date),
+            scopes=user_scopes(user['id']),
+            ttl=DASHBOARD_CACHE_TTL
+        )
+
+        return 200, {'success': True, **dashboard}
+
+    except Exception as e:
+        print(f"Error in get_dashboard: {e}")
+        return 500, {'error': str(e)}
+
+async def get_habits(args, headers):
+    """Get all habits for a user with pending period resets applied"""
+    try:
+        user_id = args.get('userId')
+
+        if not user_id:
+            return 400, {'error': 'userId required'}
+
+        return 200, {'success': True, 'habits': await load_habits(user_id, args.get('frequency'))}
+
+    except Exception as e:
+        print(f"Error in get_habits: {e}")
+        return 500, {'error': str(e)}
+
+async def get_today_mood(args, headers):
+    """Get mood for a specific date"""
+    try:
+        user_id = args.get('userId')
+        date = args.get('date')  # Expected format: yyyy-MM-dd
+
+        if not user_id or not date:
+            return 400, {'error': 'userId and date required'}
+
+        return 200, {'success': True, 'mood': await load_mood(user_id, date)}
+
+    except Exception as e:
+        print(f"Error in get_today_mood: {e}")
+        return 500, {'error': str(e)}
+
+ROUTES = {
+    '/home.dashboard': get_dashboard,
+    '/habits.get': get_habits,
+    '/moods.today': get_today_mood,
+}
+
+# Flask requests handled at once (the default matches asyncio's default executor)
+FLASK_THREADS = int(os.getenv('ASGI_FLASK_THREADS', str(min(32, (os.cpu_count() or 1) + 4))))
+
+class _Flask(WsgiToAsgi):
+    """
+    WsgiToAsgi with the Flask requests spread over threads
+
+    asgiref runs every WSGI call on one shared thread by default; a
+    ThreadSensitiveContext per request gives each its own thread instead,
+    and at most FLASK_THREADS of them run at once.
+    """
+
+    def __init__(self, wsgi_application):
+        super().__init__(wsgi_application)
+        self._slots = asyncio.Semaphore(FLASK_THREADS)
+
+    async def __call__(self, scope, receive, send):
+        async with self._slots, ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+flask_application = _Flask(app)
+
+async def _send_json(send, status, body):
+    payload = app.json.dumps(body, separators=(',', ':')).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+            (b'access-control-allow-origin', b'*'),
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if os.getenv('WARM_UP') == '1':
+                try:
+                    print(f"Warm-up: {await asyncio.to_thread(warm_up)}")
+                except Exception as e:
+                    print(f"Warm-up failed: {e}")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    route = ROUTES.get(scope['path']) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+    if route is None:
+        return await flask_application(scope, receive, send)
+
+    request_metrics = metrics.begin_request(scope['path'])
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True)
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+    status, body = await route({key: values[0] for key, values in query.items()}, headers)
+    await _send_json(send, status, body)
+    metrics.end_request(request_metrics, 'GET', status)
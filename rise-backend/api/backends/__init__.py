@@ -0,0 +1,91 @@
+"""
+Storage backends behind api/database.py
+
+Every backend implements the same contract as the helpers in api/database.py
+(select, insert, upsert, update, delete, increment, rpc) and exposes an `auth`
+object with the subset of the Supabase auth API the routes use.
+async_backend() returns a view of the same storage with coroutine methods
+(api/database_async.py).
+
+api/database.py holds a LazyBackend: the backend module is imported and the
+backend built on first use, not at import time (cold starts).
+"""
+import threading
+
+# Filter keys are either a plain column name (equality) or
+# "<column>__<op>", e.g. {'date__gte': '2026-01-01', 'id__in': [1, 2]}.
+# "is" compares against NULL/true/false: {'deleted_at__is': None}
+FILTER_OPS = ('eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'in', 'is')
+
+BACKENDS = ('supabase', 'memory')
+
+def split_filter_key(key: str):
+    """Split a filter key into (column, operator)"""
+    column, sep, op = key.rpartition('__')
+    if sep and op in FILTER_OPS:
+        return column, op
+    return key, 'eq'
+
+def split_order(order):
+    """Normalize order ("column", "-column" or a list of those) to [(column, desc)]"""
+    if not order:
+        return []
+    if isinstance(order, str):
+        order = [order]
+    return [(c[1:], True) if c.startswith('-') else (c, False) for c in order]
+
+def create_backend(name: str):
+    """Create the storage backend called name ("supabase" or "memory")"""
+    if name == 'supabase':
+        from .supabase_backend import SupabaseBackend
+        return SupabaseBackend()
+    if name == 'memory':
+        from .memory_backend import MemoryBackend
+        return MemoryBackend()
+    raise RuntimeError(
+        f"Unknown DB_BACKEND '{name}' (expected one of: {', '.join(BACKENDS)})"
+    )
+
+class LazyBackend:
+    """
+    Stand-in for the backend called name that creates it on first use
+
+    Importing supabase and building its client is most of a cold start,
+    and requests that never reach the database should not pay for it.
+    """
+
+    def __init__(self, name: str):
+        if name not in BACKENDS:
+            raise RuntimeError(
+                f"Unknown DB_BACKEND '{name}' (expected one of: {', '.join(BACKENDS)})"
+            )
+        self.name = name
+        self.auth = _LazyAuth(self)
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        return self._backend is not None
+
+    def get(self):
+        """The backend itself (created now if needed)"""
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = create_backend(self.name)
+        return self._backend
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+
+class _LazyAuth:
+    """Auth API of a LazyBackend, resolved on first use"""
+
+    def __init__(self, backend: LazyBackend):
+        self._backend = backend
+
+    def __getattr__(self, attr):
+        return getattr(self._backend.get().auth, attr)
+
@@ -0,0 +1,527 @@
+"""
+In-process stand-in for the Supabase project
+
+Tables live in Python dicts guarded by a single lock, with hash indexes on the
+columns the routes filter by. Good enough to run the Flask app without network
+(local load testing, benchmarks), not a database.
+
+MEMORY_BACKEND_LATENCY_MS adds a sleep before every data call (outside the
+lock), standing in for the network round trip to a real database so that
+benchmarks show how the server overlaps waiting requests.
+"""
+import functools
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
+
+import jwt
+
+from . import split_filter_key, split_order
+from ..search import SearchIndex, highlight
+
+# Secondary indexes created for every table (rows are always indexed by id)
+DEFAULT_INDEXES = (
+    ('user_id',),
+    ('user_id', 'date'),
+    ('user_id', 'title'),
+)
+
+# Column defaults mirroring the ones set in migrations/
+COLUMN_DEFAULTS = {
+    'home_status': {'water_count': 0, 'water_goal': 8, 'detox_progress': 0.0},
+}
+
+# Columns update_habit_states sets (migrations/014_update_habit_states.sql)
+HABIT_STATE_COLUMNS = ('status', 'streak_count', 'best_streak', 'is_task', 'last_updated', 'last_completed_date')
+
+# Columns update_journal_entries sets (migrations/016_update_journal_entries.sql)
+JOURNAL_CHANGE_COLUMNS = (
+    'text', 'title', 'mood', 'voice_path', 'background_image', 'font_family', 'text_color',
+    'font_size', 'attached_images', 'stickers', 'excerpt', 'thumbnail'
+)
+
+def _now_iso():
+    # Like a Postgres "timestamp" column: UTC without offset
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+def _key(value):
+    """Index key for a value; ints and numeric strings index the same way"""
+    return None if value is None else str(value)
+
+def _coerce(value, like):
+    """Coerce a filter value to the type of the stored value (like PostgREST does)"""
+    if value is None or like is None or type(value) is type(like):
+        return value
+    try:
+        if isinstance(like, bool):
+            return str(value).lower() in ('true', 't', '1')
+        if isinstance(like, int):
+            return int(value)
+        if isinstance(like, float):
+            return float(value)
+        if isinstance(like, str):
+            return str(value)
+    except (TypeError, ValueError):
+        pass
+    return value
+
+def _matches(row, column, op, value):
+    stored = row.get(column)
+    if op == 'in':
+        return any(stored == _coerce(v, stored) for v in value)
+    if op == 'is':
+        return stored is None if value is None else stored is _coerce(value, True)
+    if op == 'eq':
+        return stored == _coerce(value, stored)
+    if op == 'neq':
+        return stored is not None and stored != _coerce(value, stored)
+    # Range comparisons never match NULL, as in SQL
+    if stored is None or value is None:
+        return False
+    value = _coerce(value, stored)
+    if op == 'gt':
+        return stored > value
+    if op == 'gte':
+        return stored >= value
+    if op == 'lt':
+        return stored < value
+    if op == 'lte':
+        return stored <= value
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+def _matches_all(row, filters):
+    for key, value in (filters or {}).items():
+        column, op = split_filter_key(key)
+        if not _matches(row, column, op, value):
+            return False
+    return True
+
+def _parse_columns(columns):
+    if not columns or columns.strip() == '*':
+        return None
+    return [c.strip() for c in columns.split(',') if c.strip()]
+
+def _project(row, columns):
+    if columns is None:
+        return dict(row)
+    return {c: row.get(c) for c in columns}
+
+def _sort_rows(rows, order):
+    # Stable multi-key sort: apply keys from last to first; NULLs sort last
+    for column, desc in reversed(split_order(order)):
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=desc)
+        rows = present + missing
+    return rows
+
+
+class _Table:
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+        self.next_id = 1
+        self.indexes = {}
+        for columns in DEFAULT_INDEXES:
+            self.add_index(columns)
+
+    def add_index(self, columns):
+        columns = tuple(columns)
+        if columns in self.indexes:
+            return self.indexes[columns]
+        index = {}
+        for row_id, row in self.rows.items():
+            index.setdefault(self._index_key(row, columns), set()).add(row_id)
+        self.indexes[columns] = index
+        return index
+
+    @staticmethod
+    def _index_key(row, columns):
+        return tuple(_key(row.get(c)) for c in columns)
+
+    def _index_row(self, row):
+        for columns, index in self.indexes.items():
+            index.setdefault(self._index_key(row, columns), set()).add(row['id'])
+
+    def _unindex_row(self, row):
+        for columns, index in self.indexes.items():
+            key = self._index_key(row, columns)
+            ids = index.get(key)
+            if ids:
+                ids.discard(row['id'])
+                if not ids:
+                    del index[key]
+
+    def candidates(self, filters):
+        """Row ids worth scanning for filters, using the most selective index"""
+        eq = {}
+        for key, value in (filters or {}).items():
+            column, op = split_filter_key(key)
+            if op == 'eq':
+                eq[column] = value
+            elif op == 'in' and column == 'id':
+                return [_coerce(v, 0) for v in value]
+
+        if 'id' in eq:
+            return [_coerce(eq['id'], 0)]
+
+        best = None
+        for columns in self.indexes:
+            if all(c in eq for c in columns) and (best is None or len(columns) > len(best)):
+                best = columns
+        if best is None:
+            return list(self.rows)
+        key = tuple(_key(eq[c]) for c in best)
+        return list(self.indexes[best].get(key, ()))
+
+    def find(self, filters, or_filters=None):
+        rows = []
+        for row_id in self.candidates(filters):
+            row = self.rows.get(row_id)
+            if row is None or not _matches_all(row, filters):
+                continue
+            if or_filters and not any(_matches_all(row, f) for f in or_filters):
+                continue
+            rows.append(row)
+        rows.sort(key=lambda r: r['id'])
+        return rows
+
+    def insert(self, data):
+        row = {'created_at': _now_iso()}
+        row.update(COLUMN_DEFAULTS.get(self.name, {}))
+        row.update(data)
+        if row.get('id') is None:
+            row['id'] = self.next_id
+        self.next_id = max(self.next_id, int(row['id']) + 1)
+        if row['id'] in self.rows:
+            raise Exception(f"duplicate key value violates unique constraint \"{self.name}_pkey\"")
+        self.rows[row['id']] = row
+        self._index_row(row)
+        return row
+
+    def update(self, row, data):
+        self._unindex_row(row)
+        row.update(data)
+        self._index_row(row)
+        return row
+
+    def delete(self, row):
+        self._unindex_row(row)
+        del self.rows[row['id']]
+
+
+def _round_trip(method):
+    """Wait the simulated latency before a data call (the async view awaits it instead)"""
+    @functools.wraps(method)
+    def call(self, *args, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return method(self, *args, **kwargs)
+    return call
+
+
+class MemoryBackend:
+    """Pure in-memory engine implementing the api/database.py contract"""
+
+    def __init__(self):
+        # Seconds of simulated round trip per data call
+        self.latency = float(os.getenv('MEMORY_BACKEND_LATENCY_MS', '0')) / 1000
+        self._lock = threading.RLock()
+        self._tables = {}
+        self._search_indexes = {}  # user_id -> SearchIndex of their journals
+        self.auth = MemoryAuth()
+
+    def async_backend(self):
+        return AsyncMemoryBackend(self)
+
+    def table(self, name):
+        with self._lock:
+            if name not in self._tables:
+                self._tables[name] = _Table(name)
+            return self._tables[name]
+
+    @_round_trip
+    def select(self, table, columns="*", filters=None, single=False,
+               order=None, limit=None, offset=None, count=False, or_filters=None):
+        with self._lock:
+            rows = self.table(table).find(filters, or_filters)
+            if count:
+                return len(rows)
+            rows = _sort_rows(rows, order)
+            if offset:
+                rows = rows[offset:]
+            if single:
+                limit = 1
+            if limit is not None:
+                rows = rows[:limit]
+            cols = _parse_columns(columns)
+            rows = [_project(r, cols) for r in rows]
+        return (rows[0] if rows else None) if single else rows
+
+    @_round_trip
+    def insert(self, table, data):
+        with self._lock:
+            t = self.table(table)
+            records = data if isinstance(data, list) else [data]
+            return [dict(t.insert(dict(r))) for r in records]
+
+    @_round_trip
+    def upsert(self, table, data, on_conflict, ignore_duplicates=False):
+        with self._lock:
+            t = self.table(table)
+            index = t.add_index(on_conflict)
+            result = []
+            for record in (data if isinstance(data, list) else [data]):
+                key = tuple(_key(record.get(c)) for c in on_conflict)
+                existing = [t.rows[i] for i in index.get(key, ())]
+                if not existing:
+                    result.append(dict(t.insert(dict(record))))
+                elif not ignore_duplicates:
+                    result.append(dict(t.update(existing[0], record)))
+            return result
+
+    @_round_trip
+    def update(self, table, data, filters):
+        with self._lock:
+            t = self.table(table)
+            return [dict(t.update(row, dict(data))) for row in t.find(filters)]
+
+    @_round_trip
+    def delete(self, table, filters):
+        with self._lock:
+            t = self.table(table)
+            rows = t.find(filters)
+            for row in rows:
+                t.delete(row)
+            return [dict(r) for r in rows]
+
+    @_round_trip
+    def increment(self, table, column, filters, delta=1, floor=None, upsert=False, minimum=None):
+        if upsert and minimum is not None:
+            raise Exception("increment_counter: p_min cannot be combined with p_upsert")
+
+        def incremented(value):
+            value = (value or 0) + delta
+            return value if floor is None else max(value, floor)
+
+        with self._lock:
+            t = self.table(table)
+            rows = t.find(filters)
+            if minimum is not None:
+                rows = [row for row in rows if incremented(row.get(column)) >= minimum]
+            if not rows:
+                if not upsert:
+                    return None
+                return t.insert({**filters, column: incremented(None)})[column]
+            for row in rows:
+                t.update(row, {column: incremented(row.get(column))})
+            return rows[0][column]
+
+
+    @_round_trip
+    def rpc(self, name, params):
+        functions = {
+            'search_journals': self._search_journals,
+            'update_habit_states': self._update_habit_states,
+            'update_journal_entries': self._update_journal_entries
+        }
+        if name not in functions:
+            raise Exception(f"Could not find the function public.{name}")
+        with self._lock:
+            return functions[name](**params)
+
+    def _search_journals(self, p_user_id, p_query, p_limit=20, p_offset=0):
+        """Same contract as search_journals in migrations/009_journal_search.sql"""
+        rows = {
+            r['id']: r
+            for r in self.table('journals').find({'user_id': p_user_id, 'deleted_at__is': None})
+        }
+        # Per-user index, brought up to date by updated_at like the GIN index
+        # is by the generated column
+        index = self._search_indexes.setdefault(_key(p_user_id), SearchIndex(None))
+        for doc_id in [d for d in index.versions if d not in rows]:
+            index.remove(doc_id)
+        for doc_id, row in rows.items():
+            if doc_id not in index.versions or index.versions[doc_id] != row.get('updated_at'):
+                index.add(doc_id, [(row.get('title'), 2), (row.get('text'), 1)], version=row.get('updated_at'))
+
+        matches = index.search(p_query, p_offset + p_limit)[p_offset:]
+        columns = ('id', 'date', 'time', 'mood', 'title', 'excerpt', 'thumbnail')
+        return [
+            {
+                **{c: rows[doc_id].get(c) for c in columns},
+                'rank': score,
+                'snippet': highlight(rows[doc_id].get('text') or rows[doc_id].get('title'), p_query)
+            }
+            for doc_id, score in matches
+        ]
+
+    def _update_habit_states(self, p_states):
+        """Same contract as update_habit_states in migrations/014_update_habit_states.sql"""
+        t = self.table('habits')
+        written = []
+        for state in p_states:
+            for row in t.find({'id': state['id']}):
+                t.update(row, {c: state.get(c) for c in HABIT_STATE_COLUMNS})
+                written.append({'id': row['id'], 'user_id': row.get('user_id')})
+        return written
+
+    def _update_journal_entries(self, p_changes):
+        """Same contract as update_journal_entries in migrations/016_update_journal_entries.sql"""
+        t = self.table('journals')
+        written = []
+        for change in p_changes:
+            for row in t.find({'id': change['id'], 'user_id': change['user_id'], 'deleted_at__is': None}):
+                # Stamped like the trigger from migrations/011 does
+                data = {c: change.get(c) for c in JOURNAL_CHANGE_COLUMNS}
+                data['updated_at'] = datetime.now(timezone.utc).isoformat()
+                t.update(row, data)
+                written.append({'id': row['id'], 'user_id': row.get('user_id')})
+        return written
+
+
+class AsyncMemoryBackend:
+    """Coroutine view of a MemoryBackend (calls run inline after awaiting the simulated latency)"""
+
+    def __init__(self, engine):
+        self._engine = engine
+
+    async def _call(self, method, *args, **kwargs):
+        import asyncio  # only the ASGI app needs it
+
+        if self._engine.latency:
+            await asyncio.sleep(self._engine.latency)
+        return getattr(MemoryBackend, method).__wrapped__(self._engine, *args, **kwargs)
+
+    async def select(self, *args, **kwargs):
+        return await self._call('select', *args, **kwargs)
+
+    async def insert(self, *args, **kwargs):
+        return await self._call('insert', *args, **kwargs)
+
+    async def upsert(self, *args, **kwargs):
+        return await self._call('upsert', *args, **kwargs)
+
+    async def update(self, *args, **kwargs):
+        return await self._call('update', *args, **kwargs)
+
+    async def delete(self, *args, **kwargs):
+        return await self._call('delete', *args, **kwargs)
+
+    async def increment(self, *args, **kwargs):
+        return await self._call('increment', *args, **kwargs)
+
+    async def rpc(self, *args, **kwargs):
+        return await self._call('rpc', *args, **kwargs)
+
+
+class MemoryAuth:
+    """
+    Fake of the supabase.auth surface used by the routes
+
+    Access tokens are real HS256 JWTs signed with MEMORY_JWT_SECRET, shaped
+    like the ones Supabase issues (sub, email, aud, role, exp).
+    """
+
+    TOKEN_TTL = timedelta(hours=1)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}             # email -> user record
+        self._refresh_tokens = {}    # refresh token -> email
+        self._current = None
+        self.jwt_secret = os.getenv('MEMORY_JWT_SECRET', 'rise-memory-backend-jwt-secret-key')
+
+    @staticmethod
+    def _hash(password):
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def _user(self, record):
+        return SimpleNamespace(
+            id=record['id'],
+            email=record['email'],
+            user_metadata=dict(record['user_metadata']),
+            created_at=record['created_at']
+        )
+
+    def _session(self, record):
+        expires_at = datetime.now(timezone.utc) + self.TOKEN_TTL
+        access_token = jwt.encode({
+            'sub': record['id'],
+            'email': record['email'],
+            'aud': 'authenticated',
+            'role': 'authenticated',
+            'user_metadata': record['user_metadata'],
+            'exp': int(expires_at.timestamp())
+        }, self.jwt_secret, algorithm='HS256')
+        refresh_token = uuid.uuid4().hex
+        self._refresh_tokens[refresh_token] = record['email']
+        self._current = record['email']
+        return SimpleNamespace(
+            access_token=access_token,
+            refresh_token=refresh_token,
+            expires_at=int(expires_at.timestamp()),
+            user=self._user(record)
+        )
+
+    def sign_up(self, credentials):
+        email = credentials['email']
+        with self._lock:
+            if email in self._users:
+                raise Exception('User already registered')
+            record = {
+                'id': str(uuid.uuid4()),
+                'email': email,
+                'password': self._hash(credentials['password']),
+                'user_metadata': credentials.get('options', {}).get('data', {}),
+                'created_at': _now_iso()
+            }
+            self._users[email] = record
+            session = self._session(record)
+        return SimpleNamespace(user=self._user(record), session=session)
+
+    def sign_in_with_password(self, credentials):
+        with self._lock:
+            record = self._users.get(credentials['email'])
+            if not record or record['password'] != self._hash(credentials['password']):
+                raise Exception('Invalid login credentials')
+            session = self._session(record)
+        return SimpleNamespace(user=self._user(record), session=session)
+
+    def get_user(self, token):
+        claims = jwt.decode(token, self.jwt_secret, algorithms=['HS256'],
+                            audience='authenticated')
+        with self._lock:
+            record = next((u for u in self._users.values() if u['id'] == claims['sub']), None)
+        if not record:
+            raise Exception('User not found')
+        return SimpleNamespace(user=self._user(record))
+
+    def refresh_session(self, refresh_token):
+        with self._lock:
+            email = self._refresh_tokens.pop(refresh_token, None)
+            if not email:
+                raise Exception('Invalid Refresh Token')
+            session = self._session(self._users[email])
+        return SimpleNamespace(user=session.user, session=session)
+
+    def sign_out(self):
+        self._current = None
+
+    def update_user(self, attributes):
+        with self._lock:
+            record = self._users.get(self._current)
+            if not record:
+                raise Exception('Auth session missing!')
+            if 'password' in attributes:
+                record['password'] = self._hash(attributes['password'])
+            if 'email' in attributes:
+                del self._users[record['email']]
+                record['email'] = attributes['email']
+                self._users[record['email']] = record
+                self._current = record['email']
+        return SimpleNamespace(user=self._user(record))
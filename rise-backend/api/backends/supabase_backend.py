@@ -0,0 +1,285 @@
+"""
+Hosted Supabase project
+
+Table and RPC calls go through a PostgREST client of our own rather than
+supabase.postgrest: that one is rebuilt, and switched to the user's token,
+whenever auth signs someone in. Ours always uses the service key and keeps
+an explicit keep-alive pool (SUPABASE_POOL_SIZE connections, HTTP/2 when the
+h2 package is installed), shared by the threads (or greenlets) of a worker.
+It is created on first use in each process, so gunicorn workers never share
+sockets inherited from the master.
+"""
+import asyncio
+import os
+import threading
+import weakref
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.utils import AsyncClient, SyncClient
+from supabase import create_client, Client
+
+from . import split_filter_key, split_order
+
+def _apply_filters(q, filters: dict | None):
+    """Apply a filters dict to a PostgREST query builder"""
+    if filters:
+        for key, value in filters.items():
+            column, op = split_filter_key(key)
+            if op == 'in':
+                q = q.in_(column, list(value))
+            elif op == 'is':
+                q = q.is_(column, _is_value(value))
+            else:
+                q = getattr(q, op)(column, value)
+    return q
+
+def _is_value(value):
+    # IS only takes the literals null, true and false
+    return 'null' if value is None else str(value).lower()
+
+def _or_value(value):
+    # Double quotes keep commas, dots and parentheses in values literal
+    text = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{text}"'
+
+def _or_condition(filters: dict):
+    parts = []
+    for key, value in filters.items():
+        column, op = split_filter_key(key)
+        if op == 'in':
+            parts.append(f"{column}.in.({','.join(_or_value(v) for v in value)})")
+        elif op == 'is':
+            parts.append(f"{column}.is.{_is_value(value)}")
+        else:
+            parts.append(f"{column}.{op}.{_or_value(value)}")
+    return parts[0] if len(parts) == 1 else f"and({','.join(parts)})"
+
+def _apply_or_filters(q, or_filters: list | None):
+    """Apply a list of alternative filter dicts as one PostgREST or=(...)"""
+    if or_filters:
+        q = q.or_(','.join(_or_condition(f) for f in or_filters))
+    return q
+
+def _apply_order(q, order):
+    """Apply ordering to a PostgREST query builder"""
+    for column, desc in split_order(order):
+        q = q.order(column, desc=desc)
+    return q
+
+# Query builders shared by the sync and async clients; callers execute them
+
+def _select_query(client, table, columns, filters, single, order, limit, offset, count, or_filters):
+    if count:
+        q = client.table(table).select(columns, count='exact')
+        return _apply_or_filters(_apply_filters(q, filters), or_filters).limit(1)
+
+    q = _apply_filters(client.table(table).select(columns), filters)
+    q = _apply_or_filters(q, or_filters)
+    q = _apply_order(q, order)
+    if single:
+        limit = 1
+    if limit is not None:
+        q = q.limit(limit)
+    if offset:
+        q = q.offset(offset)
+    return q
+
+def _select_result(res, single, count):
+    if count:
+        return res.count or 0
+    return (res.data[0] if res.data else None) if single else res.data
+
+def _upsert_query(client, table, data, on_conflict, ignore_duplicates):
+    return client.table(table).upsert(
+        data,
+        on_conflict=','.join(on_conflict),
+        ignore_duplicates=ignore_duplicates
+    )
+
+def _increment_query(client, table, column, filters, delta, floor, upsert, minimum):
+    params = {
+        'p_table': table,
+        'p_column': column,
+        'p_match': filters,
+        'p_delta': delta,
+        'p_floor': floor,
+        'p_upsert': upsert
+    }
+    if minimum is not None:
+        params['p_min'] = minimum
+    return client.rpc('increment_counter', params)
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _pool_options():
+    """httpx client settings from the SUPABASE_* environment variables"""
+    size = int(os.getenv('SUPABASE_POOL_SIZE', '20'))
+    return {
+        'limits': httpx.Limits(
+            max_connections=size,
+            max_keepalive_connections=int(os.getenv('SUPABASE_POOL_KEEPALIVE', str(size))),
+            keepalive_expiry=float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', '60'))
+        ),
+        'timeout': httpx.Timeout(
+            float(os.getenv('SUPABASE_TIMEOUT', '10')),
+            connect=float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5')),
+            # Waiting for a free connection means the pool is too small
+            pool=float(os.getenv('SUPABASE_POOL_TIMEOUT', '5'))
+        ),
+        'http2': os.getenv('SUPABASE_HTTP2', '1') != '0' and _http2_available()
+    }
+
+def _service_headers(key):
+    return {
+        'apikey': key,
+        'Authorization': f'Bearer {key}',
+        'Accept': 'application/json',
+        'Content-Type': 'application/json'
+    }
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """PostgREST client over a keep-alive pool configured by _pool_options()"""
+
+    def create_session(self, base_url, headers, timeout, verify=True):
+        return SyncClient(base_url=base_url, headers=headers, verify=verify,
+                          follow_redirects=True, **_pool_options())
+
+class AsyncPooledPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client over a keep-alive pool configured by _pool_options()"""
+
+    def create_session(self, base_url, headers, timeout, verify=True):
+        return AsyncClient(base_url=base_url, headers=headers, verify=verify,
+                           follow_redirects=True, **_pool_options())
+
+def _credentials():
+    url = os.getenv("SUPABASE_URL")
+    # ⚠️ IMPORTANT: Use SERVICE ROLE key for backend, not anon key
+    key = os.getenv("SUPABASE_SERVICE_KEY")
+
+    if not url or not key:
+        raise RuntimeError(
+            "Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in .env (rise-backend/.env)"
+        )
+    return url, key
+
+class SupabaseBackend:
+    """Hosted Supabase project (PostgREST + GoTrue)"""
+
+    def __init__(self):
+        self._url, self._key = _credentials()
+
+        # Supabase client with service role key, used for auth only; it opens
+        # no connection until the first auth call (made in a worker)
+        self.supabase: Client = create_client(self._url, self._key)
+        self.auth = self.supabase.auth
+
+        self._client = None
+        self._client_pid = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self) -> PooledPostgrestClient:
+        """This process's PostgREST client (a forked worker makes its own)"""
+        pid = os.getpid()
+        if self._client_pid != pid:
+            with self._client_lock:
+                if self._client_pid != pid:
+                    self._client = PooledPostgrestClient(
+                        f"{self._url}/rest/v1",
+                        headers=_service_headers(self._key)
+                    )
+                    self._client_pid = pid
+        return self._client
+
+    def async_backend(self):
+        return AsyncSupabaseBackend()
+
+    def select(self, table, columns="*", filters=None, single=False,
+               order=None, limit=None, offset=None, count=False, or_filters=None):
+        q = _select_query(self.client, table, columns, filters, single, order, limit, offset,
+                          count, or_filters)
+        return _select_result(q.execute(), single, count)
+
+    def insert(self, table, data):
+        res = self.client.table(table).insert(data).execute()
+        return res.data
+
+    def upsert(self, table, data, on_conflict, ignore_duplicates=False):
+        res = _upsert_query(self.client, table, data, on_conflict, ignore_duplicates).execute()
+        return res.data
+
+    def update(self, table, data, filters):
+        q = _apply_filters(self.client.table(table).update(data), filters)
+        res = q.execute()
+        return res.data
+
+    def delete(self, table, filters):
+        q = _apply_filters(self.client.table(table).delete(), filters)
+        res = q.execute()
+        return res.data
+
+    def increment(self, table, column, filters, delta=1, floor=None, upsert=False, minimum=None):
+        res = _increment_query(self.client, table, column, filters, delta, floor, upsert, minimum).execute()
+        return res.data
+
+    def rpc(self, name, params):
+        return self.client.rpc(name, params).execute().data
+
+
+class AsyncSupabaseBackend:
+    """
+    Same contract as SupabaseBackend with coroutine methods (PostgREST only)
+
+    The async HTTP client belongs to the event loop it was created on, so
+    there is one per loop.
+    """
+
+    def __init__(self):
+        self._url, self._key = _credentials()
+        self._clients = weakref.WeakKeyDictionary()  # event loop -> client
+
+    @property
+    def client(self) -> AsyncPostgrestClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = AsyncPooledPostgrestClient(
+                f"{self._url}/rest/v1",
+                headers=_service_headers(self._key)
+            )
+            self._clients[loop] = client
+        return client
+
+    async def select(self, table, columns="*", filters=None, single=False,
+                     order=None, limit=None, offset=None, count=False, or_filters=None):
+        q = _select_query(self.client, table, columns, filters, single, order, limit, offset,
+                          count, or_filters)
+        return _select_result(await q.execute(), single, count)
+
+    async def insert(self, table, data):
+        res = await self.client.table(table).insert(data).execute()
+        return res.data
+
+    async def upsert(self, table, data, on_conflict, ignore_duplicates=False):
+        res = await _upsert_query(self.client, table, data, on_conflict, ignore_duplicates).execute()
+        return res.data
+
+    async def update(self, table, data, filters):
+        res = await _apply_filters(self.client.table(table).update(data), filters).execute()
+        return res.data
+
+    async def delete(self, table, filters):
+        res = await _apply_filters(self.client.table(table).delete(), filters).execute()
+        return res.data
+
+    async def increment(self, table, column, filters, delta=1, floor=None, upsert=False, minimum=None):
+        res = await _increment_query(self.client, table, column, filters, delta, floor, upsert, minimum).execute()
+        return res.data
+
+    async def rpc(self, name, params):
+        return (await self.client.rpc(name, params).execute()).data
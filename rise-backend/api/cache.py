@@ -0,0 +1,225 @@
+"""
+Two-level cache shared by all workers
+
+L1 is a small LRU in each process; L2 is a Redis-protocol server shared by
+every gunicorn worker (REDIS_URL), or an in-process stand-in with the same
+interface when no server is configured (development, tests, single worker).
+Several workers without a shared L2 could not see each other's writes, so
+gunicorn.conf.py turns the cache off then (CACHE_ENABLED=0).
+
+Keys are versioned by scope (e.g. "user:42" or "table:articles"): a value is
+stored under the current versions of its scopes, and a write bumps the
+versions of the scopes it touched. Every read checks the versions in L2 (one
+MGET), so a write made by any worker is seen by all of them on their next
+read; entries under an old version are simply never read again and expire.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class LocalStore:
+    """In-process stand-in for the Redis commands TieredCache uses"""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires or None)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def mget(self, keys):
+        with self._lock:
+            return [entry[0] if entry else None for entry in map(self._live, keys)]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (str(value), time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[0]) + 1 if entry else 1
+            self._data[key] = (str(value), entry[1] if entry else None)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+def create_store(url: str | None = None):
+    """L2 store: a Redis client for url, or a LocalStore when url is empty"""
+    if not url:
+        return LocalStore()
+    try:
+        import redis
+    except ImportError as e:
+        raise RuntimeError("REDIS_URL is set but the redis package is not installed") from e
+    return redis.Redis.from_url(url, decode_responses=True)
+
+class TieredCache:
+    def __init__(self, store, l1_size=4096, default_ttl=300, prefix='rise'):
+        """
+        Args:
+            store: L2 store (redis.Redis or LocalStore), or None to cache
+                   nothing (every read misses, loaders always run)
+            l1_size: Maximum number of entries kept in this process
+            default_ttl: Seconds an entry lives when set() gets no ttl
+            prefix: Namespace of every key in the store
+        """
+        self.store = store
+        # A LocalStore only lives in this process: versions bumped by a write
+        # in another worker are not seen here
+        self.enabled = store is not None
+        self.shared = self.enabled and not isinstance(store, LocalStore)
+        self.l1_size = l1_size
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.hits_l1 = 0
+        self.hits_l2 = 0
+        self.misses = 0
+        self._l1 = OrderedDict()  # full key -> (json, expires)
+        self._lock = threading.Lock()
+
+    def _version_key(self, scope):
+        return f'{self.prefix}:ver:{scope}'
+
+    def _full_key(self, key, scopes):
+        """Key including the current version of every scope"""
+        if not scopes:
+            return f'{self.prefix}:{key}'
+        versions = self.store.mget([self._version_key(s) for s in scopes])
+        return f"{self.prefix}:{key}@{'.'.join(v or '0' for v in versions)}"
+
+    def _get(self, full_key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._l1.get(full_key)
+            if entry is not None and entry[1] > now:
+                self._l1.move_to_end(full_key)
+                self.hits_l1 += 1
+                return json.loads(entry[0])
+
+        raw = self.store.get(full_key)
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits_l2 += 1
+        # L2 does not tell how long the entry has left; keep it at most default_ttl
+        self._put_l1(full_key, raw, self.default_ttl)
+        return json.loads(raw)
+
+    def _set(self, full_key, value, ttl):
+        raw = json.dumps(value, separators=(',', ':'), default=str)
+        self.store.set(full_key, raw, ex=ttl)
+        self._put_l1(full_key, raw, ttl)
+
+    def _put_l1(self, full_key, raw, ttl):
+        with self._lock:
+            self._l1[full_key] = (raw, time.monotonic() + ttl)
+            self._l1.move_to_end(full_key)
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+
+    def get(self, key: str, scopes=()):
+        """Cached value for key under the current versions of scopes, or None"""
+        if not self.enabled:
+            return None
+        try:
+            return self._get(self._full_key(key, scopes))
+        except Exception as e:
+            print(f"Cache read failed for {key}: {e}")
+            return None
+
+    def set(self, key: str, value, scopes=(), ttl=None):
+        """Cache a JSON-serializable value under the current versions of scopes"""
+        if not self.enabled:
+            return
+        try:
+            self._set(self._full_key(key, scopes), value, ttl or self.default_ttl)
+        except Exception as e:
+            print(f"Cache write failed for {key}: {e}")
+
+    def get_or_load(self, key: str, loader, scopes=(), ttl=None):
+        """
+        Cached value for key, or loader()'s result (cached unless None)
+
+        The versions are read before loading, so a write that lands while
+        loading leaves the loaded value under the old version, unread.
+        """
+        if not self.enabled:
+            return loader()
+        try:
+            full_key = self._full_key(key, scopes)
+            value = self._get(full_key)
+        except Exception as e:
+            print(f"Cache read failed for {key}: {e}")
+            return loader()
+        if value is not None:
+            return value
+
+        value = loader()
+        if value is not None:
+            try:
+                self._set(full_key, value, ttl or self.default_ttl)
+            except Exception as e:
+                print(f"Cache write failed for {key}: {e}")
+        return value
+
+    async def aget_or_load(self, key: str, loader, scopes=(), ttl=None):
+        """
+        get_or_load for async code: loader is a coroutine function and the
+        store is read and written from a worker thread
+        """
+        import asyncio  # only the ASGI app needs it
+
+        if not self.enabled:
+            return await loader()
+        try:
+            full_key = await asyncio.to_thread(self._full_key, key, scopes)
+            value = await asyncio.to_thread(self._get, full_key)
+        except Exception as e:
+            print(f"Cache read failed for {key}: {e}")
+            return await loader()
+        if value is not None:
+            return value
+
+        value = await loader()
+        if value is not None:
+            try:
+                await asyncio.to_thread(self._set, full_key, value, ttl or self.default_ttl)
+            except Exception as e:
+                print(f"Cache write failed for {key}: {e}")
+        return value
+
+    def bump(self, *scopes):
+        """Invalidate everything cached under scopes (in every worker)"""
+        if not self.enabled:
+            return
+        for scope in scopes:
+            try:
+                self.store.incr(self._version_key(scope))
+            except Exception as e:
+                print(f"Cache invalidation failed for {scope}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'shared': self.shared,
+                'l1Size': len(self._l1),
+                'l1Hits': self.hits_l1,
+                'l2Hits': self.hits_l2,
+                'misses': self.misses
+            }
@@ -1,56 +1,280 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from flask import g, has_app_context
+
+from .backends import LazyBackend, split_filter_key
+from .cache import TieredCache, create_store
+from .metrics import TimedAuth, TimedBackend
+from .tokens import TokenVerifier
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-# ⚠️ IMPORTANT: Use SERVICE ROLE key for backend, not anon key
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")  
+# Storage backend: "supabase" (default) or "memory", the in-process stand-in
+# used to run and load-test the app without network. Created on first use;
+# every call is timed and counted (api/metrics.py).
+backend = TimedBackend(LazyBackend(os.getenv("DB_BACKEND", "supabase")))
+
+# Auth API of the backend (supabase.auth for Supabase)
+auth = TimedAuth(backend.auth)
+
+def _jwt_secret():
+    # The memory backend signs its own tokens with auth.jwt_secret. Read on
+    # the first token, not here, so importing this module does not create
+    # the backend.
+    return os.getenv("SUPABASE_JWT_SECRET") or getattr(auth, 'jwt_secret', None)
+
+# Verifies access tokens locally (JWT secret / JWKS), falling back to auth.get_user
+_supabase_url = os.getenv("SUPABASE_URL")
+token_verifier = TokenVerifier(
+    auth,
+    jwt_secret=_jwt_secret,
+    jwks_url=f"{_supabase_url}/auth/v1/.well-known/jwks.json" if _supabase_url else None,
+    cache_size=int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+)
+
+# --- Request-scoped identity map ---
+#
+# Within one request (flask.g) select results are memoized by query, and full
+# rows are remembered by their unique keys, so reading the same row twice
+# costs one round trip. Writes drop the table's memoized queries and record
+# the rows they return.
+
+# Unique keys per table (every table is also unique on id)
+UNIQUE_KEYS = {
+    'users': [('auth_id',), ('username',), ('email',)],
+    'home_status': [('user_id', 'date')],
+    'daily_moods': [('user_id', 'date')],
+    'plant_progress': [('user_id',)],
+    'app_locks': [('user_id',)],
+}
+
+def _identity_map():
+    if not has_app_context():
+        return None
+    if 'identity_map' not in g:
+        g.identity_map = {'queries': {}, 'rows': {}}
+    return g.identity_map
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _copy(result):
+    # Callers mutate what they get back (e.g. timestamp fixes in moods)
+    if isinstance(result, dict):
+        return dict(result)
+    if isinstance(result, list):
+        return [dict(r) for r in result]
+    return result
+
+def _unique_keys(table):
+    return [('id',)] + UNIQUE_KEYS.get(table, [])
+
+def _row_key(table, columns, values):
+    return (table, columns, tuple(str(v) for v in values))
+
+def _remember_rows(imap, table, rows):
+    for row in rows:
+        for key in _unique_keys(table):
+            key = tuple(sorted(key))
+            if all(row.get(c) is not None for c in key):
+                imap['rows'][_row_key(table, key, [row[c] for c in key])] = row
+
+def _forget_table(imap, table):
+    imap['queries'] = {k: v for k, v in imap['queries'].items() if k[0] != table}
+    imap['rows'] = {k: v for k, v in imap['rows'].items() if k[0] != table}
+
+def _lookup_row(imap, table, columns, filters):
+    """Answer a query filtering on exactly one unique key from remembered rows"""
+    if not filters or any(split_filter_key(k)[1] != 'eq' or '__' in k for k in filters):
+        return None
+    key = tuple(sorted(filters))
+    if key not in [tuple(sorted(k)) for k in _unique_keys(table)]:
+        return None
+    row = imap['rows'].get(_row_key(table, key, [filters[c] for c in key]))
+    if row is None:
+        return None
+    if columns.strip() == '*':
+        return row
+    wanted = [c.strip() for c in columns.split(',')]
+    if not all(c in row for c in wanted):
+        return None
+    return {c: row[c] for c in wanted}
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError(
-        "Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in .env (rise-backend/.env)"
-    )
+def _after_write(table, rows, filters=None):
+    invalidate_cache(table, rows, filters)
+    imap = _identity_map()
+    if imap is not None:
+        _forget_table(imap, table)
+        _remember_rows(imap, table, _copy(rows or []))
 
-# Create Supabase client with service role key
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# --- Shared cache ---
+#
+# Cache shared by all workers (api/cache.py): L1 in this process, L2 in Redis
+# when REDIS_URL is set. CACHE_ENABLED=0 turns it off (gunicorn.conf.py does
+# with several workers and no REDIS_URL). Everything a user owns is cached under the scope
+# "user:<users.id>", other tables under "table:<name>", and "all" covers
+# writes whose rows cannot be identified. Every write bumps the scopes of the
+# rows it touched.
+
+cache = TieredCache(
+    create_store(os.getenv("REDIS_URL")) if os.getenv("CACHE_ENABLED", "1") != "0" else None,
+    l1_size=int(os.getenv("CACHE_L1_SIZE", "4096")),
+    default_ttl=int(os.getenv("CACHE_TTL", "300"))
+)
+
+def user_scopes(user_id):
+    """Cache scopes of everything belonging to a user (users.id)"""
+    return ('all', f'user:{user_id}')
+
+def table_scopes(table):
+    """Cache scopes of a table that does not belong to users"""
+    return ('all', f'table:{table}')
+
+def _user_id_for_auth(auth_id):
+    user_id = cache.get(f'users:auth:{auth_id}')
+    if user_id is None:
+        row = backend.select('users', 'id', {'auth_id': auth_id}, single=True)
+        if row is None:
+            return None
+        user_id = row['id']
+        # auth_id -> id never changes, so it is not versioned
+        cache.set(f'users:auth:{auth_id}', user_id)
+    return user_id
+
+def _cached_select(table, columns, filters, single, order, limit, offset, count, or_filters):
+    """
+    users rows looked up by id or auth_id come from the shared cache
+
+    Only when L2 is shared by every process: a row cached in one process
+    would not see writes made by another (points, profile changes).
+    """
+    if (not cache.shared or table != 'users' or count or offset or or_filters or order
+            or not filters or len(filters) != 1 or not ({'id', 'auth_id'} & set(filters))):
+        return backend.select(table, columns, filters, single, order, limit, offset, count, or_filters)
+    
+    user_id = filters.get('id')
+    if user_id is None:
+        user_id = _user_id_for_auth(filters['auth_id'])
+    row = None
+    if user_id is not None:
+        row = cache.get_or_load(
+            f'users:row:{user_id}',
+            lambda: backend.select('users', '*', {'id': user_id}, single=True),
+            scopes=user_scopes(user_id)
+        )
+    if row is None:
+        return None if single else []
+    if columns.strip() != '*':
+        row = {c.strip(): row.get(c.strip()) for c in columns.split(',')}
+    return row if single else [row]
+
+def _write_scopes(table, rows, filters):
+    """Cache scopes touched by a write that returned rows and used filters"""
+    owner = 'id' if table == 'users' else 'user_id'
+    scopes = set()
+    for row in rows or []:
+        if row.get(owner) is not None:
+            scopes.add(f'user:{row[owner]}')
+        else:
+            scopes.add(f'table:{table}')
+    if rows:
+        return scopes
+    
+    # Nothing came back (increment, delete): find the owner in the filters
+    user_id = (filters or {}).get(owner)
+    if user_id is None and table == 'users' and (filters or {}).get('auth_id') is not None:
+        user_id = _user_id_for_auth(filters['auth_id'])
+    if user_id is not None and not isinstance(user_id, (list, tuple, set)):
+        return {f'user:{user_id}'}
+    return {'all'} if filters else set()
+
+def invalidate_cache(table, rows, filters=None):
+    """Bump the cache scopes of a write that returned rows and used filters"""
+    cache.bump(*_write_scopes(table, rows, filters))
 
 # --- Simple helpers (recommended) ---
 
-def select(table: str, columns="*", filters: dict | None = None, single=False):
+def select(table: str, columns="*", filters: dict | None = None, single=False,
+           order=None, limit: int | None = None, offset: int | None = None,
+           count=False, or_filters: list | None = None):
     """
     Select records from a table
     
     Args:
         table: Table name
         columns: Columns to select (default: "*")
-        filters: Dictionary of filters {column: value}
+        filters: Dictionary of filters {column: value} or {column__op: value}
+                 where op is one of eq, neq, gt, gte, lt, lte, in, is
         single: Return single record instead of list
+        order: Column to order by ("-column" for descending) or list of columns
+        limit: Maximum number of records to return
+        offset: Number of records to skip
+        count: Return the number of matching records instead of the records
+        or_filters: List of filter dicts; records must match at least one of
+                    them (each dict is ANDed), in addition to filters
+    
+    Returns:
+        Number of matching records if count=True, single record (dict) if
+        single=True, otherwise list of records
+    """
+    imap = _identity_map()
+    if imap is None:
+        return _cached_select(table, columns, filters, single, order, limit, offset, count, or_filters)
+    
+    key = (table, columns, _freeze(filters), single, _freeze(order), limit, offset, count,
+           _freeze(or_filters))
+    if key in imap['queries']:
+        return _copy(imap['queries'][key])
+    
+    if not count and not offset and not or_filters:
+        row = _lookup_row(imap, table, columns, filters)
+        if row is not None:
+            return _copy(row) if single else [_copy(row)]
+    
+    result = _cached_select(table, columns, filters, single, order, limit, offset, count, or_filters)
+    imap['queries'][key] = _copy(result)
+    if columns.strip() == '*' and not count and result:
+        _remember_rows(imap, table, _copy([result] if single else result))
+    return result
+
+def insert(table: str, data: dict | list):
+    """
+    Insert records into a table
+    
+    Args:
+        table: Table name
+        data: Dictionary (or list of dictionaries) of data to insert
     
     Returns:
-        Single record (dict) if single=True, otherwise list of records
+        List containing the inserted records
     """
-    q = supabase.table(table).select(columns)
-    if filters:
-        for k, v in filters.items():
-            q = q.eq(k, v)
-    res = q.execute()
-    return (res.data[0] if res.data else None) if single else res.data
+    result = backend.insert(table, data)
+    _after_write(table, result)
+    return result
 
-def insert(table: str, data: dict):
+def upsert(table: str, data: dict | list, on_conflict: list, ignore_duplicates=False):
     """
-    Insert a record into a table
+    Insert records, or update them if they collide on a unique key
     
     Args:
         table: Table name
-        data: Dictionary of data to insert
+        data: Dictionary (or list of dictionaries) of data to upsert
+        on_conflict: Columns of the unique key to resolve conflicts on,
+                     e.g. ['user_id', 'date']
+        ignore_duplicates: Leave existing records untouched instead of
+                           updating them
     
     Returns:
-        List containing the inserted record
+        List of inserted/updated records (only inserted ones when
+        ignore_duplicates=True)
     """
-    res = supabase.table(table).insert(data).execute()
-    return res.data
+    result = backend.upsert(table, data, on_conflict, ignore_duplicates)
+    _after_write(table, result)
+    return result
 
 def update(table: str, data: dict, filters: dict):
     """
@@ -59,16 +283,14 @@ def update(table: str, data: dict, filters: dict):
     Args:
         table: Table name
         data: Dictionary of data to update
-        filters: Dictionary of filters {column: value}
+        filters: Dictionary of filters {column: value} or {column__op: value}
     
     Returns:
         List of updated records
     """
-    q = supabase.table(table).update(data)
-    for k, v in filters.items():
-        q = q.eq(k, v)
-    res = q.execute()
-    return res.data
+    result = backend.update(table, data, filters)
+    _after_write(table, result, filters)
+    return result
 
 def delete(table: str, filters: dict):
     """
@@ -76,23 +298,64 @@ def delete(table: str, filters: dict):
     
     Args:
         table: Table name
-        filters: Dictionary of filters {column: value}
+        filters: Dictionary of filters {column: value} or {column__op: value}
     
     Returns:
         List of deleted records
     """
-    q = supabase.table(table).delete()
-    for k, v in filters.items():
-        q = q.eq(k, v)
-    res = q.execute()
-    return res.data
+    result = backend.delete(table, filters)
+    _after_write(table, [], filters)
+    return result
 
-# --- Auth helpers ---
+def increment(table: str, column: str, filters: dict, delta=1, floor=None, upsert=False, minimum=None):
+    """
+    Atomically add delta to a numeric column (one round trip, no lost updates)
+    
+    On Supabase this is the increment_counter Postgres function
+    (migrations/003_increment_counter.sql, 015, 017). A null column counts as 0.
+    
+    Args:
+        table: Table name
+        column: Numeric column to change
+        filters: Dictionary of equality filters {column: value} identifying the record
+        delta: Amount to add (negative to decrement)
+        floor: Clamp the result so it never drops below this value (e.g. 0)
+        upsert: Insert the record (from filters + column) when it does not exist;
+                filters must then match a unique key
+        minimum: Leave the record unchanged when the new value would be below
+                 this (e.g. spending more points than the balance); not
+                 with upsert
+    
+    Returns:
+        New value of the column, or None if no record matched (or the
+        minimum was not met)
+    """
+    result = backend.increment(table, column, filters, delta, floor, upsert, minimum)
+    _after_write(table, [], filters)
+    return result
+
+def rpc(name: str, params: dict):
+    """
+    Call a Postgres function (migrations/) and return its result
+    
+    The memory backend implements the same functions in Python.
+    
+    Args:
+        name: Function name, e.g. "search_journals"
+        params: Named arguments
+    
+    Returns:
+        The function's result (a list of records for set-returning functions)
+    """
+    return backend.rpc(name, params)
 
 def verify_token(token: str):
     """
     Verify JWT token and return user
     
+    Tokens are checked locally and cached until they expire; the remote
+    auth.get_user call is only made when that is inconclusive.
+    
     Args:
         token: JWT access token
     
@@ -100,8 +363,7 @@ def verify_token(token: str):
         User object if valid, None otherwise
     """
     try:
-        user = supabase.auth.get_user(token)
-        return user
+        return token_verifier.verify(token)
     except Exception as e:
         print(f"Token verification error: {e}")
         return None
\ No newline at end of file
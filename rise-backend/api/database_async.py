@@ -0,0 +1,60 @@
+"""
+Async variants of the api/database.py helpers
+
+Same arguments, filters and results, but coroutines, so independent queries
+can be awaited together with asyncio.gather() (see api/asgi.py). Writes
+invalidate the shared cache like the sync helpers do. There is no request
+identity map here: it lives on flask.g.
+"""
+import asyncio
+import functools
+
+from .database import backend, invalidate_cache
+
+@functools.cache
+def _backend():
+    return backend.async_backend()
+
+async def _after_write(table, rows, filters=None):
+    # May call Redis (and look up a users.id), keep it off the event loop
+    await asyncio.to_thread(invalidate_cache, table, rows, filters)
+
+async def select(table: str, columns="*", filters: dict | None = None, single=False,
+                 order=None, limit: int | None = None, offset: int | None = None,
+                 count=False, or_filters: list | None = None):
+    """Select records from a table (see api.database.select)"""
+    return await _backend().select(table, columns, filters, single, order, limit, offset, count, or_filters)
+
+async def insert(table: str, data: dict | list):
+    """Insert records into a table (see api.database.insert)"""
+    result = await _backend().insert(table, data)
+    await _after_write(table, result)
+    return result
+
+async def upsert(table: str, data: dict | list, on_conflict: list, ignore_duplicates=False):
+    """Insert or update records on a unique key (see api.database.upsert)"""
+    result = await _backend().upsert(table, data, on_conflict, ignore_duplicates)
+    await _after_write(table, result)
+    return result
+
+async def update(table: str, data: dict, filters: dict):
+    """Update records in a table (see api.database.update)"""
+    result = await _backend().update(table, data, filters)
+    await _after_write(table, result, filters)
+    return result
+
+async def delete(table: str, filters: dict):
+    """Delete records from a table (see api.database.delete)"""
+    result = await _backend().delete(table, filters)
+    await _after_write(table, [], filters)
+    return result
+
+async def increment(table: str, column: str, filters: dict, delta=1, floor=None, upsert=False, minimum=None):
+    """Atomically add delta to a numeric column (see api.database.increment)"""
+    result = await _backend().increment(table, column, filters, delta, floor, upsert, minimum)
+    await _after_write(table, [], filters)
+    return result
+
+async def rpc(name: str, params: dict):
+    """Call a Postgres function (see api.database.rpc)"""
+    return await _backend().rpc(name, params)
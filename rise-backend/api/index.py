@@ -1,6 +1,9 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 import logging
+import os
+
+from api import metrics
 
 from api.routes.auth import auth_bp
 from api.routes.app_lock import app_lock_bp
@@ -9,6 +12,8 @@ from api.routes.journals import journals_bp
 from api.routes.habits import habits_bp
 from api.routes.moods import moods_bp
 from api.routes.home import home_bp
+from api.routes.batch import batch_bp
+from api.routes.sync import sync_bp
 
 # ✅ NEW
 from api.routes.articles import articles_bp
@@ -30,6 +35,9 @@ CORS(app, resources={
     }
 })
 
+# Request latency and data calls per endpoint (GET /metrics)
+metrics.init_app(app)
+
 # Register all blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(app_lock_bp)
@@ -38,6 +46,8 @@ app.register_blueprint(journals_bp)
 app.register_blueprint(habits_bp)
 app.register_blueprint(moods_bp)
 app.register_blueprint(home_bp)
+app.register_blueprint(batch_bp)
+app.register_blueprint(sync_bp)
 
 # ✅ Register articles blueprint AFTER app is created
 app.register_blueprint(articles_bp)
@@ -65,30 +75,55 @@ def index():
             ],
             'app_lock': ['/lock.get', '/lock.save', '/lock.remove'],
             'plant': ['/plant.get', '/plant.update', '/plant.reset'],
-            'journals': ['/journals.get', '/journals.add', '/journals.update', '/journals.delete'],
+            'journals': [
+                '/journals.get', '/journals.getOne', '/journals.add', '/journals.update',
+                '/journals.delete', '/journals.changes', '/journals.search'
+            ],
             'habits': [
                 '/habits.get', '/habits.add', '/habits.update', '/habits.updateStatus',
                 '/habits.delete', '/habits.getByTitle', '/habits.checkExists',
                 '/habits.getCompleted', '/habits.restoreStreak', '/habits.checkReset',
-                '/habits.resetDaily'
+                '/habits.resetDaily', '/habits.rollover'
             ],
             'moods': ['/moods.today', '/moods.save', '/moods.delete', '/moods.getAll', '/moods.getByMonth'],
             'home': [
                 '/home.status (GET/POST)', '/home.incrementWater', '/home.decrementWater',
-                '/home.updateDetox', '/home.getRange'
+                '/home.updateDetox', '/home.getRange', '/home.dashboard'
             ],
             # ✅ NEW
-            'articles': ['/articles.getAll', '/articles.get']
+            'articles': ['/articles.getAll', '/articles.get', '/articles.search'],
+            'batch': ['/batch'],
+            'sync': ['/sync.push']
         }
     }
 
 @app.route('/health')
 def health():
+    from api.database import cache
     return {
         'status': 'healthy',
-        'timestamp': __import__('datetime').datetime.now().isoformat()
+        'timestamp': __import__('datetime').datetime.now().isoformat(),
+        'cache': cache.stats()
     }, 200
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request and data-layer metrics of all workers, in the Prometheus text format"""
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return {'error': 'Unauthorized'}, 401
+    return app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/warmup')
+def warmup():
+    """Load what the first request would (backend, first connection); see api/warmup.py"""
+    from api.warmup import warm_up
+    try:
+        return {'success': True, 'timings': warm_up()}, 200
+    except Exception as e:
+        print(f"Error in warmup: {e}")
+        return {'success': False, 'error': str(e)}, 500
+
 
 from api.database import select
 
@@ -0,0 +1,108 @@
+"""
+Render every published article into static snapshots served by articles.get
+
+    python -m api.jobs.build_article_snapshots [directory]
+
+Run after publishing or editing articles (and as part of a deploy). Files are
+named after the article version, so a new build only adds files; the
+manifest is replaced atomically and files the new manifest no longer
+references are removed afterwards. Brotli files are written only when the
+Brotli package is installed.
+"""
+import gzip
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+from api.database import select
+from api.routes.articles import DETAIL_COLUMNS, article_etag, render_article, snapshots
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PAGE_SIZE = 500
+
+def _published_articles():
+    rows = []
+    last_id = 0
+    while True:
+        page = select('articles', columns=DETAIL_COLUMNS,
+                      filters={'is_published': True, 'id__gt': last_id},
+                      order='id', limit=PAGE_SIZE)
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        last_id = page[-1]['id']
+
+def _write(directory, relative_path, data):
+    path = os.path.join(directory, relative_path)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return relative_path
+
+def build_snapshots(directory):
+    """
+    Write snapshots of all published articles into directory
+
+    Returns:
+        Number of articles written
+    """
+    manifest = {'built_at': datetime.now(timezone.utc).isoformat(), 'articles': {}}
+
+    for article in _published_articles():
+        lang = article['language']
+        etag = article_etag(lang, article)
+        body = render_article(article)
+        base = f"{re.sub(r'[^A-Za-z0-9_-]', '_', lang)}/{article['id']}-{etag}.json"
+
+        files = {
+            'identity': _write(directory, base, body),
+            'gzip': _write(directory, f'{base}.gz', gzip.compress(body, compresslevel=9, mtime=0)),
+        }
+        if brotli is not None:
+            files['br'] = _write(directory, f'{base}.br', brotli.compress(body, quality=11))
+
+        manifest['articles'].setdefault(lang, {})[article['slug']] = {
+            'id': article['id'],
+            'updated_at': article['updated_at'],
+            'etag': etag,
+            'files': files
+        }
+
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    with open(f'{manifest_path}.tmp', 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'), default=str)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+
+    # A worker still on the old manifest reads articles whose files are
+    # gone live until it picks up the new one
+    referenced = {
+        path
+        for by_slug in manifest['articles'].values()
+        for entry in by_slug.values()
+        for path in entry['files'].values()
+    }
+    for root, _, names in os.walk(directory):
+        for name in names:
+            relative_path = os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/')
+            if relative_path != 'manifest.json' and relative_path not in referenced:
+                os.remove(os.path.join(root, name))
+
+    return sum(len(by_slug) for by_slug in manifest['articles'].values())
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else snapshots.directory
+    count = build_snapshots(directory)
+    print(f"Article snapshots: wrote {count} articles to {os.path.abspath(directory)}")
+
+if __name__ == '__main__':
+    main()
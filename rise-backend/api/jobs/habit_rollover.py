@@ -0,0 +1,18 @@
+"""
+Habit period rollover
+
+Run at every UTC midnight (day, week and month boundaries all fall on one):
+
+    python -m api.jobs.habit_rollover
+
+On Vercel the same work is triggered by the cron in vercel.json calling
+/habits.rollover.
+"""
+from api.routes.habits import rollover_habits
+
+def main():
+    reset_count = rollover_habits()
+    print(f"Habit rollover: reset {reset_count} habits")
+
+if __name__ == '__main__':
+    main()
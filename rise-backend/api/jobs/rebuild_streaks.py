@@ -0,0 +1,81 @@
+"""
+Rebuild every habit's streak_count / best_streak from habit_completions
+
+    python -m api.jobs.rebuild_streaks
+
+Only habits with logged events are touched. best_streak never drops below
+the stored value, since history from before the log existed is not in it.
+"""
+from datetime import datetime, timezone
+
+from api.database import select, update
+from api.streaks import period_ordinal, breaks_when_idle, compute_streaks
+
+PAGE_SIZE = 5000
+# Bulk updates use id=in.(...) in the query string, keep it a sane length
+UPDATE_CHUNK_SIZE = 200
+
+def _select_all(table, columns):
+    """Read a whole table in id-ordered pages"""
+    rows = []
+    last_id = 0
+    while True:
+        page = select(table, columns=columns, filters={'id__gt': last_id},
+                      order='id', limit=PAGE_SIZE)
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        last_id = page[-1]['id']
+
+def rebuild_streaks(now=None):
+    """
+    Recompute streaks for all habits from the completion log
+
+    Returns:
+        Number of habits whose stored streaks changed
+    """
+    now = now or datetime.now(timezone.utc)
+
+    habits = {h['id']: h for h in _select_all('habits', 'id, frequency, habit_type, streak_count, best_streak')}
+    events = [e for e in _select_all('habit_completions', 'id, habit_id, period_ordinal, advanced, bridges, restored_to')
+              if e['habit_id'] in habits]
+
+    streaks = compute_streaks(
+        habit_ids=[e['habit_id'] for e in events],
+        ordinals=[e['period_ordinal'] for e in events],
+        advanced=[bool(e['advanced']) for e in events],
+        bridges=[bool(e['bridges']) for e in events],
+        seq=[e['id'] for e in events],
+        restored_to=[e.get('restored_to') for e in events],
+        now_ordinals={
+            habit_id: period_ordinal(h['frequency'], now)
+            for habit_id, h in habits.items()
+        },
+        keep_idle={
+            habit_id for habit_id, h in habits.items()
+            if not breaks_when_idle(h.get('habit_type') or 'good')
+        }
+    )
+
+    # Group habits by their new (streak, best) so each group is one update
+    groups = {}
+    for habit_id, (current, best) in streaks.items():
+        habit = habits[habit_id]
+        best = max(best, habit.get('best_streak') or 0)
+        if (current, best) != (habit.get('streak_count'), habit.get('best_streak')):
+            groups.setdefault((current, best), []).append(habit_id)
+
+    changed = 0
+    for (current, best), ids in groups.items():
+        for i in range(0, len(ids), UPDATE_CHUNK_SIZE):
+            update('habits', {'streak_count': current, 'best_streak': best},
+                   filters={'id__in': ids[i:i + UPDATE_CHUNK_SIZE]})
+        changed += len(ids)
+    return changed
+
+def main():
+    changed = rebuild_streaks()
+    print(f"Streak rebuild: updated {changed} habits")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+"""
+Request and data-layer metrics in the Prometheus text format (GET /metrics)
+
+Every data call (select, insert, upsert, update, delete, increment, rpc) and
+every auth call is timed and counted by operation, table and the endpoint of
+the request that made it, and every request records its status, duration and
+number of data calls. A route that starts making one query per row shows up
+as a jump in rise_http_request_db_calls for its endpoint.
+
+Each process keeps its own registry. With several gunicorn workers, set
+METRICS_DIR (gunicorn.conf.py does) and every worker writes a snapshot there
+every METRICS_FLUSH_INTERVAL seconds while it has new data; /metrics then
+adds up the snapshots of all workers, whichever of them serves it. When a
+worker exits, the gunicorn master folds its snapshot into an archive file
+(archive_snapshot), so recycled workers neither leave files behind nor take
+their counts with them.
+"""
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import has_request_context, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55, 89)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'rise_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status', None),
+    'rise_http_request_duration_seconds': ('histogram', 'HTTP request duration by endpoint', LATENCY_BUCKETS),
+    'rise_http_request_db_calls': ('histogram', 'Data calls made by one request, by endpoint', CALL_COUNT_BUCKETS),
+    'rise_db_calls_total': ('counter', 'Data calls by endpoint, operation and table', None),
+    'rise_db_call_seconds_total': ('counter', 'Time spent in data calls by endpoint, operation and table', None),
+    'rise_db_call_errors_total': ('counter', 'Data calls that raised, by endpoint, operation and table', None),
+    'rise_db_call_duration_seconds': ('histogram', 'Data call duration by operation and table', LATENCY_BUCKETS),
+    'rise_auth_calls_total': ('counter', 'Auth API calls by endpoint and operation', None),
+    'rise_auth_call_seconds_total': ('counter', 'Time spent in auth API calls by endpoint and operation', None),
+    'rise_auth_call_errors_total': ('counter', 'Auth API calls that raised, by endpoint and operation', None),
+    # Derived from rise_http_request_duration_seconds when rendering, for
+    # dashboards without histogram_quantile()
+    'rise_http_request_duration_quantile_seconds': (
+        'gauge', 'Request duration quantiles by endpoint, estimated from the histogram', None
+    ),
+}
+
+QUANTILE_METRIC = 'rise_http_request_duration_quantile_seconds'
+
+DATA_OPERATIONS = ('select', 'insert', 'upsert', 'update', 'delete', 'increment', 'rpc')
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '2'))
+# Snapshot of the workers that exited, next to the live ones in METRICS_DIR
+ARCHIVE_FILE = 'archive.json'
+
+class Registry:
+    """Counters and histograms keyed by (name, labels)"""
+
+    def __init__(self):
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [count per bucket (+Inf last), sum]
+        self.version = 0      # bumped by every change
+        self.lock = threading.Lock()
+
+    def inc(self, name, labels, value=1.0):
+        """Add to a counter (call with self.lock held)"""
+        key = (name, _labels(labels))
+        self.counters[key] = self.counters.get(key, 0.0) + value
+        self.version += 1
+
+    def observe(self, name, labels, value):
+        """Record one value in a histogram (call with self.lock held)"""
+        key = (name, _labels(labels))
+        buckets = METRICS[name][2]
+        entry = self.histograms.get(key)
+        if entry is None:
+            entry = self.histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+        entry[0][next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))] += 1
+        entry[1] += value
+        self.version += 1
+
+    def snapshot(self) -> dict:
+        """JSON-serializable copy of every series (and the version it is at)"""
+        with self.lock:
+            return {
+                'version': self.version,
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(counts), total]
+                               for (name, labels), (counts, total) in self.histograms.items()]
+            }
+
+def _labels(labels: dict):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+registry = Registry()
+
+class RequestScope:
+    """What one request has done so far"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.calls = {'db': 0, 'auth': 0}
+
+_ENVIRON_KEY = 'rise.metrics'
+_current = ContextVar('rise_metrics_request', default=None)
+
+def current_request():
+    """RequestScope of the request being served (Flask or ASGI), or None"""
+    if has_request_context():
+        return request.environ.get(_ENVIRON_KEY)
+    return _current.get()
+
+def begin_request(endpoint: str) -> RequestScope:
+    """Start measuring a request served outside Flask (api/asgi.py)"""
+    scope = RequestScope(endpoint)
+    _current.set(scope)
+    return scope
+
+def end_request(scope: RequestScope, method: str, status: int):
+    """Record a finished request"""
+    seconds = time.perf_counter() - scope.started
+    with registry.lock:
+        registry.inc('rise_http_requests_total',
+                     {'endpoint': scope.endpoint, 'method': method, 'status': status})
+        registry.observe('rise_http_request_duration_seconds', {'endpoint': scope.endpoint}, seconds)
+        registry.observe('rise_http_request_db_calls', {'endpoint': scope.endpoint}, scope.calls['db'])
+    _start_flusher()
+
+def record_call(kind: str, operation: str, table: str | None, seconds: float, failed: bool):
+    """Record one data ('db') or auth ('auth') call of the current request"""
+    scope = current_request()
+    labels = {'endpoint': scope.endpoint if scope else 'none', 'operation': operation}
+    if kind == 'db':
+        labels['table'] = table
+    with registry.lock:
+        if scope:
+            scope.calls[kind] += 1
+        registry.inc(f'rise_{kind}_calls_total', labels)
+        registry.inc(f'rise_{kind}_call_seconds_total', labels, seconds)
+        if failed:
+            registry.inc(f'rise_{kind}_call_errors_total', labels)
+        if kind == 'db':
+            registry.observe('rise_db_call_duration_seconds', {'operation': operation, 'table': table}, seconds)
+
+def _timed(kind, operation, table, call):
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = call(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            record_call(kind, operation, table(args) if table else None, time.perf_counter() - started, failed)
+    return timed
+
+def _async_timed(kind, operation, table, call):
+    async def timed(*args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await call(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            record_call(kind, operation, table(args), time.perf_counter() - started, failed)
+    return timed
+
+def _first_argument(args):
+    # The table (or the function, for rpc)
+    return args[0] if args else None
+
+class TimedBackend:
+    """Storage backend whose data calls are recorded"""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def async_backend(self):
+        return _TimedAsyncBackend(self._backend.async_backend())
+
+    def __getattr__(self, attr):
+        value = getattr(self._backend, attr)
+        if attr in DATA_OPERATIONS:
+            return _timed('db', attr, _first_argument, value)
+        return value
+
+class _TimedAsyncBackend:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def __getattr__(self, attr):
+        value = getattr(self._backend, attr)
+        if attr in DATA_OPERATIONS:
+            return _async_timed('db', attr, _first_argument, value)
+        return value
+
+class TimedAuth:
+    """Auth API whose calls are recorded"""
+
+    def __init__(self, auth):
+        self._auth = auth
+
+    def __getattr__(self, attr):
+        value = getattr(self._auth, attr)
+        if callable(value) and not attr.startswith('_'):
+            return _timed('auth', attr, None, value)
+        return value
+
+def init_app(app):
+    """Measure every request the Flask app serves"""
+    @app.before_request
+    def _begin_request():
+        rule = request.url_rule
+        request.environ[_ENVIRON_KEY] = RequestScope(rule.rule if rule else 'unmatched')
+
+    @app.after_request
+    def _end_request(response):
+        scope = request.environ.get(_ENVIRON_KEY)
+        if scope is not None:
+            end_request(scope, request.method, response.status_code)
+        return response
+
+# --- Snapshots shared by the workers ---
+
+_flushed_version = None
+_flusher = None
+_flusher_lock = threading.Lock()
+
+def flush():
+    """Write this process's snapshot to METRICS_DIR if it changed since the last write"""
+    global _flushed_version
+    if not METRICS_DIR:
+        return
+    snapshot = registry.snapshot()
+    if snapshot['version'] == _flushed_version:
+        return
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(f'{path}.tmp', path)
+        _flushed_version = snapshot['version']
+    except OSError as e:
+        print(f"Metrics flush failed: {e}")
+
+def _flush_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        flush()
+
+def _start_flusher():
+    # Started by the first request, so only in processes that serve requests
+    global _flusher
+    if METRICS_DIR and _flusher is None:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_periodically, name='metrics-flush', daemon=True)
+                _flusher.start()
+
+def clear_snapshots():
+    """Remove the snapshots of a previous run (gunicorn master, on start)"""
+    if METRICS_DIR:
+        for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+            os.remove(path)
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _add_up(snapshots) -> dict:
+    """Sum of snapshots, series by series"""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0.0) + value
+        for name, labels, counts, total in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            entry = histograms.setdefault(key, [[0] * len(counts), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), counts, total] for (name, labels), (counts, total) in histograms.items()]
+    }
+
+def archive_snapshot(pid: int):
+    """
+    Fold an exited worker's snapshot into the archive (gunicorn master, child_exit)
+
+    Its counts keep adding to /metrics, so counters never go back, but the
+    directory only holds the live workers' files and the archive.
+    """
+    if not METRICS_DIR:
+        return
+    path = os.path.join(METRICS_DIR, f'{pid}.json')
+    snapshot = _read_snapshot(path)
+    try:
+        if snapshot is not None:
+            archive_path = os.path.join(METRICS_DIR, ARCHIVE_FILE)
+            archive = _read_snapshot(archive_path)
+            merged = _add_up([archive, snapshot] if archive else [snapshot])
+            with open(f'{archive_path}.tmp', 'w') as f:
+                json.dump(merged, f, separators=(',', ':'))
+            os.replace(f'{archive_path}.tmp', archive_path)
+        for leftover in (path, f'{path}.tmp'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    except OSError as e:
+        print(f"Metrics archive failed for worker {pid}: {e}")
+
+def collect() -> dict:
+    """Snapshot of every worker added up (this process only without METRICS_DIR)"""
+    if not METRICS_DIR:
+        return registry.snapshot()
+    flush()
+    # Live workers' snapshots plus the archive of the ones that exited
+    snapshots = map(_read_snapshot, glob.glob(os.path.join(METRICS_DIR, '*.json')))
+    return _add_up(s for s in snapshots if s is not None)
+
+# --- Text format ---
+
+def quantile(q: float, buckets, counts) -> float | None:
+    """Estimate a quantile from histogram bucket counts (as histogram_quantile() does)"""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(buckets, counts):
+        if count and cumulative + count >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    # In the +Inf bucket: the largest finite bound is the best estimate
+    return buckets[-1]
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render(snapshot: dict | None = None) -> str:
+    """Prometheus text exposition of a snapshot (default: collect())"""
+    snapshot = snapshot or collect()
+    # name -> [(labels, position, line, value)]: series sorted by labels,
+    # the lines of one histogram kept in bucket order
+    series = {}
+    for name, labels, value in snapshot['counters']:
+        series.setdefault(name, []).append((list(labels), 0, f'{name}{_format_labels(labels)}', value))
+
+    for name, labels, counts, total in snapshot['histograms']:
+        buckets = METRICS[name][2]
+        labels = list(labels)
+        lines = series.setdefault(name, [])
+        cumulative = 0
+        for position, (bound, count) in enumerate(zip(buckets + (math.inf,), counts)):
+            cumulative += count
+            bucket_labels = labels + [('le', _format_value(float(bound)))]
+            lines.append((labels, position, f'{name}_bucket{_format_labels(bucket_labels)}', cumulative))
+        lines.append((labels, len(counts), f'{name}_sum{_format_labels(labels)}', total))
+        lines.append((labels, len(counts) + 1, f'{name}_count{_format_labels(labels)}', cumulative))
+        if name == 'rise_http_request_duration_seconds':
+            for position, q in enumerate(QUANTILES):
+                value = quantile(q, buckets, counts)
+                if value is not None:
+                    quantile_labels = labels + [('quantile', str(q))]
+                    series.setdefault(QUANTILE_METRIC, []).append(
+                        (labels, position, f'{QUANTILE_METRIC}{_format_labels(quantile_labels)}', value)
+                    )
+
+    out = []
+    for name, (kind, help_text, _) in METRICS.items():
+        if name in series:
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} {kind}')
+            out.extend(
+                f'{line} {_format_value(value)}'
+                for _, _, line, value in sorted(series[name], key=lambda entry: (entry[0], entry[1]))
+            )
+    return '\n'.join(out) + '\n'
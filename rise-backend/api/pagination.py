@@ -0,0 +1,89 @@
+"""
+Keyset (cursor) pagination
+
+Pages are read with an indexed ORDER BY over a unique key such as
+(date, id) and continued with "rows after the last one seen" instead of
+OFFSET, so every page costs the same no matter how deep it is. The position
+is handed to clients as an opaque `after` token.
+"""
+import base64
+import json
+
+from .database import select
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(values: list) -> str:
+    """Encode the key values of the last row of a page as an opaque token"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token: str) -> list:
+    """Decode a token from encode_cursor (raises ValueError if malformed)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+def parse_page_size(value) -> int:
+    """Page size from a query parameter, clamped to [1, MAX_PAGE_SIZE]"""
+    try:
+        size = int(value) if value is not None else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def keyset_filters(keys: list, values: list, desc=True) -> list:
+    """
+    Filters selecting rows strictly after values in (keys) order
+
+    For keys (date, id) descending this is
+    date < d OR (date = d AND id < i).
+    """
+    if len(values) != len(keys):
+        raise ValueError('Invalid cursor')
+    op = 'lt' if desc else 'gt'
+    alternatives = []
+    for i, key in enumerate(keys):
+        alternative = {k: v for k, v in zip(keys[:i], values[:i])}
+        alternative[f'{key}__{op}'] = values[i]
+        alternatives.append(alternative)
+    return alternatives
+
+def paginate(table: str, columns: str, filters: dict, keys: list,
+             limit: int, after: str | None = None, desc=True):
+    """
+    Read one page of rows ordered by keys (which must be unique together)
+
+    Args:
+        table: Table name
+        columns: Columns to select; must include all keys
+        filters: Filters applied to every page
+        keys: Sort key columns, e.g. ['date', 'id']
+        limit: Page size
+        after: Token of the previous page's next_cursor, None for the first page
+        desc: Newest first
+
+    Returns:
+        (rows, next_cursor) where next_cursor is None on the last page
+    """
+    or_filters = keyset_filters(keys, decode_cursor(after), desc) if after else None
+    rows = select(
+        table,
+        columns=columns,
+        filters=filters,
+        order=[f'-{k}' if desc else k for k in keys],
+        limit=limit + 1,
+        or_filters=or_filters
+    ) or []
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][k] for k in keys])
+    return rows, next_cursor
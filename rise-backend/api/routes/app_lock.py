@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from ..database import select, insert, update, delete
+from ..database import select, upsert, delete
 
 app_lock_bp = Blueprint('app_lock', __name__)
 
@@ -43,27 +43,11 @@ def save_lock():
         if not all([user_id, lock_type, lock_value]):
             return jsonify({'error': 'Missing fields'}), 400
 
-        existing = select(
-            'app_locks',
-            filters={'user_id': user_id},
-            single=True
-        )
-
-        if existing:
-            update(
-                'app_locks',
-                {
-                    'lock_type': lock_type,
-                    'lock_value': lock_value,
-                },
-                filters={'user_id': user_id}
-            )
-        else:
-            insert('app_locks', {
-                'user_id': user_id,
-                'lock_type': lock_type,
-                'lock_value': lock_value,
-            })
+        upsert('app_locks', {
+            'user_id': user_id,
+            'lock_type': lock_type,
+            'lock_value': lock_value,
+        }, on_conflict=['user_id'])
 
         return jsonify({'success': True}), 200
 
@@ -1,29 +1,245 @@
-from flask import Blueprint, request, jsonify
-from ..database import select
+from flask import Blueprint, request, jsonify, current_app, send_file
+import hashlib
+import json
+import os
+import threading
+from ..database import select, cache, table_scopes
+from ..pagination import decode_cursor, encode_cursor, parse_page_size
+from ..search import SearchIndex
+from ..snapshots import ENCODINGS, SnapshotStore
 
 articles_bp = Blueprint('articles', __name__)
 
+LIST_COLUMNS = 'id, slug, title, summary, hero_image_url, language, is_published, updated_at'
+DETAIL_COLUMNS = 'id, slug, title, summary, hero_image_url, content, language, is_published, updated_at'
+
+# The catalog is rebuilt at least this often...
+ARTICLE_CACHE_TTL = int(os.getenv('ARTICLE_CACHE_TTL', '300'))
+# ...and checked against the table's watermark this often in between
+ARTICLE_CATALOG_CHECK = int(os.getenv('ARTICLE_CATALOG_CHECK', '30'))
+
+# Pre-rendered articles (api/jobs/build_article_snapshots.py), served when present
+snapshots = SnapshotStore(os.getenv(
+    'ARTICLE_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'snapshots', 'articles')
+))
+# Clients and proxies may reuse a snapshot response this many seconds
+# before revalidating it (an article can be edited or unpublished)
+ARTICLE_SNAPSHOT_MAX_AGE = int(os.getenv('ARTICLE_SNAPSHOT_MAX_AGE', '60'))
+
+# Per-language catalog of published articles (list columns, newest first),
+# shared by the workers through the cache under the table:articles scope
+CATALOG_SCOPES = table_scopes('articles')
+
+def _watermark(lang):
+    """Newest updated_at and number of published articles: changes on any edit, publish or removal"""
+    filters = {'is_published': True, 'language': lang}
+    newest = select('articles', columns='updated_at', filters=filters, order='-updated_at', limit=1)
+    return [newest[0]['updated_at'] if newest else None, select('articles', filters=filters, count=True)]
+
+def _etag(*parts):
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:32]
+
+def article_etag(lang, article):
+    """ETag of one version of an article (the same for snapshots and live reads)"""
+    return _etag(lang, article['id'], article['updated_at'])
+
+def render_article(article) -> bytes:
+    """The articles.get response body for a full article row"""
+    return json.dumps({'success': True, 'article': article}, separators=(',', ':'), default=str).encode()
+
+def load_catalog(lang):
+    """
+    The catalog for a language, from the cache when it is still current
+
+    Writes made through the app bump table:articles and drop it right away.
+    Articles are also edited outside the app (e.g. the Supabase dashboard),
+    so once ARTICLE_CATALOG_CHECK seconds have passed since any worker last
+    checked, a two-row watermark query decides whether it has to be read
+    again; a worker that finds it changed bumps the scope for all of them.
+    """
+    catalog = cache.get(f'articles:catalog:{lang}', CATALOG_SCOPES)
+    if catalog and cache.get(f'articles:checked:{lang}', CATALOG_SCOPES):
+        return catalog
+
+    watermark = _watermark(lang)
+    if not catalog or catalog['watermark'] != watermark:
+        if catalog:
+            cache.bump('table:articles')
+        articles = select(
+            'articles',
+            columns=LIST_COLUMNS,
+            filters={'is_published': True, 'language': lang},
+            order=['-updated_at', '-id']
+        ) or []
+        catalog = {
+            'articles': articles,
+            'watermark': watermark,
+            'etag': _etag(lang, articles)
+        }
+        cache.set(f'articles:catalog:{lang}', catalog, CATALOG_SCOPES, ttl=ARTICLE_CACHE_TTL)
+    if ARTICLE_CATALOG_CHECK > 0:
+        cache.set(f'articles:checked:{lang}', True, CATALOG_SCOPES, ttl=ARTICLE_CATALOG_CHECK)
+    return catalog
+
+def find_listed(catalog, slug):
+    """The catalog entry of a slug, None if it is not published"""
+    return next((a for a in catalog['articles'] if a['slug'] == slug), None)
+
+# Per-language search index over published articles, kept in step with the catalog
+_indexes = {}  # lang -> (SearchIndex, etag of the catalog it matches)
+_index_lock = threading.Lock()
+
+# Articles whose text is fetched per query when (re)indexing
+INDEX_CHUNK_SIZE = 200
+
+def load_search_index(lang):
+    """
+    Search index for a language, updated incrementally from the catalog
+
+    Only articles that are new or whose updated_at changed are read and
+    (re)indexed; unpublished or removed ones are dropped. Searches run
+    without the lock, so the update is made on a copy that replaces the
+    shared index once it is complete.
+    """
+    catalog = load_catalog(lang)
+    with _index_lock:
+        index, etag = _indexes.get(lang, (None, None))
+        if index is not None and etag == catalog['etag']:
+            return index
+        index = index.copy() if index is not None else SearchIndex(lang)
+
+        listed = {a['id']: a['updated_at'] for a in catalog['articles']}
+        for doc_id in [d for d in index.versions if d not in listed]:
+            index.remove(doc_id)
+        stale = [i for i, version in listed.items() if index.versions.get(i) != version]
+        for start in range(0, len(stale), INDEX_CHUNK_SIZE):
+            for row in select(
+                'articles',
+                columns='id, title, summary, content, updated_at',
+                filters={'id__in': stale[start:start + INDEX_CHUNK_SIZE]}
+            ) or []:
+                index.add(
+                    row['id'],
+                    [(row.get('title'), 3), (row.get('summary'), 2), (row.get('content'), 1)],
+                    version=listed[row['id']]
+                )
+
+        _indexes[lang] = (index, catalog['etag'])
+        return index
+
+def _page(articles, limit, after):
+    """Keyset page over the catalog, same cursors as api/pagination.paginate"""
+    start = 0
+    if after:
+        position = decode_cursor(after)
+        if len(position) != 2:
+            raise ValueError('Invalid cursor')
+        position = tuple(position)
+        while start < len(articles) and (articles[start]['updated_at'], articles[start]['id']) >= position:
+            start += 1
+    rows = articles[start:start + limit]
+    next_cursor = None
+    if start + limit < len(articles):
+        next_cursor = encode_cursor([rows[-1]['updated_at'], rows[-1]['id']])
+    return rows, next_cursor
+
+def _conditional(etag, build):
+    """304 if the client already has etag, otherwise build()'s response tagged with it"""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+    if response.status_code in (200, 304):
+        response.set_etag(etag)
+        # Clients may keep the body but must revalidate it before use
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _snapshot_response(snapshot):
+    """
+    Serve a pre-rendered article in the best encoding the client accepts
+
+    Returns:
+        The response, or None when the file is gone (a newer build removed it)
+    """
+    if request.if_none_match.contains(snapshot['etag']):
+        response = current_app.response_class(status=304)
+    else:
+        encoding = next(
+            (e for e in ENCODINGS if e in snapshot['files'] and request.accept_encodings[e]),
+            None
+        )
+        try:
+            file = snapshots.open(snapshot['files'][encoding or 'identity'])
+        except OSError:
+            return None
+        response = send_file(file, mimetype='application/json', conditional=False, etag=False)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(snapshot['etag'])
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ARTICLE_SNAPSHOT_MAX_AGE}, must-revalidate'
+    return response
+
 @articles_bp.route('/articles.getAll', methods=['GET'])
 def get_all_articles():
     """Get all published articles (light list)"""
     try:
         lang = request.args.get('lang', 'en')
+        catalog = load_catalog(lang)
 
-        rows = select(
-            'articles',
-            columns='id, slug, title, summary, hero_image_url, language, is_published, updated_at'
-        ) or []
-
-        rows = [r for r in rows if r.get('is_published') is True and r.get('language') == lang]
-        rows.sort(key=lambda x: x.get('updated_at') or '', reverse=True)
+        # Paged (most recently updated first) when asked for with limit/after
+        if 'limit' in request.args or 'after' in request.args:
+            limit = parse_page_size(request.args.get('limit'))
+            after = request.args.get('after')
+            rows, next_cursor = _page(catalog['articles'], limit, after)
+            return _conditional(
+                _etag(catalog['etag'], limit, after),
+                lambda: jsonify({'success': True, 'articles': rows, 'nextCursor': next_cursor})
+            )
 
-        return jsonify({'success': True, 'articles': rows}), 200
+        return _conditional(
+            catalog['etag'],
+            lambda: jsonify({'success': True, 'articles': catalog['articles']})
+        )
 
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         print(f"articles.getAll error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@articles_bp.route('/articles.search', methods=['GET'])
+def search_articles():
+    """Search published articles by title, summary and content (best match first)"""
+    try:
+        query = (request.args.get('q') or '').strip()
+        lang = request.args.get('lang', 'en')
+
+        if not query:
+            return jsonify({'success': False, 'error': 'q required'}), 400
+
+        limit = parse_page_size(request.args.get('limit'))
+        by_id = {a['id']: a for a in load_catalog(lang)['articles']}
+        matches = load_search_index(lang).search(query, limit)
+
+        return jsonify({
+            'success': True,
+            'articles': [
+                {**by_id[doc_id], 'score': round(score, 4)}
+                for doc_id, score in matches if doc_id in by_id
+            ]
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"articles.search error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @articles_bp.route('/articles.get', methods=['GET'])
 def get_article():
     """Get one published article by slug (full content)"""
@@ -34,18 +250,39 @@ def get_article():
         if not slug:
             return jsonify({'success': False, 'error': 'slug required'}), 400
 
-        row = select(
-            'articles',
-            columns='id, slug, title, summary, hero_image_url, content, language, is_published, updated_at',
-            filters={'slug': slug, 'language': lang},
-            single=True
-        )
-
-        if not row or row.get('is_published') is not True or row.get('language') != lang:
+        listed = find_listed(load_catalog(lang), slug)
+        if not listed:
             return jsonify({'success': False, 'error': 'Article not found'}), 404
 
-        return jsonify({'success': True, 'article': row}), 200
+        # Only a snapshot of the version the catalog lists; an article edited
+        # since the last build is read live until the next one
+        snapshot = snapshots.find(lang, slug)
+        if snapshot and snapshot['etag'] == article_etag(lang, listed):
+            response = _snapshot_response(snapshot)
+            if response is not None:
+                return response
+
+        def build():
+            # Content is cached per version of the article
+            row = cache.get_or_load(
+                f"articles:item:{lang}:{slug}:{listed['updated_at']}",
+                lambda: select(
+                    'articles',
+                    columns=DETAIL_COLUMNS,
+                    filters={'slug': slug, 'language': lang},
+                    single=True
+                ),
+                scopes=table_scopes('articles'),
+                ttl=ARTICLE_CACHE_TTL
+            )
+            if not row or row.get('is_published') is not True or row.get('language') != lang:
+                response = jsonify({'success': False, 'error': 'Article not found'})
+                response.status_code = 404
+                return response
+            return jsonify({'success': True, 'article': row})
+
+        return _conditional(article_etag(lang, listed), build)
 
     except Exception as e:
         print(f"articles.get error: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify
 from functools import wraps
-import jwt
-from ..database import select, insert, update, supabase
+from ..database import select, insert, update, increment, auth, verify_token as verify_access_token, token_verifier
 
 auth_bp = Blueprint('auth', __name__)
 
+# Columns returned to the client for a user profile
+PROFILE_COLUMNS = 'id, first_name, last_name, username, email, total_points, stars, created_at'
+
 def verify_token(f):
     """Decorator to verify JWT token"""
     @wraps(f)
@@ -19,8 +21,8 @@ def verify_token(f):
             if token.startswith('Bearer '):
                 token = token[7:]
             
-            # Verify token with Supabase
-            user = supabase.auth.get_user(token)
+            # Verify token (locally when possible, cached until expiry)
+            user = verify_access_token(token)
             
             if not user:
                 return jsonify({'error': 'Invalid token'}), 401
@@ -56,7 +58,7 @@ def register():
             return jsonify({'error': 'Username already exists'}), 400
         
         # Create user in Supabase Auth
-        auth_response = supabase.auth.sign_up({
+        auth_response = auth.sign_up({
             'email': email,
             'password': password,
             'options': {
@@ -124,7 +126,7 @@ def login():
             email = user_record['email']
 
         # Sign in with Supabase Auth
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = auth.sign_in_with_password({
             'email': email,
             'password': password
         })
@@ -135,7 +137,7 @@ def login():
         # Get user data from our users table
         user_record = select(
             'users',
-            columns='id, first_name, last_name, username, email, total_points, stars, created_at',
+            columns=PROFILE_COLUMNS,
             filters={'auth_id': str(auth_response.user.id)},
             single=True
         )
@@ -162,7 +164,8 @@ def login():
 def logout():
     """Logout user from Supabase Auth"""
     try:
-        supabase.auth.sign_out()
+        token_verifier.forget(request.headers.get('Authorization', '').replace('Bearer ', '', 1))
+        auth.sign_out()
         return jsonify({'success': True}), 200
     except Exception as e:
         print(f"Error in logout: {e}")
@@ -179,7 +182,7 @@ def refresh_token():
             return jsonify({'error': 'Refresh token required'}), 400
         
         # Refresh session
-        auth_response = supabase.auth.refresh_session(refresh_token)
+        auth_response = auth.refresh_session(refresh_token)
         
         if not auth_response.session:
             return jsonify({'error': 'Failed to refresh token'}), 401
@@ -207,7 +210,7 @@ def get_profile():
         
         result = select(
             'users',
-            columns='id, first_name, last_name, username, email, total_points, stars, created_at',
+            columns=PROFILE_COLUMNS,
             filters={'auth_id': str(auth_id)},
             single=True
         )
@@ -258,7 +261,7 @@ def update_profile():
             
             # Also update email in Supabase Auth
             try:
-                supabase.auth.update_user({'email': data['email']})
+                auth.update_user({'email': data['email']})
             except Exception as e:
                 print(f"Error updating email in Supabase Auth: {e}")
         
@@ -288,7 +291,7 @@ def update_password():
             return jsonify({'error': 'Password must be at least 6 characters'}), 400
         
         # Update password in Supabase Auth
-        supabase.auth.update_user({'password': password})
+        auth.update_user({'password': password})
         
         return jsonify({'success': True}), 200
         
@@ -348,25 +351,21 @@ def award_points():
         if points is None:
             return jsonify({'error': 'Points required'}), 400
         
-        # Get current points
-        user = select('users', filters={'auth_id': str(auth_id)}, single=True)
+        # Add points atomically, not letting them go below 0
+        new_points = increment(
+            'users',
+            'total_points',
+            filters={'auth_id': str(auth_id)},
+            delta=points,
+            floor=0
+        )
         
-        if not user:
+        if new_points is None:
             return jsonify({'error': 'User not found'}), 404
         
-        current_points = user.get('total_points', 0)
-        new_points = current_points + points
-        
-        # Don't let points go below 0
-        if new_points < 0:
-            new_points = 0
-        
-        # Update points
-        result = update('users', {'total_points': new_points}, filters={'auth_id': str(auth_id)})
-        
         return jsonify({
             'success': True,
-            'newTotal': new_points
+            'newTotal': int(new_points)
         }), 200
         
     except Exception as e:
@@ -0,0 +1,117 @@
+from flask import Blueprint, request, jsonify, current_app
+from werkzeug.test import EnvironBuilder
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+batch_bp = Blueprint('batch', __name__)
+
+# Upper bound on sub-calls per batch
+MAX_BATCH_CALLS = 25
+
+# GET routes with no side effects, the only calls run concurrently (some GET
+# routes write, e.g. plant.get creates the plant row on first use)
+CONCURRENT_PATHS = frozenset({
+    '/articles.get', '/articles.getAll', '/articles.search',
+    '/habits.checkExists', '/habits.get', '/habits.getByTitle', '/habits.getCompleted',
+    '/home.getRange', '/home.status',
+    '/journals.changes', '/journals.get', '/journals.getOne', '/journals.search',
+    '/lock.get',
+    '/moods.getAll', '/moods.getByMonth', '/moods.today',
+    '/user.profile',
+})
+
+# Headers of the batch request passed on to every sub-call
+FORWARDED_HEADERS = ('Authorization', 'Accept-Language')
+
+# Separate from the dashboard pool: a batched /home.dashboard call waits on
+# that pool from inside this one
+_batch_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BATCH_WORKERS', '8')),
+    thread_name_prefix='batch'
+)
+
+def dispatch(app, call, headers):
+    """
+    Run one sub-call through the app's own routing and return its result
+
+    Each call gets its own app context, so its flask.g (and the identity
+    map on it) is not shared with the batch request or other calls.
+    """
+    method = (call.get('method') or 'GET').upper()
+    path = call.get('path') or ''
+    base, _, query = path.partition('?')
+
+    builder = EnvironBuilder(
+        path=base,
+        query_string=query,
+        method=method,
+        headers=headers,
+        json=call.get('body') if method != 'GET' else None
+    )
+    try:
+        with app.app_context(), app.request_context(builder.get_environ()):
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                print(f"Error in batch call {method} {path}: {e}")
+                return {'status': 500, 'body': {'error': 'Internal server error'}}
+            return {
+                'status': response.status_code,
+                'body': response.get_json(silent=True)
+            }
+    finally:
+        builder.close()
+
+@batch_bp.route('/batch', methods=['POST'])
+def batch():
+    """
+    Run several API calls in one request
+
+    Body: {"calls": [{"method": "GET", "path": "/moods.today?userId=1&date=...",
+                      "body": {...}}, ...]}
+
+    Consecutive GET calls to side-effect-free routes (CONCURRENT_PATHS) run
+    concurrently; any other call waits for everything before it and runs
+    alone, so writes keep their order.
+    Results come back in the order of the calls.
+    """
+    try:
+        data = request.get_json()
+        calls = (data or {}).get('calls')
+
+        if not isinstance(calls, list) or not calls:
+            return jsonify({'error': 'calls required'}), 400
+        if len(calls) > MAX_BATCH_CALLS:
+            return jsonify({'error': f'At most {MAX_BATCH_CALLS} calls per batch'}), 400
+        for call in calls:
+            if not isinstance(call, dict) or not str(call.get('path', '')).startswith('/'):
+                return jsonify({'error': 'Each call needs a path'}), 400
+            if call['path'].split('?')[0] == '/batch':
+                return jsonify({'error': 'Nested batches are not allowed'}), 400
+
+        app = current_app._get_current_object()
+        headers = {h: request.headers[h] for h in FORWARDED_HEADERS if h in request.headers}
+
+        results = [None] * len(calls)
+        pending = []  # indexes of the current run of concurrent reads
+
+        def flush_reads():
+            futures = [(i, _batch_pool.submit(dispatch, app, calls[i], headers)) for i in pending]
+            for i, future in futures:
+                results[i] = future.result()
+            pending.clear()
+
+        for i, call in enumerate(calls):
+            method = (call.get('method') or 'GET').upper()
+            if method == 'GET' and call['path'].split('?')[0] in CONCURRENT_PATHS:
+                pending.append(i)
+            else:
+                flush_reads()
+                results[i] = dispatch(app, call, headers)
+        flush_reads()
+
+        return jsonify({'success': True, 'results': results}), 200
+
+    except Exception as e:
+        print(f"Error in batch: {e}")
+        return jsonify({'error': str(e)}), 500
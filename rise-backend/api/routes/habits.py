@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
-from ..database import select, insert, update, delete
+import os
+from ..database import select, insert, update, delete, increment
 from datetime import datetime, timedelta, timezone
+from ..streaks import period_ordinal, advances_streak, breaks_when_idle, next_streak
 
 habits_bp = Blueprint('habits', __name__)
 
@@ -127,9 +129,127 @@ def _handle_period_transition(habit, frequency, now):
         'best_streak': best_streak
     }
 
+def _completion_row(habit, status, advanced, ordinal, now, restored_to=None):
+    """A habit_completions log row for a streak event"""
+    return {
+        'habit_id': habit['id'],
+        'user_id': habit['user_id'],
+        'status': status,
+        'advanced': advanced,
+        'bridges': restored_to is not None,
+        'restored_to': restored_to,
+        'period_ordinal': ordinal,
+        'completed_at': now.isoformat()
+    }
+
+def _log_completion(habit, status, advanced, ordinal, now, restored_to=None):
+    """Append a streak event to the habit_completions log"""
+    insert('habit_completions', _completion_row(habit, status, advanced, ordinal, now, restored_to))
+
+def _needs_reset(habit, now):
+    """Check if a habit's period has ended since it was last updated"""
+    last_updated_str = habit.get('last_updated')
+    last_updated = _parse_timestamp(last_updated_str) if last_updated_str else None
+    
+    if not last_updated or habit.get('status') == 'active':
+        return False
+    
+    frequency = (habit.get('frequency') or '').lower()
+    if frequency == 'daily':
+        return not _is_same_day_utc(last_updated, now)
+    elif frequency == 'weekly':
+        return not _is_same_week_utc(last_updated, now)
+    elif frequency == 'monthly':
+        return not _is_same_month_utc(last_updated, now)
+    return False
+
+def _current_state(habit, now):
+    """Return the habit as it is after any pending period reset (no write)"""
+    if _needs_reset(habit, now):
+        habit = dict(habit)
+        habit.update(_handle_period_transition(habit, habit['frequency'], now))
+    return habit
+
+# Bulk updates use id=in.(...) in the query string, keep it a sane length
+ROLLOVER_CHUNK_SIZE = 200
+
+def rollover_habits(now=None, user_id=None, page_size=1000):
+    """
+    Reset every habit whose day/week/month ended, across all users (or one)
+    
+    Stale habits are read in id-ordered pages and reset with one bulk update
+    per resulting streak value instead of one update per habit.
+    
+    Returns:
+        Number of habits reset
+    """
+    now = now or _get_utc_now()
+    # Every period (day, week, month) starts at a midnight, so anything
+    # updated today cannot be stale
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    filters = {
+        'status__neq': 'active',
+        'last_updated__lt': day_start.isoformat()
+    }
+    if user_id is not None:
+        filters['user_id'] = user_id
+    
+    reset_count = 0
+    last_id = 0
+    while True:
+        page = select(
+            'habits',
+            columns='id, frequency, status, habit_type, streak_count, best_streak, last_updated, last_completed_date',
+            filters={**filters, 'id__gt': last_id},
+            order='id',
+            limit=page_size
+        )
+        if not page:
+            break
+        last_id = page[-1]['id']
+        
+        # Group by the streak the habit ends up with
+        by_streak = {}
+        for habit in page:
+            if _needs_reset(habit, now):
+                reset_data = _handle_period_transition(habit, habit['frequency'], now)
+                by_streak.setdefault(reset_data['streak_count'], []).append(habit['id'])
+        
+        for streak, ids in by_streak.items():
+            for i in range(0, len(ids), ROLLOVER_CHUNK_SIZE):
+                # Re-check staleness: a habit completed since the page was
+                # read is left alone instead of reset with its old streak
+                reset = update('habits', {
+                    'status': 'active',
+                    'last_updated': now.isoformat(),
+                    'streak_count': streak
+                }, filters={**filters, 'id__in': ids[i:i + ROLLOVER_CHUNK_SIZE]})
+                reset_count += len(reset or [])
+        
+        if len(page) < page_size:
+            break
+    
+    return reset_count
+
+def current_habits(habits):
+    """Habits as they are after any pending period reset (the rollover job persists it)"""
+    now = _get_utc_now()
+    return [_current_state(habit, now) for habit in habits or []]
+
+def load_habits(user_id, frequency=None):
+    """Get a user's habits with pending period resets applied (no write)"""
+    filters = {'user_id': int(user_id)}
+    if frequency:
+        filters['frequency'] = frequency
+    
+    result = select('habits', filters=filters)
+    
+    return current_habits(result)
+
 @habits_bp.route('/habits.get', methods=['GET'])
 def get_habits():
-    """Get all habits for a user with automatic period resets"""
+    """Get all habits for a user with pending period resets applied"""
     try:
         user_id = request.args.get('userId')
         frequency = request.args.get('frequency')
@@ -137,41 +257,7 @@ def get_habits():
         if not user_id:
             return jsonify({'error': 'userId required'}), 400
         
-        filters = {'user_id': int(user_id)}
-        if frequency:
-            filters['frequency'] = frequency
-        
-        result = select('habits', filters=filters)
-
-        if not result:
-            return jsonify({'success': True, 'habits': []}), 200
-        
-        # Check if habits need reset based on period
-        now = _get_utc_now()
-        updated_habits = []
-        
-        for habit in result:
-            last_updated_str = habit.get('last_updated')
-            last_updated = _parse_timestamp(last_updated_str) if last_updated_str else None
-            
-            habit_frequency = habit['frequency']
-            should_reset = False
-            
-            if last_updated:
-                if habit_frequency.lower() == 'daily':
-                    should_reset = not _is_same_day_utc(last_updated, now)
-                elif habit_frequency.lower() == 'weekly':
-                    should_reset = not _is_same_week_utc(last_updated, now)
-                elif habit_frequency.lower() == 'monthly':
-                    should_reset = not _is_same_month_utc(last_updated, now)
-            
-            if should_reset and habit['status'] != 'active':
-                # Handle period transition and reset
-                reset_data = _handle_period_transition(habit, habit_frequency, now)
-                update('habits', reset_data, filters={'id': habit['id']})
-                habit.update(reset_data)
-            
-            updated_habits.append(habit)
+        updated_habits = load_habits(user_id, frequency)
         
         return jsonify({
             'success': True,
@@ -254,6 +340,66 @@ def update_habit():
         print(f"Error in update_habit: {e}")
         return jsonify({'error': str(e)}), 500
 
+def status_transition(habit, status, now):
+    """
+    Apply a status change to a habit (no write)
+    
+    Args:
+        habit: Habit row
+        status: New status ('completed', 'skipped' or 'active')
+        now: Time of the change
+    
+    Returns:
+        (update_data, completion) where completion is the habit_completions
+        row to log, or None if the change does not affect the streak
+    """
+    # Apply a pending period reset first (it is persisted with update_data)
+    habit = _current_state(habit, now)
+    current_streak = habit.get('streak_count', 0)
+    best_streak = habit.get('best_streak', 0)
+    habit_type = habit.get('habit_type', 'good')
+    is_task = habit.get('is_task', True)
+    last_completed_str = habit.get('last_completed_date')
+    last_completed = _parse_timestamp(last_completed_str) if last_completed_str else None
+    
+    # Calculate new streak based on status
+    new_streak = current_streak
+    new_best_streak = best_streak
+    new_last_completed = last_completed
+    new_is_task = is_task
+    completion = None
+    
+    if status in ('completed', 'skipped'):
+        # Good habits: 'completed' extends the streak, 'skipped' breaks it.
+        # Bad habits: 'skipped' (resisted) extends it, 'completed' breaks it.
+        advanced = advances_streak(habit_type, status)
+        ordinal = period_ordinal(habit['frequency'], now)
+        last_ordinal = period_ordinal(habit['frequency'], last_completed) if last_completed else None
+        new_streak, new_best_streak = next_streak(
+            current_streak, best_streak, last_ordinal, ordinal, advanced,
+            idle_breaks=breaks_when_idle(habit_type)
+        )
+        new_last_completed = now
+        completion = _completion_row(habit, status, advanced, ordinal, now)
+        
+        # Check if task should become habit (10 consecutive periods)
+        if advanced and is_task and new_streak >= 10:
+            new_is_task = False
+    
+    elif status == 'active':
+        # Resetting - keep current streak and last_completed_date
+        pass
+    
+    update_data = {
+        'status': status,
+        'last_updated': now.isoformat(),
+        'streak_count': new_streak,
+        'best_streak': new_best_streak,
+        'is_task': new_is_task,
+        'last_completed_date': new_last_completed.isoformat() if new_last_completed else None
+    }
+    return update_data, completion
+
 @habits_bp.route('/habits.updateStatus', methods=['PUT'])
 def update_habit_status():
     """Update habit status with streak tracking and task-to-habit conversion"""
@@ -271,64 +417,7 @@ def update_habit_status():
         if not habit:
             return jsonify({'error': 'Habit not found'}), 404
         
-        now = _get_utc_now()
-        current_streak = habit.get('streak_count', 0)
-        best_streak = habit.get('best_streak', 0)
-        habit_type = habit.get('habit_type', 'good')
-        is_task = habit.get('is_task', True)
-        last_completed_str = habit.get('last_completed_date')
-        last_completed = _parse_timestamp(last_completed_str) if last_completed_str else None
-        
-        # Calculate new streak based on status
-        new_streak = current_streak
-        new_best_streak = best_streak
-        new_last_completed = last_completed
-        new_is_task = is_task
-        
-        if status == 'completed':
-            # For good habits, increment streak
-            if habit_type == 'good':
-                new_streak = current_streak + 1
-                if new_streak > best_streak:
-                    new_best_streak = new_streak
-                new_last_completed = now
-                
-                # Check if task should become habit (10 consecutive completions)
-                if is_task and new_streak >= 10:
-                    new_is_task = False
-            # For bad habits, 'completed' means they did the bad habit - break streak
-            else:
-                new_streak = 0
-                new_last_completed = now
-        
-        elif status == 'skipped':
-            # For bad habits, 'skipped' means they resisted - increment streak
-            if habit_type == 'bad':
-                new_streak = current_streak + 1
-                if new_streak > best_streak:
-                    new_best_streak = new_streak
-                new_last_completed = now
-                
-                # Check if task should become habit (10 consecutive resistances)
-                if is_task and new_streak >= 10:
-                    new_is_task = False
-            # For good habits, skipping breaks the streak
-            else:
-                new_streak = 0
-                new_last_completed = now
-        
-        elif status == 'active':
-            # Resetting - keep current streak and last_completed_date
-            pass
-        
-        update_data = {
-            'status': status,
-            'last_updated': now.isoformat(),
-            'streak_count': new_streak,
-            'best_streak': new_best_streak,
-            'is_task': new_is_task,
-            'last_completed_date': new_last_completed.isoformat() if new_last_completed else None
-        }
+        update_data, completion = status_transition(habit, status, _get_utc_now())
         
         result = update(
             'habits',
@@ -336,6 +425,9 @@ def update_habit_status():
             filters={'user_id': user_id, 'title': title}
         )
         
+        if completion:
+            insert('habit_completions', completion)
+        
         return jsonify({'success': True}), 200
         
     except Exception as e:
@@ -388,32 +480,36 @@ def restore_streak():
         if not within_grace_period:
             return jsonify({'error': 'Grace period expired'}), 400
         
-        # Get user's current points
-        user = select('users', filters={'id': user_id}, single=True)
+        user = select('users', columns='id', filters={'id': user_id}, single=True)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        current_points = user.get('total_points', 0)
         best_streak = habit.get('best_streak', 0)
         restoration_cost = best_streak * 10  # 10 points per streak day
         
-        if current_points < restoration_cost:
+        # Deduct points in the database, only if the balance covers them
+        # (a balance read here could already be out of date)
+        if increment('users', 'total_points', filters={'id': user_id},
+                     delta=-restoration_cost, minimum=0) is None:
             return jsonify({'error': 'Insufficient points'}), 400
         
-        # Deduct points and restore streak
-        update('users', 
-               {'total_points': current_points - restoration_cost},
-               filters={'id': user_id})
+        # Restore streak
         
+        ordinal = period_ordinal(habit['frequency'], now)
+        new_streak, _ = next_streak(habit.get('streak_count', 0), best_streak, None, ordinal, True,
+                                    restored_to=best_streak)
         update('habits',
                {
-                   'streak_count': best_streak,
+                   'streak_count': new_streak,
                    'last_completed_date': now.isoformat(),
                    'status': 'completed',
                    'last_updated': now.isoformat()
                },
                filters={'user_id': user_id, 'title': habit_key})
         
+        # Rebuilding streaks from the log resets the run to the restored value
+        _log_completion(habit, 'restored', True, ordinal, now, restored_to=new_streak)
+        
         return jsonify({'success': True}), 200
         
     except Exception as e:
@@ -430,29 +526,7 @@ def check_and_reset():
         if not user_id:
             return jsonify({'error': 'userId required'}), 400
         
-        habits = select('habits', filters={'user_id': user_id})
-        now = _get_utc_now()
-        
-        for habit in habits:
-            last_updated_str = habit.get('last_updated')
-            last_updated = _parse_timestamp(last_updated_str) if last_updated_str else None
-            
-            if not last_updated:
-                continue
-                
-            frequency = habit['frequency']
-            should_reset = False
-            
-            if frequency.lower() == 'daily':
-                should_reset = not _is_same_day_utc(last_updated, now)
-            elif frequency.lower() == 'weekly':
-                should_reset = not _is_same_week_utc(last_updated, now)
-            elif frequency.lower() == 'monthly':
-                should_reset = not _is_same_month_utc(last_updated, now)
-            
-            if should_reset and habit['status'] != 'active':
-                reset_data = _handle_period_transition(habit, frequency, now)
-                update('habits', reset_data, filters={'id': habit['id']})
+        rollover_habits(user_id=user_id)
         
         return jsonify({'success': True}), 200
         
@@ -460,6 +534,24 @@ def check_and_reset():
         print(f"Error in check_and_reset: {e}")
         return jsonify({'error': str(e)}), 500
 
+@habits_bp.route('/habits.rollover', methods=['GET', 'POST'])
+def rollover():
+    """Reset all users' habits whose period ended (scheduled job)"""
+    try:
+        cron_secret = os.getenv('CRON_SECRET')
+        if not cron_secret:
+            return jsonify({'error': 'Rollover not configured'}), 403
+        if request.headers.get('Authorization') != f'Bearer {cron_secret}':
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        reset_count = rollover_habits()
+        
+        return jsonify({'success': True, 'reset': reset_count}), 200
+        
+    except Exception as e:
+        print(f"Error in rollover: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @habits_bp.route('/habits.resetDaily', methods=['POST'])
 def reset_daily():
     """Reset all daily habits"""
@@ -547,7 +639,7 @@ def check_habit_exists():
         if frequency:
             filters['frequency'] = frequency
 
-        habits = select('habits', filters=filters)
+        habits = select('habits', columns='id', filters=filters, limit=1)
 
         return jsonify({
             'success': True,
@@ -567,14 +659,16 @@ def get_completed_habits():
         if not user_id:
             return jsonify({'error': 'userId required'}), 400
         
-        result = select(
+        count = select(
             'habits',
-            filters={'user_id': int(user_id), 'status': 'completed'}
+            columns='id',
+            filters={'user_id': int(user_id), 'status': 'completed'},
+            count=True
         )
         
         return jsonify({
             'success': True,
-            'count': len(result) if result else 0
+            'count': count
         }), 200
         
     except Exception as e:
@@ -1,9 +1,45 @@
-from flask import Blueprint, request, jsonify
-from ..database import select, insert, update
+from flask import Blueprint, request, jsonify, copy_current_request_context
+from concurrent.futures import ThreadPoolExecutor
+import os
+from ..database import select, upsert, increment, cache, user_scopes
+from .auth import PROFILE_COLUMNS, verify_token
+from .habits import load_habits
+from .moods import load_mood
+from .plant import load_plant
 from datetime import datetime
 
 home_bp = Blueprint('home', __name__)
 
+# Shared, bounded pool for the dashboard fan-out
+_dashboard_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('DASHBOARD_WORKERS', '8')),
+    thread_name_prefix='dashboard'
+)
+
+# Writes invalidate a cached dashboard right away; the TTL covers what
+# changes with the clock alone (habit periods rolling over)
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '60'))
+
+def status_or_default(result):
+    """A home_status row, or the default values if the date was not saved yet"""
+    if not result:
+        result = {
+            'water_count': 0,
+            'water_goal': 8,
+            'detox_progress': 0.0
+        }
+    return result
+
+def load_status(user_id, date):
+    """Get home status for a date, with default values if not saved yet"""
+    result = select(
+        'home_status',
+        filters={'user_id': int(user_id), 'date': date},
+        single=True
+    )
+    
+    return status_or_default(result)
+
 @home_bp.route('/home.status', methods=['GET'])
 def get_status():
     """Get home status for a specific date"""
@@ -14,19 +50,7 @@ def get_status():
         if not user_id or not date:
             return jsonify({'error': 'userId and date required'}), 400
         
-        result = select(
-            'home_status',
-            filters={'user_id': int(user_id), 'date': date},
-            single=True
-        )
-        
-        # Return default values if not found
-        if not result:
-            result = {
-                'water_count': 0,
-                'water_goal': 8,
-                'detox_progress': 0.0
-            }
+        result = load_status(user_id, date)
         
         return jsonify({
             'success': True,
@@ -49,31 +73,13 @@ def save_status():
         if not all([user_id, date, status]):
             return jsonify({'error': 'Missing required fields'}), 400
         
-        # Check if status exists for this date
-        existing = select(
-            'home_status',
-            filters={'user_id': user_id, 'date': date},
-            single=True
-        )
-        
-        status_data = {
+        upsert('home_status', {
+            'user_id': user_id,
+            'date': date,
             'water_count': status.get('waterCount', 0),
             'water_goal': status.get('waterGoal', 8),
             'detox_progress': status.get('detoxProgress', 0.0)
-        }
-        
-        if existing:
-            # Update existing status
-            result = update(
-                'home_status',
-                status_data,
-                filters={'user_id': user_id, 'date': date}
-            )
-        else:
-            # Insert new status
-            status_data['user_id'] = user_id
-            status_data['date'] = date
-            result = insert('home_status', status_data)
+        }, on_conflict=['user_id', 'date'])
         
         return jsonify({'success': True}), 200
         
@@ -92,32 +98,16 @@ def increment_water():
         if not all([user_id, date]):
             return jsonify({'error': 'userId and date required'}), 400
         
-        # Get current status
-        existing = select(
+        # Creates today's row (count = 1) if it does not exist yet
+        new_count = increment(
             'home_status',
+            'water_count',
             filters={'user_id': user_id, 'date': date},
-            single=True
+            delta=1,
+            upsert=True
         )
         
-        if existing:
-            # Increment water count
-            new_count = existing.get('water_count', 0) + 1
-            result = update(
-                'home_status',
-                {'water_count': new_count},
-                filters={'user_id': user_id, 'date': date}
-            )
-        else:
-            # Create new status with count = 1
-            result = insert('home_status', {
-                'user_id': user_id,
-                'date': date,
-                'water_count': 1,
-                'water_goal': 8,
-                'detox_progress': 0.0
-            })
-        
-        return jsonify({'success': True}), 200
+        return jsonify({'success': True, 'waterCount': int(new_count)}), 200
         
     except Exception as e:
         print(f"Error in increment_water: {e}")
@@ -134,24 +124,19 @@ def decrement_water():
         if not all([user_id, date]):
             return jsonify({'error': 'userId and date required'}), 400
         
-        # Get current status
-        existing = select(
+        # Don't go below 0; nothing to do if there is no row for this date
+        new_count = increment(
             'home_status',
+            'water_count',
             filters={'user_id': user_id, 'date': date},
-            single=True
+            delta=-1,
+            floor=0
         )
         
-        if existing:
-            # Decrement water count (don't go below 0)
-            current_count = existing.get('water_count', 0)
-            new_count = max(0, current_count - 1)
-            result = update(
-                'home_status',
-                {'water_count': new_count},
-                filters={'user_id': user_id, 'date': date}
-            )
-        
-        return jsonify({'success': True}), 200
+        return jsonify({
+            'success': True,
+            'waterCount': int(new_count) if new_count is not None else 0
+        }), 200
         
     except Exception as e:
         print(f"Error in decrement_water: {e}")
@@ -169,29 +154,13 @@ def update_detox():
         if not all([user_id, date]) or detox_progress is None:
             return jsonify({'error': 'Missing required fields'}), 400
         
-        # Get current status
-        existing = select(
-            'home_status',
-            filters={'user_id': user_id, 'date': date},
-            single=True
-        )
-        
-        if existing:
-            # Update detox progress
-            result = update(
-                'home_status',
-                {'detox_progress': detox_progress},
-                filters={'user_id': user_id, 'date': date}
-            )
-        else:
-            # Create new status
-            result = insert('home_status', {
-                'user_id': user_id,
-                'date': date,
-                'water_count': 0,
-                'water_goal': 8,
-                'detox_progress': detox_progress
-            })
+        # water_count / water_goal fall back to their column defaults
+        # when the row does not exist yet
+        upsert('home_status', {
+            'user_id': user_id,
+            'date': date,
+            'detox_progress': detox_progress
+        }, on_conflict=['user_id', 'date'])
         
         return jsonify({'success': True}), 200
         
@@ -210,21 +179,16 @@ def get_range():
         if not all([user_id, start_date, end_date]):
             return jsonify({'error': 'userId, startDate, and endDate required'}), 400
         
-        # Get all statuses for user (Supabase doesn't support range queries easily)
         result = select(
             'home_status',
-            filters={'user_id': int(user_id)}
+            filters={
+                'user_id': int(user_id),
+                'date__gte': start_date,
+                'date__lte': end_date
+            },
+            order='date'
         )
         
-        # Filter by date range
-        if result:
-            filtered = []
-            for status in result:
-                status_date = status.get('date', '')
-                if start_date <= status_date <= end_date:
-                    filtered.append(status)
-            result = filtered
-        
         return jsonify({
             'success': True,
             'statuses': result or []
@@ -232,4 +196,80 @@ def get_range():
         
     except Exception as e:
         print(f"Error in get_range: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def load_dashboard(user, date):
+    """Read the dashboard data of a users row (queries run in parallel)"""
+    user_id = user['id']
+    loaders = {
+        'status': lambda: load_status(user_id, date),
+        'mood': lambda: load_mood(user_id, date),
+        'habits': lambda: load_habits(user_id),
+        'plant': lambda: load_plant(user_id),
+    }
+    futures = {
+        name: _dashboard_pool.submit(copy_current_request_context(loader))
+        for name, loader in loaders.items()
+    }
+    return dashboard_payload({'user': user, **{name: future.result() for name, future in futures.items()}})
+
+def check_dashboard_user(user, requested_id):
+    """(status, error) when the token's user cannot see requested_id's dashboard, else None"""
+    if not user:
+        return 404, 'User not found'
+    if requested_id and str(requested_id) != str(user['id']):
+        return 403, 'Forbidden'
+    return None
+
+def dashboard_payload(results):
+    """Dashboard from the loaded parts"""
+    plant = results['plant']
+    return {
+        'status': results['status'],
+        'mood': results['mood'],
+        'habits': results['habits'],
+        'plant': {
+            'water': plant['water'],
+            'sunlight': plant['sunlight'],
+            'stage': plant['stage'],
+        },
+        'user': results['user']
+    }
+
+@home_bp.route('/home.dashboard', methods=['GET'])
+@verify_token
+def get_dashboard():
+    """
+    Get everything the home screen needs in one call (requires authentication)
+    
+    The user is the token's; a userId argument must be that user's id.
+    Cached until the user writes.
+    """
+    try:
+        date = request.args.get('date')  # Expected format: yyyy-MM-dd
+        
+        if not date:
+            return jsonify({'error': 'date required'}), 400
+        
+        user = select(
+            'users',
+            columns=PROFILE_COLUMNS,
+            filters={'auth_id': str(request.current_user.user.id)},
+            single=True
+        )
+        error = check_dashboard_user(user, request.args.get('userId'))
+        if error:
+            return jsonify({'error': error[1]}), error[0]
+        
+        dashboard = cache.get_or_load(
+            f"dashboard:{user['id']}:{date}",
+            lambda: load_dashboard(user, date),
+            scopes=user_scopes(user['id']),
+            ttl=DASHBOARD_CACHE_TTL
+        )
+        
+        return jsonify({'success': True, **dashboard}), 200
+        
+    except Exception as e:
+        print(f"Error in get_dashboard: {e}")
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,13 +1,117 @@
 from flask import Blueprint, request, jsonify
-from ..database import select, insert, update, delete
+from ..database import select, insert, update, rpc
 import json
-from datetime import datetime
+import os
+from datetime import datetime, timedelta, timezone
+from .moods import month_bounds
+from ..pagination import decode_cursor, encode_cursor, paginate, parse_page_size
 
 journals_bp = Blueprint('journals', __name__)
 
+# Every column of an entry (detail view)
+DETAIL_COLUMNS = 'id, user_id, date, time, mood, text, title, image_path, voice_path, background_image, font_family, text_color, font_size, attached_images, stickers'
+
+# What the list screen needs; excerpt/thumbnail are maintained on write
+SUMMARY_COLUMNS = 'id, user_id, date, time, mood, title, excerpt, thumbnail'
+
+# What the delta feed sends per changed entry
+CHANGE_COLUMNS = DETAIL_COLUMNS + ', updated_at, deleted_at'
+
+# Deleted entries stay behind as tombstones so /journals.changes can report
+# them; their content is cleared
+TOMBSTONE_CLEARED = (
+    'text', 'title', 'excerpt', 'thumbnail', 'image_path', 'voice_path',
+    'background_image', 'attached_images', 'stickers'
+)
+
+# Only entries that have not been deleted
+LIVE = {'deleted_at__is': None}
+
+# Postgres stamps updated_at when a write runs, not when it commits, so a
+# row can appear behind the watermark after it was read. The watermark
+# never passes entries changed this recently; they are sent again next time.
+CHANGES_SETTLE_SECONDS = float(os.getenv('JOURNAL_CHANGES_SETTLE_SECONDS', '5'))
+
+EXCERPT_LENGTH = 140
+
+def _now():
+    # Postgres overwrites updated_at with its own clock (migration 011)
+    return datetime.now(timezone.utc).isoformat()
+
+def _settled(row, horizon):
+    """Whether a row's updated_at is old enough for the changes watermark"""
+    updated_at = datetime.fromisoformat(str(row['updated_at']).replace('Z', '+00:00'))
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return updated_at <= horizon
+
+def summary_fields(text, attached_images):
+    """Derive the excerpt and thumbnail stored alongside an entry"""
+    excerpt = ' '.join((text or '').split())
+    if len(excerpt) > EXCERPT_LENGTH:
+        excerpt = excerpt[:EXCERPT_LENGTH].rstrip() + '…'
+    
+    images = attached_images
+    if isinstance(images, str):
+        try:
+            images = json.loads(images)
+        except ValueError:
+            images = None
+    thumbnail = None
+    if isinstance(images, list) and images and isinstance(images[0], dict):
+        thumbnail = images[0].get('path')
+    
+    return {'excerpt': excerpt, 'thumbnail': thumbnail}
+
+def new_journal(data):
+    """Row for a new entry from a journals.add request body"""
+    journal_data = {
+        'user_id': data.get('userId'),
+        'date': data.get('date'),
+        'time': data.get('time'),
+        'mood': data.get('mood'),
+        'text': data.get('text'),
+        'title': data.get('title'),
+        'voice_path': data.get('voicePath'),
+        'background_image': data.get('backgroundImage'),
+        'font_family': data.get('fontFamily'),
+        'text_color': data.get('textColor'),
+        'font_size': data.get('fontSize'),
+        'attached_images': data.get('attachedImages'),  # Supabase handles JSONB
+        'stickers': data.get('stickers'),  # Supabase handles JSONB
+        'updated_at': _now()
+    }
+    journal_data.update(summary_fields(journal_data['text'], journal_data['attached_images']))
+    return journal_data
+
+def journal_changes(data):
+    """Columns to update from a journals.update request body"""
+    update_data = {
+        'text': data.get('text'),
+        'title': data.get('title'),
+        'mood': data.get('mood'),
+        'voice_path': data.get('voicePath'),  # ✅ FIXED: Now included!
+        'background_image': data.get('backgroundImage'),
+        'font_family': data.get('fontFamily'),
+        'text_color': data.get('textColor'),
+        'font_size': data.get('fontSize'),
+        'attached_images': data.get('attachedImages'),
+        'stickers': data.get('stickers'),
+        'updated_at': _now()
+    }
+    update_data.update(summary_fields(update_data['text'], update_data['attached_images']))
+    return update_data
+
+def tombstone():
+    """Columns that turn an entry into a tombstone"""
+    now = _now()
+    data = {column: None for column in TOMBSTONE_CLEARED}
+    data.update({'deleted_at': now, 'updated_at': now})
+    return data
+
 @journals_bp.route('/journals.get', methods=['GET'])
 def get_journals():
-    """Get all journals for a user"""
+    """Get all journals for a user (view=summary for the light list projection)"""
     try:
         user_id = request.args.get('userId')
         month = request.args.get('month')  # Optional filter
@@ -16,57 +120,87 @@ def get_journals():
         if not user_id:
             return jsonify({'error': 'userId required'}), 400
         
-        # Get all journals for user
-        result = select(
-            'journals',
-            columns='id, user_id, date, time, mood, text, title, image_path, voice_path, background_image, font_family, text_color, font_size, attached_images, stickers',
-            filters={'user_id': int(user_id)}
-        )
-        
-        # Convert to list of dicts and sort by date (newest first)
-        journals = list(result) if result else []
-        journals.sort(key=lambda x: x.get('date', ''), reverse=True)
+        filters = {'user_id': int(user_id), **LIVE}
         
-        # Optional: Filter by month/year on backend
+        # Optional: Filter by month/year in the query
         if month and year:
-            month = int(month)
-            year = int(year)
-            journals = [
-                j for j in journals 
-                if datetime.fromisoformat(j['date'].replace('Z', '+00:00')).month == month 
-                and datetime.fromisoformat(j['date'].replace('Z', '+00:00')).year == year
-            ]
+            start, end = month_bounds(int(year), int(month))
+            filters['date__gte'] = start
+            filters['date__lt'] = end
+        
+        columns = SUMMARY_COLUMNS if request.args.get('view') == 'summary' else DETAIL_COLUMNS
+        
+        # Paged (newest first) when the client asks for it with limit/after
+        if 'limit' in request.args or 'after' in request.args:
+            journals, next_cursor = paginate(
+                'journals',
+                columns=columns,
+                filters=filters,
+                keys=['date', 'id'],
+                limit=parse_page_size(request.args.get('limit')),
+                after=request.args.get('after')
+            )
+            return jsonify({
+                'success': True,
+                'journals': journals,
+                'nextCursor': next_cursor
+            }), 200
+        
+        # Newest first
+        journals = select(
+            'journals',
+            columns=columns,
+            filters=filters,
+            order='-date'
+        ) or []
         
         return jsonify({
             'success': True,
             'journals': journals
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_journals: {e}")
         return jsonify({'error': str(e)}), 500
 
+@journals_bp.route('/journals.getOne', methods=['GET'])
+def get_journal():
+    """Get one journal entry with all its fields"""
+    try:
+        journal_id = request.args.get('id')
+        user_id = request.args.get('userId')
+        
+        if not journal_id or not user_id:
+            return jsonify({'error': 'id and userId required'}), 400
+        
+        journal = select(
+            'journals',
+            columns=DETAIL_COLUMNS,
+            filters={'id': int(journal_id), 'user_id': int(user_id), **LIVE},
+            single=True
+        )
+        
+        if not journal:
+            return jsonify({'error': 'Journal not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'journal': journal
+        }), 200
+        
+    except Exception as e:
+        print(f"Error in get_journal: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @journals_bp.route('/journals.add', methods=['POST'])
 def add_journal():
     """Add a new journal entry"""
     try:
         data = request.get_json()
         
-        journal_data = {
-            'user_id': data.get('userId'),
-            'date': data.get('date'),
-            'time': data.get('time'),
-            'mood': data.get('mood'),
-            'text': data.get('text'),
-            'title': data.get('title'),
-            'voice_path': data.get('voicePath'),
-            'background_image': data.get('backgroundImage'),
-            'font_family': data.get('fontFamily'),
-            'text_color': data.get('textColor'),
-            'font_size': data.get('fontSize'),
-            'attached_images': data.get('attachedImages'),  # Supabase handles JSONB
-            'stickers': data.get('stickers')  # Supabase handles JSONB
-        }
+        journal_data = new_journal(data)
         
         result = insert('journals', journal_data)
         
@@ -90,23 +224,12 @@ def update_journal():
         if not journal_id or not user_id:
             return jsonify({'error': 'id and userId required'}), 400
         
-        update_data = {
-            'text': data.get('text'),
-            'title': data.get('title'),
-            'mood': data.get('mood'),
-            'voice_path': data.get('voicePath'),  # ✅ FIXED: Now included!
-            'background_image': data.get('backgroundImage'),
-            'font_family': data.get('fontFamily'),
-            'text_color': data.get('textColor'),
-            'font_size': data.get('fontSize'),
-            'attached_images': data.get('attachedImages'),
-            'stickers': data.get('stickers')
-        }
+        update_data = journal_changes(data)
         
         result = update(
             'journals',
             update_data,
-            filters={'id': journal_id, 'user_id': user_id}
+            filters={'id': journal_id, 'user_id': user_id, **LIVE}
         )
         
         return jsonify({'success': True}), 200
@@ -117,7 +240,7 @@ def update_journal():
 
 @journals_bp.route('/journals.delete', methods=['DELETE'])
 def delete_journal():
-    """Delete a journal entry"""
+    """Delete a journal entry (leaves a tombstone for /journals.changes)"""
     try:
         journal_id = request.args.get('id')
         user_id = request.args.get('userId')
@@ -125,13 +248,117 @@ def delete_journal():
         if not journal_id or not user_id:
             return jsonify({'error': 'id and userId required'}), 400
         
-        result = delete(
+        
+        result = update(
             'journals',
-            filters={'id': int(journal_id), 'user_id': int(user_id)}
+            tombstone(),
+            filters={'id': int(journal_id), 'user_id': int(user_id), **LIVE}
         )
         
         return jsonify({'success': True}), 200
         
     except Exception as e:
         print(f"Error in delete_journal: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@journals_bp.route('/journals.changes', methods=['GET'])
+def get_journal_changes():
+    """
+    Entries created, modified or deleted since the client's last sync
+    
+    Reads in (updated_at, id) order from the position in `since` (the
+    watermark returned by the previous call; omit it for a full sync).
+    Returns changed entries, ids of deleted ones, and the watermark to send
+    next time. hasMore means another call will return more changes.
+    
+    Entries changed in the last CHANGES_SETTLE_SECONDS are returned but
+    stay ahead of the watermark, so clients must apply changes by id (an
+    entry can come back again).
+    """
+    try:
+        user_id = request.args.get('userId')
+        since = request.args.get('since')
+        
+        if not user_id:
+            return jsonify({'error': 'userId required'}), 400
+        
+        rows, next_cursor = paginate(
+            'journals',
+            columns=CHANGE_COLUMNS,
+            filters={'user_id': int(user_id)},
+            keys=['updated_at', 'id'],
+            limit=parse_page_size(request.args.get('limit')),
+            after=since,
+            desc=False
+        )
+        
+        # Rows come in updated_at order, so the settled ones are a prefix
+        horizon = datetime.now(timezone.utc) - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+        settled = 0
+        while settled < len(rows) and _settled(rows[settled], horizon):
+            settled += 1
+        last = rows[settled - 1] if settled else None
+        watermark = encode_cursor([last['updated_at'], last['id']]) if last else since
+        
+        return jsonify({
+            'success': True,
+            'journals': [r for r in rows if r['deleted_at'] is None],
+            'deleted': [r['id'] for r in rows if r['deleted_at'] is not None],
+            'watermark': watermark,
+            # Not while the watermark is held back: the client would get
+            # the same recent rows again right away
+            'hasMore': next_cursor is not None and settled == len(rows)
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_journal_changes: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@journals_bp.route('/journals.search', methods=['GET'])
+def search_journals():
+    """
+    Full-text search over a user's entries, best match first
+    
+    Matches title and text (words, "phrases", -excluded words) and returns
+    summary columns plus rank and a snippet: escaped HTML with matches in <mark> tags.
+    Paged with limit/after like journals.get.
+    """
+    try:
+        user_id = request.args.get('userId')
+        query = (request.args.get('q') or '').strip()
+        
+        if not user_id or not query:
+            return jsonify({'error': 'userId and q required'}), 400
+        
+        limit = parse_page_size(request.args.get('limit'))
+        after = request.args.get('after')
+        # Results are ranked, so the cursor is a position in the ranking
+        offset = decode_cursor(after)[0] if after else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError('Invalid cursor')
+        
+        journals = rpc('search_journals', {
+            'p_user_id': int(user_id),
+            'p_query': query,
+            'p_limit': limit + 1,
+            'p_offset': offset
+        }) or []
+        
+        next_cursor = None
+        if len(journals) > limit:
+            journals = journals[:limit]
+            next_cursor = encode_cursor([offset + limit])
+        
+        return jsonify({
+            'success': True,
+            'journals': journals,
+            'nextCursor': next_cursor
+        }), 200
+        
+    except (ValueError, IndexError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in search_journals: {e}")
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
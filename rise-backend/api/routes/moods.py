@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
-from ..database import select, insert, update, delete
+from ..database import select, upsert, delete
 from datetime import datetime, timezone
+from ..pagination import paginate, parse_page_size
 
 def normalize_date(date_str: str) -> str:
     """Normalize date string to YYYY-MM-DD format"""
@@ -8,12 +9,50 @@ def normalize_date(date_str: str) -> str:
     # This handles both "2026-01-08" and "2026-01-08T17:37:32.918067Z"
     return date_str[:10]
 
+def month_bounds(year: int, month: int) -> tuple[str, str]:
+    """Return [start, end) dates (YYYY-MM-DD) covering the given month"""
+    start = f"{year:04d}-{month:02d}-01"
+    if month == 12:
+        end = f"{year + 1:04d}-01-01"
+    else:
+        end = f"{year:04d}-{month + 1:02d}-01"
+    return start, end
+
 def get_utc_timestamp() -> str:
     """Get current UTC timestamp with Z suffix"""
     return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
 
 moods_bp = Blueprint('moods', __name__)
 
+def with_utc_suffix(result):
+    """Mark a daily_moods row's timestamps as UTC (Z suffix)"""
+    # Add Z suffix to timestamps if they exist
+    if result:
+        if 'created_at' in result and result['created_at']:
+            # If it's already a datetime object from Supabase
+            if isinstance(result['created_at'], datetime):
+                result['created_at'] = result['created_at'].replace(tzinfo=timezone.utc).isoformat().replace('+00:00', 'Z')
+            elif isinstance(result['created_at'], str) and not result['created_at'].endswith('Z'):
+                result['created_at'] = result['created_at'] + 'Z'
+        
+        if 'updated_at' in result and result['updated_at']:
+            if isinstance(result['updated_at'], datetime):
+                result['updated_at'] = result['updated_at'].replace(tzinfo=timezone.utc).isoformat().replace('+00:00', 'Z')
+            elif isinstance(result['updated_at'], str) and not result['updated_at'].endswith('Z'):
+                result['updated_at'] = result['updated_at'] + 'Z'
+    
+    return result
+
+def load_mood(user_id, date):
+    """Get the mood saved for a date (None if there is none)"""
+    result = select(
+        'daily_moods',
+        filters={'user_id': int(user_id), 'date': date},
+        single=True
+    )
+    
+    return with_utc_suffix(result)
+
 @moods_bp.route('/moods.today', methods=['GET'])
 def get_today_mood():
     """Get mood for a specific date"""
@@ -24,26 +63,7 @@ def get_today_mood():
         if not user_id or not date:
             return jsonify({'error': 'userId and date required'}), 400
         
-        result = select(
-            'daily_moods',
-            filters={'user_id': int(user_id), 'date': date},
-            single=True
-        )
-        
-        # Add Z suffix to timestamps if they exist
-        if result:
-            if 'created_at' in result and result['created_at']:
-                # If it's already a datetime object from Supabase
-                if isinstance(result['created_at'], datetime):
-                    result['created_at'] = result['created_at'].replace(tzinfo=timezone.utc).isoformat().replace('+00:00', 'Z')
-                elif isinstance(result['created_at'], str) and not result['created_at'].endswith('Z'):
-                    result['created_at'] = result['created_at'] + 'Z'
-            
-            if 'updated_at' in result and result['updated_at']:
-                if isinstance(result['updated_at'], datetime):
-                    result['updated_at'] = result['updated_at'].replace(tzinfo=timezone.utc).isoformat().replace('+00:00', 'Z')
-                elif isinstance(result['updated_at'], str) and not result['updated_at'].endswith('Z'):
-                    result['updated_at'] = result['updated_at'] + 'Z'
+        result = load_mood(user_id, date)
         
         return jsonify({
             'success': True,
@@ -67,36 +87,14 @@ def save_mood():
         if not all([user_id, date, mood_image, mood_label]):
             return jsonify({'error': 'Missing required fields'}), 400
         
-        # Check if mood exists for this date
-        existing = select(
-            'daily_moods',
-            filters={'user_id': user_id, 'date': date},
-            single=True
-        )
-        
-        now = get_utc_timestamp()
-        
-        if existing:
-            # Update existing mood
-            result = update(
-                'daily_moods',
-                {
-                    'mood_image': mood_image,
-                    'mood_label': mood_label,
-                    'updated_at': now
-                },
-                filters={'user_id': user_id, 'date': date}
-            )
-        else:
-            # Insert new mood
-            result = insert('daily_moods', {
-                'user_id': user_id,
-                'date': date,
-                'mood_image': mood_image,
-                'mood_label': mood_label,
-                'created_at': now,
-                'updated_at': now
-            })
+        # created_at is filled in by its column default on first save
+        upsert('daily_moods', {
+            'user_id': user_id,
+            'date': date,
+            'mood_image': mood_image,
+            'mood_label': mood_label,
+            'updated_at': get_utc_timestamp()
+        }, on_conflict=['user_id', 'date'])
         
         return jsonify({'success': True}), 200
         
@@ -134,10 +132,24 @@ def get_all_moods():
         if not user_id:
             return jsonify({'error': 'userId required'}), 400
         
-        result = select(
-            'daily_moods',
-            filters={'user_id': int(user_id)}
-        )
+        # Paged (newest first) when the client asks for it with limit/after
+        paged = 'limit' in request.args or 'after' in request.args
+        next_cursor = None
+        if paged:
+            result, next_cursor = paginate(
+                'daily_moods',
+                columns='*',
+                filters={'user_id': int(user_id)},
+                keys=['date', 'id'],
+                limit=parse_page_size(request.args.get('limit')),
+                after=request.args.get('after')
+            )
+        else:
+            result = select(
+                'daily_moods',
+                filters={'user_id': int(user_id)},
+                order='-date'
+            )
         
         # Fix timestamps for all moods
         if result:
@@ -153,15 +165,17 @@ def get_all_moods():
                         mood['updated_at'] = mood['updated_at'].replace(tzinfo=timezone.utc).isoformat().replace('+00:00', 'Z')
                     elif isinstance(mood['updated_at'], str) and not mood['updated_at'].endswith('Z'):
                         mood['updated_at'] = mood['updated_at'] + 'Z'
-            
-            # Sort by date descending
-            result = sorted(result, key=lambda x: x.get('date', ''), reverse=True)
         
-        return jsonify({
+        response = {
             'success': True,
             'moods': result or []
-        }), 200
+        }
+        if paged:
+            response['nextCursor'] = next_cursor
+        return jsonify(response), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_all_moods: {e}")
         return jsonify({'error': str(e)}), 500
@@ -177,15 +191,18 @@ def get_moods_by_month():
         if not all([user_id, month, year]):
             return jsonify({'error': 'userId, month, and year required'}), 400
         
-        # Get all moods for user
+        start, end = month_bounds(int(year), int(month))
         result = select(
             'daily_moods',
-            filters={'user_id': int(user_id)}
+            filters={
+                'user_id': int(user_id),
+                'date__gte': start,
+                'date__lt': end
+            },
+            order='date'
         )
         
-        # Filter by month and year
         if result:
-            filtered = []
             for mood in result:
                 # Fix timestamps
                 if 'created_at' in mood and mood['created_at']:
@@ -199,17 +216,6 @@ def get_moods_by_month():
                         mood['updated_at'] = mood['updated_at'].replace(tzinfo=timezone.utc).isoformat().replace('+00:00', 'Z')
                     elif isinstance(mood['updated_at'], str) and not mood['updated_at'].endswith('Z'):
                         mood['updated_at'] = mood['updated_at'] + 'Z'
-                
-                mood_date = mood.get('date', '')
-                if mood_date:
-                    # Parse date (format: yyyy-MM-dd)
-                    parts = mood_date.split('-')
-                    if len(parts) == 3:
-                        mood_year = parts[0]
-                        mood_month = parts[1]
-                        if mood_year == year and mood_month == month.zfill(2):
-                            filtered.append(mood)
-            result = filtered
         
         return jsonify({
             'success': True,
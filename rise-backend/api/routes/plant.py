@@ -1,9 +1,39 @@
 from flask import Blueprint, request, jsonify
-from ..database import select, insert, update
+from ..database import select, update, upsert
 from datetime import datetime
 
 plant_bp = Blueprint('plant', __name__)
 
+def new_plant(user_id):
+    """Row of a plant that was never watered"""
+    return {
+        'user_id': user_id,
+        'water': 0,
+        'sunlight': 0,
+        'stage': 0,
+        'updated_at': datetime.now().isoformat()
+    }
+
+def load_plant(user_id):
+    """Get a user's plant progress, creating the row on first use"""
+    plant = select(
+        'plant_progress',
+        filters={'user_id': int(user_id)},
+        single=True
+    )
+
+    if not plant:
+        # Auto-create plant row (a concurrent request may have won the race)
+        upsert('plant_progress', new_plant(user_id), on_conflict=['user_id'], ignore_duplicates=True)
+        plant = {
+            'water': 0,
+            'sunlight': 0,
+            'stage': 0
+        }
+
+    return plant
+
+
 @plant_bp.route('/plant.get', methods=['GET'])
 def get_plant():
     try:
@@ -11,26 +41,7 @@ def get_plant():
         if not user_id:
             return jsonify({'error': 'userId required'}), 400
 
-        plant = select(
-            'plant_progress',
-            filters={'user_id': int(user_id)},
-            single=True
-        )
-
-        if not plant:
-            # Auto-create plant row
-            insert('plant_progress', {
-                'user_id': user_id,
-                'water': 0,
-                'sunlight': 0,
-                'stage': 0,
-                'updated_at': datetime.now().isoformat()
-            })
-            plant = {
-                'water': 0,
-                'sunlight': 0,
-                'stage': 0
-            }
+        plant = load_plant(user_id)
 
         user = select(
             'users',
@@ -0,0 +1,371 @@
+from flask import Blueprint, request, jsonify, current_app
+from urllib.parse import urlencode
+from datetime import datetime, timezone
+import re
+from ..database import select, insert, upsert, update, increment, rpc, invalidate_cache
+from .batch import FORWARDED_HEADERS, dispatch
+from .habits import status_transition
+from .journals import LIVE, new_journal, journal_changes, tombstone
+from .moods import normalize_date, get_utc_timestamp
+
+sync_bp = Blueprint('sync', __name__)
+
+# Upper bound on mutations per push
+MAX_MUTATIONS = 500
+
+# Mutation types replayed through their route must look like "<area>.<action>"
+ROUTE_TYPE = re.compile(r'^[A-Za-z]+\.[A-Za-z]+$')
+
+def _ok(**body):
+    return {'status': 200, 'body': {'success': True, **body}}
+
+def _fail(status, error):
+    return {'status': status, 'body': {'error': error}}
+
+def _parse_at(value):
+    """ISO timestamp (a mutation's "at", a stored column) as an aware UTC datetime (None if missing/invalid)"""
+    if not isinstance(value, str):
+        return None
+    try:
+        when = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+def _parse_id(value):
+    """Row id from a mutation body (int or numeric string) as an int (None if missing/invalid)"""
+    if isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+def _apply_water(items):
+    """
+    Water increments/decrements, folded into one write per (user, date)
+
+    Replaying x -> max(x + d, 0) step by step always ends at
+    max(x + delta, floor) for some delta and floor, which is exactly what
+    increment() applies, so ten +1s become a single +10.
+    """
+    results = {}
+    folds = {}  # (user_id, date) -> fold
+    for i, mutation in items:
+        body = mutation['body']
+        user_id = body.get('userId')
+        date = body.get('date')
+        if not all([user_id, date]):
+            results[i] = _fail(400, 'userId and date required')
+            continue
+        fold = folds.setdefault((user_id, date), {
+            'indexes': [], 'delta': 0, 'floor': None, 'creates': False
+        })
+        fold['indexes'].append(i)
+        if mutation['type'] == 'home.incrementWater':
+            fold['delta'] += 1
+            fold['floor'] = None if fold['floor'] is None else fold['floor'] + 1
+            fold['creates'] = True
+        else:
+            fold['delta'] -= 1
+            fold['floor'] = 0 if fold['floor'] is None else max(fold['floor'] - 1, 0)
+
+    for (user_id, date), fold in folds.items():
+        new_count = increment(
+            'home_status',
+            'water_count',
+            filters={'user_id': user_id, 'date': date},
+            delta=fold['delta'],
+            floor=fold['floor'],
+            upsert=fold['creates']
+        )
+        for i in fold['indexes']:
+            results[i] = _ok(waterCount=int(new_count) if new_count is not None else 0)
+    return results
+
+def _apply_moods(items):
+    """Mood saves: the latest save per (user, date) wins, all in one upsert"""
+    results = {}
+    latest = {}  # (user_id, date) -> (index, row)
+    for i, mutation in items:
+        body = mutation['body']
+        user_id = body.get('userId')
+        date = normalize_date(body.get('date'))
+        if not all([user_id, date, body.get('moodImage'), body.get('moodLabel')]):
+            results[i] = _fail(400, 'Missing required fields')
+            continue
+        previous = latest.get((user_id, date))
+        if previous:
+            results[previous[0]] = _ok(superseded=True)
+        latest[(user_id, date)] = (i, {
+            'user_id': user_id,
+            'date': date,
+            'mood_image': body.get('moodImage'),
+            'mood_label': body.get('moodLabel'),
+            'updated_at': get_utc_timestamp()
+        })
+
+    if latest:
+        upsert('daily_moods', [row for _, row in latest.values()], on_conflict=['user_id', 'date'])
+        for i, _ in latest.values():
+            results[i] = _ok()
+    return results
+
+def _apply_journal_adds(items):
+    """New journal entries, inserted in one call"""
+    results = {}
+    valid = []
+    for i, mutation in items:
+        user_id = _parse_id(mutation['body'].get('userId'))
+        if user_id is None:
+            results[i] = _fail(400, 'userId required')
+            continue
+        valid.append((i, {**new_journal(mutation['body']), 'user_id': user_id}))
+
+    if valid:
+        created = insert('journals', [row for _, row in valid]) or []
+        for n, (i, _) in enumerate(valid):
+            results[i] = _ok(journalId=created[n]['id'] if n < len(created) else None)
+    return results
+
+def _apply_journal_edits(items):
+    """
+    Journal updates and deletes
+
+    Only the latest update of an entry is written, and a delete wins over
+    any update of the same entry. Updates are one update_journal_entries
+    call, deletes one bulk write per user.
+    """
+    results = {}
+    latest = {}  # (user_id, id) -> (index, mutation)
+    deleted = {}  # (user_id, id) -> index of the delete
+    for i, mutation in items:
+        body = mutation['body']
+        key = (_parse_id(body.get('userId')), _parse_id(body.get('id')))
+        if None in key:
+            results[i] = _fail(400, 'id and userId required')
+            continue
+        if mutation['type'] == 'journals.delete':
+            deleted.setdefault(key, i)
+            results[i] = _ok()
+            continue
+        previous = latest.get(key)
+        if previous:
+            results[previous[0]] = _ok(superseded=True)
+        latest[key] = (i, mutation)
+
+    changes = []
+    for key, (i, mutation) in latest.items():
+        if key in deleted:
+            results[i] = _ok(superseded=True)
+            continue
+        user_id, journal_id = key
+        changes.append({**journal_changes(mutation['body']), 'id': journal_id, 'user_id': user_id})
+        results[i] = _ok()
+    if changes:
+        # rpc does not know which cache scopes a function touches
+        invalidate_cache('journals', rpc('update_journal_entries', {'p_changes': changes}))
+
+    by_user = {}
+    for user_id, journal_id in deleted:
+        by_user.setdefault(user_id, []).append(journal_id)
+    for user_id, journal_ids in by_user.items():
+        update(
+            'journals',
+            tombstone(),
+            filters={'id__in': journal_ids, 'user_id': user_id, **LIVE}
+        )
+    return results
+
+def _apply_habit_statuses(items):
+    """
+    Habit status changes, replayed in order against each habit in memory
+
+    Streaks depend on the order of events, so nothing is dropped: the final
+    state of every habit is written with one update_habit_states call (only
+    the columns a status change sets, so concurrent edits to the rest of the
+    row are kept) and the completion log gets one bulk insert.
+    """
+    results = {}
+    events = {}  # user_id -> {title: [(index, status, when)]}
+    now = datetime.now(timezone.utc)
+    for i, mutation in items:
+        body = mutation['body']
+        user_id = body.get('userId')
+        title = body.get('title')
+        status = body.get('status')
+        if not all([user_id, title, status]):
+            results[i] = _fail(400, 'userId, title, and status required')
+            continue
+        # A client clock ahead of ours must not date changes in the future
+        when = min(mutation['at'] or now, now)
+        events.setdefault(user_id, {}).setdefault(title, []).append((i, status, when))
+
+    states = []
+    completions = []
+    for user_id, by_title in events.items():
+        habits = select(
+            'habits',
+            filters={'user_id': user_id, 'title__in': list(by_title)}
+        ) or []
+        habits = {h['title']: h for h in habits}
+
+        for title, habit_events in by_title.items():
+            habit = habits.get(title)
+            if not habit:
+                for i, _, _ in habit_events:
+                    results[i] = _fail(404, 'Habit not found')
+                continue
+            state = {'id': habit['id']}
+            for i, status, when in habit_events:
+                # Never before the habit's last change (e.g. a rollover that
+                # ran while the client was offline): time only moves forward
+                last_updated = _parse_at(habit.get('last_updated'))
+                if last_updated and when < last_updated:
+                    when = last_updated
+                update_data, completion = status_transition(habit, status, when)
+                habit = {**habit, **update_data}
+                state.update(update_data)
+                if completion:
+                    completions.append(completion)
+                results[i] = _ok()
+            states.append(state)
+
+    if states:
+        # rpc does not know which cache scopes a function touches
+        invalidate_cache('habits', rpc('update_habit_states', {'p_states': states}))
+    if completions:
+        insert('habit_completions', completions)
+    return results
+
+# Mutation types applied with bulk writes; types sharing a handler are
+# folded together (e.g. water increments and decrements of the same date)
+HANDLERS = {
+    'home.incrementWater': _apply_water,
+    'home.decrementWater': _apply_water,
+    'moods.save': _apply_moods,
+    'journals.add': _apply_journal_adds,
+    'journals.update': _apply_journal_edits,
+    'journals.delete': _apply_journal_edits,
+    'habits.updateStatus': _apply_habit_statuses,
+}
+
+# What each bulk handler writes: a mutation may join an earlier group of its
+# kind only across groups that touch none of it. New journal entries have no
+# id the client could edit or delete in the same push, so adds and edits
+# never touch the same rows.
+HANDLER_TABLES = {
+    _apply_water: {'home_status'},
+    _apply_moods: {'daily_moods'},
+    _apply_journal_adds: {'journals (new)'},
+    _apply_journal_edits: {'journals'},
+    _apply_habit_statuses: {'habits', 'habit_completions'},
+}
+
+def _commutes(handler, other):
+    """Whether mutations of the two handlers can be applied in either order"""
+    if handler not in HANDLER_TABLES or other not in HANDLER_TABLES:
+        # Replayed routes can touch anything
+        return False
+    return HANDLER_TABLES[handler].isdisjoint(HANDLER_TABLES[other])
+
+def _replay(app, items, headers):
+    """Any other mutation type goes through its own route, one at a time"""
+    results = {}
+    for i, mutation in items:
+        method = (mutation.get('method') or 'POST').upper()
+        path = '/' + mutation['type']
+        body = mutation['body']
+        if method in ('GET', 'DELETE'):
+            path += '?' + urlencode(body)
+        results[i] = dispatch(app, {'method': method, 'path': path, 'body': body}, headers)
+    return results
+
+@sync_bp.route('/sync.push', methods=['POST'])
+def push():
+    """
+    Apply a batch of mutations queued by the client while offline
+
+    Body: {"mutations": [{"id": "<client id>", "type": "home.incrementWater",
+                          "at": "2026-01-01T08:00:00Z", "body": {...}}, ...]}
+
+    "type" names the endpoint the mutation was meant for and "body" is what
+    would have been sent to it. Mutations are grouped by kind, redundant
+    ones are collapsed and each group is applied with bulk writes. A
+    mutation only joins an earlier group of its kind when nothing queued in
+    between touches the same tables, so groups run in queue order wherever
+    it matters; within a group mutations are ordered by "at". Types without
+    a bulk handler are replayed through their route (with "method", default
+    POST) and are never reordered.
+
+    Returns one result per mutation, in order: {"id", "status", "body"}.
+    """
+    try:
+        data = request.get_json()
+        mutations = (data or {}).get('mutations')
+
+        if not isinstance(mutations, list) or not mutations:
+            return jsonify({'error': 'mutations required'}), 400
+        if len(mutations) > MAX_MUTATIONS:
+            return jsonify({'error': f'At most {MAX_MUTATIONS} mutations per push'}), 400
+
+        results = [None] * len(mutations)
+        groups = []  # [(handler, [(index, mutation)])], in the order they run
+        for i, raw in enumerate(mutations):
+            if not isinstance(raw, dict) or not isinstance(raw.get('type'), str):
+                results[i] = _fail(400, 'Each mutation needs a type')
+                continue
+            mutation = dict(raw)
+            mutation['at'] = _parse_at(raw.get('at'))
+            mutation['body'] = raw.get('body') if isinstance(raw.get('body'), dict) else {}
+
+            handler = HANDLERS.get(mutation['type'])
+            if handler is None:
+                if not ROUTE_TYPE.match(mutation['type']) or mutation['type'] == 'sync.push':
+                    results[i] = _fail(400, f"Unknown mutation type: {mutation['type']}")
+                    continue
+                handler = _replay
+
+            group = None
+            for other, items in reversed(groups):
+                if other is handler:
+                    group = items
+                    break
+                if not _commutes(handler, other):
+                    break
+            if group is None:
+                group = []
+                groups.append((handler, group))
+            group.append((i, mutation))
+
+        received_at = datetime.now(timezone.utc)
+        app = current_app._get_current_object()
+        headers = {h: request.headers[h] for h in FORWARDED_HEADERS if h in request.headers}
+
+        for handler, items in groups:
+            try:
+                if handler is _replay:
+                    applied = _replay(app, items, headers)
+                else:
+                    # Stable sort: same-time mutations keep their queue order,
+                    # undated ones count as happening now
+                    items.sort(key=lambda item: item[1]['at'] or received_at)
+                    applied = handler(items)
+            except Exception as e:
+                print(f"Error in sync push ({items[0][1]['type']}): {e}")
+                applied = {i: _fail(500, str(e)) for i, _ in items}
+            for i, result in applied.items():
+                results[i] = result
+
+        return jsonify({
+            'success': True,
+            'results': [
+                {'id': mutation.get('id') if isinstance(mutation, dict) else None, **result}
+                for mutation, result in zip(mutations, results)
+            ]
+        }), 200
+
+    except Exception as e:
+        print(f"Error in sync push: {e}")
+        return jsonify({'error': str(e)}), 500
\ No newline at end of file
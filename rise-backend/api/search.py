@@ -0,0 +1,200 @@
+"""
+In-memory full-text search (inverted index + BM25)
+
+Text is normalized (case, accents, Arabic letter variants and diacritics),
+split into words, stripped of stopwords and reduced with a light
+per-language stemmer (en, fr, ar). Documents can be added, replaced and
+removed one at a time, so the index is kept current incrementally.
+"""
+import heapq
+import html
+import math
+import re
+import unicodedata
+from collections import Counter
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+_TAGS = re.compile(r'<[^>]+>')
+
+STOPWORDS = {
+    'en': frozenset('''
+        a an and are as at be been but by can do does for from had has have how i if in
+        into is it its me my no not of on or our so than that the their them then there
+        these they this to too up was we were what when where which who why will with you
+        your
+    '''.split()),
+    'fr': frozenset('''
+        a au aux avec ce ces cette dans de des du elle en est et etre il ils je la le les
+        leur lui ma mais me mes mon ne nous on ou par pas pour qu que qui sa se ses son
+        sur ta te tes ton tu un une vos votre vous y
+    '''.split()),
+    'ar': frozenset('''
+        في من على الى عن مع هذا هذه ذلك تلك التي الذي الذين و او ثم ان كان كانت لا لم لن
+        ما هو هي هم نحن انت انا كل قد بين عند
+    '''.split()),
+}
+
+def _undouble(word):
+    # running -> run, quotidienne -> quotidien
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'aeiouls':
+        return word[:-1]
+    return word
+
+def _stem_en(word):
+    for suffix, replacement in (('ies', 'y'), ('ing', ''), ('edly', ''), ('ed', ''),
+                                ('ly', ''), ('ness', ''), ('ment', ''), ('es', ''), ('s', '')):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = _undouble(word[:-len(suffix)] + replacement)
+            break
+    # happy / happily
+    return word[:-1] + 'i' if word.endswith('y') and len(word) > 3 else word
+
+def _stem_fr(word):
+    for suffix in ('ements', 'ement', 'ments', 'ment', 'euses', 'euse', 'eux', 'ees',
+                   'ee', 'es', 'er', 's', 'x', 'e'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return _undouble(word[:-len(suffix)])
+    return word
+
+def _stem_ar(word):
+    for prefix in ('وال', 'بال', 'كال', 'فال', 'لل', 'ال'):
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            word = word[len(prefix):]
+            break
+    for suffix in ('ها', 'ات', 'ون', 'ين', 'ان', 'ه', 'ي'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            return word[:-len(suffix)]
+    return word
+
+STEMMERS = {'en': _stem_en, 'fr': _stem_fr, 'ar': _stem_ar}
+
+_ARABIC_VARIANTS = str.maketrans('ىة', 'يه')
+
+def _normalize(text):
+    # NFKD splits accented letters so the marks (and Arabic harakat) can be dropped
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    # Hamza/madda forms of alef were reduced to a bare alef above; also fold
+    # alef maqsura and teh marbuta
+    return text.translate(_ARABIC_VARIANTS)
+
+_NORMALIZED_STOPWORDS = {
+    lang: frozenset(_normalize(w) for w in words) for lang, words in STOPWORDS.items()
+}
+
+def tokenize(text: str, lang: str | None) -> list:
+    """Index terms of a text in a language (None: no stopwords, no stemming)"""
+    stopwords = _NORMALIZED_STOPWORDS.get(lang, frozenset())
+    stem = STEMMERS.get(lang, lambda word: word)
+    return [
+        stem(word)
+        for word in _WORD.findall(_normalize(_TAGS.sub(' ', text or '')))
+        if word not in stopwords and len(word) > 1
+    ]
+
+def highlight(text: str, query: str, lang: str | None = None, max_words=24,
+              start='<mark>', stop='</mark>') -> str:
+    """
+    Snippet of text around the first word matching query, matches wrapped
+    in start/stop (like Postgres ts_headline)
+
+    The snippet is HTML: the text is escaped, so the markers are the only
+    markup in it.
+    """
+    text = text or ''
+    terms = set(tokenize(query, lang))
+    words = list(_WORD.finditer(text))
+    if not words:
+        return ''
+    matched = {i for i, m in enumerate(words) if terms.intersection(tokenize(m.group(), lang))}
+    first = max(0, min(matched) - max_words // 3) if matched else 0
+    last = min(len(words), first + max_words)
+
+    parts = ['… ' if first > 0 else '']
+    position = words[first].start()
+    for i in range(first, last):
+        m = words[i]
+        word = html.escape(m.group())
+        parts.append(html.escape(text[position:m.start()]))
+        parts.append(f'{start}{word}{stop}' if i in matched else word)
+        position = m.end()
+    parts.append(' …' if last < len(words) else html.escape(text[position:]))
+    return ''.join(parts)
+
+class SearchIndex:
+    def __init__(self, lang: str, k1=1.2, b=0.75):
+        """
+        Args:
+            lang: Language of the documents (selects stopwords and stemmer)
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+        """
+        self.lang = lang
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {doc_id: term frequency}
+        self.lengths = {}   # doc_id -> number of terms
+        self.terms = {}     # doc_id -> distinct terms (to remove it again)
+        self.versions = {}  # doc_id -> version the document was indexed at
+        self.total_length = 0
+
+    def add(self, doc_id, fields, version=None):
+        """
+        Index a document, replacing any previous version of it
+
+        Args:
+            doc_id: Document id
+            fields: List of (text, weight); a weight of 3 counts every
+                    term of that text three times (e.g. titles)
+            version: Anything identifying this version (e.g. updated_at)
+        """
+        self.remove(doc_id)
+        terms = Counter()
+        for text, weight in fields:
+            for term in tokenize(text, self.lang):
+                terms[term] += weight
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        length = sum(terms.values())
+        self.lengths[doc_id] = length
+        self.terms[doc_id] = list(terms)
+        self.versions[doc_id] = version
+        self.total_length += length
+
+    def copy(self):
+        """An independent copy, to update while searches keep using this one"""
+        other = SearchIndex(self.lang, self.k1, self.b)
+        other.postings = {term: dict(docs) for term, docs in self.postings.items()}
+        other.lengths = dict(self.lengths)
+        other.terms = dict(self.terms)
+        other.versions = dict(self.versions)
+        other.total_length = self.total_length
+        return other
+
+    def remove(self, doc_id):
+        length = self.lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.versions.pop(doc_id, None)
+        self.total_length -= length
+        for term in self.terms.pop(doc_id):
+            del self.postings[term][doc_id]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def search(self, query: str, limit=20) -> list:
+        """Best matching documents for a query as [(doc_id, score)], best first"""
+        count = len(self.lengths)
+        if not count:
+            return []
+        average = self.total_length / count or 1
+        scores = {}
+        for term in set(tokenize(query, self.lang)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, frequency in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / average)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
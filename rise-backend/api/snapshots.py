@@ -0,0 +1,60 @@
+"""
+Pre-rendered article snapshots
+
+api/jobs/build_article_snapshots.py renders every published article into
+ready-to-send JSON files, pre-compressed with gzip (and brotli when the
+Brotli package is installed), and writes a manifest.json describing them:
+
+    {"built_at": "...",
+     "articles": {"<lang>": {"<slug>": {"id": 1, "updated_at": "...",
+                                        "etag": "...",
+                                        "files": {"identity": "en/1-<etag>.json",
+                                                  "gzip": "en/1-<etag>.json.gz",
+                                                  "br": "en/1-<etag>.json.br"}}}}}
+
+SnapshotStore finds the file to send; routes hand it to the WSGI server
+(flask.send_file), which sends it straight from the page cache shared by
+every worker (sendfile under gunicorn). The manifest is reloaded when the
+build replaces it.
+"""
+import json
+import os
+import threading
+
+# Preferred first when the client accepts several
+ENCODINGS = ('br', 'gzip')
+
+class SnapshotStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._manifest = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load_manifest(self):
+        path = os.path.join(self.directory, 'manifest.json')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    with open(path, 'rb') as f:
+                        self._manifest = json.load(f)
+                    self._mtime = mtime
+        return self._manifest
+
+    def find(self, lang: str, slug: str):
+        """Manifest entry of an article, or None if it has no snapshot"""
+        manifest = self._load_manifest()
+        if not manifest:
+            return None
+        return manifest.get('articles', {}).get(lang, {}).get(slug)
+
+    def open(self, relative_path: str):
+        """
+        A snapshot file opened for reading (raises OSError when a newer
+        build has removed it)
+        """
+        return open(os.path.join(self.directory, relative_path), 'rb')
@@ -0,0 +1,145 @@
+"""
+Habit streaks computed from the habit_completions event log
+
+Each status change that affects a streak is appended to habit_completions
+with the ordinal of the period it happened in (day, ISO week or month
+number, so consecutive periods have consecutive ordinals). The current and
+best streak stored on the habit row are materialized from that log:
+incrementally on every event by next_streak(), or for every habit at once by
+compute_streaks(), which works on whole NumPy arrays instead of per-row loops.
+"""
+from datetime import datetime
+
+def period_ordinal(frequency: str, when: datetime) -> int:
+    """Ordinal of the day/week/month containing when (consecutive periods differ by 1)"""
+    frequency = (frequency or '').lower()
+    if frequency == 'weekly':
+        # date.toordinal() is 1 for Monday 0001-01-01, so weeks start on Monday
+        return (when.toordinal() - 1) // 7
+    if frequency == 'monthly':
+        return when.year * 12 + when.month - 1
+    return when.toordinal()
+
+def advances_streak(habit_type: str, status: str) -> bool:
+    """Doing a good habit or resisting (skipping) a bad one extends the streak"""
+    if habit_type == 'bad':
+        return status == 'skipped'
+    return status == 'completed'
+
+def breaks_when_idle(habit_type: str) -> bool:
+    """A good habit's streak breaks on a period it was not done; a bad habit's only when it is done"""
+    return habit_type != 'bad'
+
+def next_streak(current: int, best: int, last_ordinal, ordinal: int, advanced: bool, restored_to=None,
+                idle_breaks=True):
+    """
+    Apply one event to a materialized streak
+
+    Args:
+        current: Current streak before the event
+        best: Best streak before the event
+        last_ordinal: Period ordinal of the previous event (None if none)
+        ordinal: Period ordinal of this event
+        advanced: Whether the event extends the streak
+        restored_to: Streak set by a streak restore (None for other events)
+        idle_breaks: Whether periods without events break the streak
+                     (see breaks_when_idle())
+
+    Returns:
+        (current, best) after the event
+    """
+    if restored_to is not None:
+        return restored_to, max(best, restored_to)
+    if not advanced:
+        return 0, best
+    if current and last_ordinal == ordinal:
+        # Already counted for this period
+        return current, best
+    if current and (last_ordinal == ordinal - 1 or (not idle_breaks and last_ordinal is not None)):
+        current += 1
+    else:
+        current = 1
+    return current, max(best, current)
+
+def compute_streaks(habit_ids, ordinals, advanced, bridges, seq, now_ordinals, restored_to=None,
+                    keep_idle=()):
+    """
+    Compute current and best streaks for many habits from their event logs
+
+    All arguments except now_ordinals are parallel arrays with one entry per
+    event. Events are replayed in (habit, seq) order with the same rules as
+    next_streak(), so a rebuild matches what was materialized incrementally.
+
+    Args:
+        habit_ids: Habit id of each event
+        ordinals: Period ordinal of each event
+        advanced: Whether each event extends the streak
+        bridges: Whether each event continues the previous run regardless of
+                 the gap (streak restores logged without restored_to)
+        seq: Event order (e.g. the log's id)
+        now_ordinals: Mapping {habit_id: ordinal of the current period}
+        restored_to: Streak set by each event, None except for streak
+                     restores (which start a run of that length)
+        keep_idle: Ids of habits whose streak periods without events do not
+                   break (bad habits, see breaks_when_idle())
+
+    Returns:
+        Dict {habit_id: (current_streak, best_streak)}
+    """
+    # Only the rebuild job needs NumPy; keep it out of the web app's startup
+    import numpy as np
+
+    habit_ids = np.asarray(habit_ids, dtype=np.int64)
+    if habit_ids.size == 0:
+        return {}
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    advanced = np.asarray(advanced, dtype=bool)
+    bridges = np.asarray(bridges, dtype=bool)
+    seq = np.asarray(seq, dtype=np.int64)
+
+    if restored_to is None:
+        restored_to = [None] * habit_ids.size
+    restores = np.array([value is not None for value in restored_to], dtype=bool)
+    restored = np.array([value or 0 for value in restored_to], dtype=np.int64)
+
+    order = np.lexsort((seq, habit_ids))
+    h, o, a, b = habit_ids[order], ordinals[order], advanced[order], bridges[order]
+    r, base = restores[order], restored[order]
+    k = np.isin(h, np.fromiter(keep_idle, dtype=np.int64))
+    n = h.size
+
+    # A restore always starts a run of the restored length. Any other
+    # advancing event continues the run of the event before it when that
+    # event is the same habit, advanced (a restore to 0 counts as not), and
+    # in the same or the previous period (or this event bridges the gap, or
+    # the habit's streak survives idle periods)
+    a = a | r
+    gap = np.zeros(n, dtype=np.int64)
+    gap[1:] = o[1:] - o[:-1]
+    previous_counts = a & ~(r & (base == 0))
+    continues = np.zeros(n, dtype=bool)
+    continues[1:] = (h[1:] == h[:-1]) & previous_counts[:-1] & ((gap[1:] == 0) | (gap[1:] == 1) | b[1:] | k[1:])
+    continues &= ~r
+    run_start = a & ~continues
+
+    # Each advancing event adds a period to its run, except repeats within
+    # the period already counted; a run starts at 1, or at the restored value
+    step = np.where(a & ~(continues & (gap == 0)), 1, 0)
+    total = np.cumsum(step)
+    idx = np.arange(n)
+    start_idx = np.maximum.accumulate(np.where(run_start, idx, 0))
+    first_length = np.where(r, base, 1)
+    length = np.where(a, total - total[start_idx] + first_length[start_idx], 0)
+
+    uniq, first = np.unique(h, return_index=True)
+    best = np.maximum.reduceat(length, first)
+    last = np.append(first[1:], n) - 1
+    now = np.array([now_ordinals[int(habit_id)] for habit_id in uniq], dtype=np.int64)
+    # The run only counts as current if its last period is this one or the
+    # previous one, unless idle periods do not break it
+    current = np.where((o[last] >= now - 1) | k[last], length[last], 0)
+
+    return {
+        int(habit_id): (int(c), int(bst))
+        for habit_id, c, bst in zip(uniq, current, best)
+    }
@@ -0,0 +1,146 @@
+"""
+Access token verification
+
+Supabase access tokens are JWTs, so most of them can be checked locally
+against the project's JWT secret (HS256) or its published JWKS (RS256/ES256)
+instead of calling auth.get_user() on every request. Verified claims are kept
+in a bounded LRU cache until the token expires. The remote check is only used
+when local verification is inconclusive (no key configured, unknown algorithm,
+JWKS unreachable).
+"""
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import jwt
+
+class _Inconclusive(Exception):
+    """Local verification could not decide either way"""
+
+class TokenVerifier:
+    def __init__(self, auth, jwt_secret=None, jwks_url=None, cache_size=1024):
+        """
+        Args:
+            auth: Auth API of the storage backend (used for the remote check)
+            jwt_secret: Project JWT secret for HS256 tokens, or a function
+                        returning it, called when the first HS256 token
+                        comes in (so the backend can be created lazily)
+            jwks_url: JWKS endpoint for asymmetric (RS256/ES256) tokens
+            cache_size: Maximum number of tokens kept in the cache
+        """
+        self._auth = auth
+        self._secret = jwt_secret
+        self._jwks_url = jwks_url
+        self._jwks_client = None
+        self._cache_size = cache_size
+        self._cache = OrderedDict()  # token -> (user, exp)
+        self._lock = threading.Lock()
+
+    def verify(self, token: str):
+        """
+        Verify an access token
+
+        Returns:
+            Object shaped like auth.get_user()'s response (``.user.id``,
+            ``.user.email``, ...) if the token is valid, None otherwise
+        """
+        cached = self._cache_get(token)
+        if cached is not None:
+            return cached
+
+        try:
+            claims = self._verify_locally(token)
+            user = _user_from_claims(claims)
+            exp = claims['exp']
+        except _Inconclusive:
+            user = self._auth.get_user(token)
+            if not user:
+                return None
+            exp = _unverified_exp(token)
+        except jwt.InvalidTokenError as e:
+            print(f"Token verification error: {e}")
+            return None
+
+        if exp:
+            self._cache_put(token, user, exp)
+        return user
+
+    def forget(self, token: str):
+        """Drop a token from the cache (e.g. on logout)"""
+        with self._lock:
+            self._cache.pop(token, None)
+
+    def _verify_locally(self, token):
+        alg = jwt.get_unverified_header(token).get('alg')
+        if alg == 'HS256':
+            key = self._jwt_secret()
+            if not key:
+                raise _Inconclusive()
+        elif alg in ('RS256', 'ES256'):
+            key = self._signing_key(token)
+        else:
+            raise _Inconclusive()
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[alg],
+            audience='authenticated',
+            options={'require': ['exp', 'sub']}
+        )
+
+    def _jwt_secret(self):
+        secret = self._secret
+        if callable(secret):
+            secret = secret()
+            if secret:
+                self._secret = secret
+        return secret
+
+    def _signing_key(self, token):
+        if not self._jwks_url:
+            raise _Inconclusive()
+        try:
+            if self._jwks_client is None:
+                self._jwks_client = jwt.PyJWKClient(self._jwks_url, cache_keys=True)
+            return self._jwks_client.get_signing_key_from_jwt(token).key
+        except (jwt.PyJWKClientError, jwt.exceptions.PyJWKError) as e:
+            # JWKS unreachable, key rotated, or crypto backend missing
+            print(f"JWKS lookup failed, falling back to remote check: {e}")
+            raise _Inconclusive()
+
+    def _cache_get(self, token):
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is None:
+                return None
+            user, exp = entry
+            if exp <= time.time():
+                del self._cache[token]
+                return None
+            self._cache.move_to_end(token)
+            return user
+
+    def _cache_put(self, token, user, exp):
+        with self._lock:
+            self._cache[token] = (user, exp)
+            self._cache.move_to_end(token)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+def _user_from_claims(claims):
+    """Build an auth.get_user()-like response from verified claims"""
+    return SimpleNamespace(user=SimpleNamespace(
+        id=claims['sub'],
+        email=claims.get('email'),
+        role=claims.get('role'),
+        user_metadata=claims.get('user_metadata', {}),
+        app_metadata=claims.get('app_metadata', {})
+    ))
+
+def _unverified_exp(token):
+    try:
+        return jwt.decode(token, options={'verify_signature': False}).get('exp')
+    except jwt.InvalidTokenError:
+        return None
@@ -0,0 +1,32 @@
+"""
+Cold-start work done ahead of time
+
+Importing the app is kept cheap: the storage backend, its client and the
+heavy modules are only loaded on first use, so the first request to reach
+the database pays for them. warm_up() does that work on purpose instead:
+
+- gunicorn runs it in every new worker when WARM_UP=1 (gunicorn.conf.py),
+  and so does the ASGI app on startup (api/asgi.py)
+- GET /warmup runs it on a live instance, e.g. from a scheduled ping that
+  keeps a serverless function warm
+"""
+import time
+
+from .database import backend, select
+
+def warm_up() -> dict:
+    """
+    Create the backend and make a first query (opens the connection pool)
+
+    Returns:
+        Milliseconds spent on each step
+    """
+    timings = {}
+    started = time.perf_counter()
+    backend.get()
+    timings['backend'] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    select('users', columns='id', limit=1)
+    timings['firstQuery'] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
@@ -0,0 +1,88 @@
+"""
+Gunicorn settings (Procfile: gunicorn -c gunicorn.conf.py api.index:app)
+
+Requests spend most of their time waiting on Supabase, so each worker
+process serves many of them at once:
+
+    GUNICORN_WORKER_CLASS        gthread (default), gevent or sync
+    WEB_CONCURRENCY              worker processes (default: 2 per CPU + 1)
+    GUNICORN_THREADS             threads per gthread worker (default: 8)
+    GUNICORN_WORKER_CONNECTIONS  concurrent requests per gevent worker (default: 100)
+
+gevent needs the gevent package (not in requirements.txt). The app is
+loaded in each worker after the fork, so every worker opens its own
+Supabase connections; SUPABASE_POOL_SIZE defaults to what one worker can
+use at once.
+
+The cache (api/cache.py) needs REDIS_URL with more than one worker: a
+per-process L2 would only be invalidated in the worker that made a write,
+so without it the cache is turned off (CACHE_ENABLED=0) and a warning is
+logged at startup.
+
+Workers write their metrics to METRICS_DIR (default: a directory in the
+system temp dir, emptied when gunicorn starts) so /metrics covers them all;
+the file of a worker that exits is folded into an archive there.
+
+WARM_UP=1 creates the backend and makes a first query in every new worker
+before it takes requests (see api/warmup.py).
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '100'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers now and then (slow leaks), not all at the same time
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+preload_app = False
+
+# Concurrent requests per worker, plus the dashboard fan-out threads
+_concurrency = {'gthread': threads, 'gevent': worker_connections}.get(worker_class, 1)
+os.environ.setdefault(
+    'SUPABASE_POOL_SIZE',
+    str(_concurrency + int(os.getenv('DASHBOARD_WORKERS', '8')))
+)
+
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'rise-metrics'))
+
+# Workers cannot share a per-process L2: cache nothing rather than serve
+# data another worker has changed
+_unshared_cache = workers > 1 and not os.getenv('REDIS_URL')
+if _unshared_cache:
+    os.environ['CACHE_ENABLED'] = '0'
+
+def on_starting(server):
+    from api.metrics import clear_snapshots
+    clear_snapshots()
+    if _unshared_cache:
+        server.log.warning("Cache disabled: %d workers and no REDIS_URL to share it", workers)
+
+def worker_exit(server, worker):
+    # Keep the counts of the last requests of a worker that stops
+    from api.metrics import flush
+    flush()
+
+def child_exit(server, worker):
+    # Runs in the master once the worker is gone (recycled, crashed or
+    # stopped): keep its counts, drop its file
+    from api.metrics import archive_snapshot
+    archive_snapshot(worker.pid)
+
+def post_worker_init(worker):
+    if os.getenv('WARM_UP') == '1':
+        from api.warmup import warm_up
+        try:
+            worker.log.info("Warm-up: %s", warm_up())
+        except Exception as e:
+            worker.log.warning("Warm-up failed: %s", e)
@@ -0,0 +1,14 @@
+-- Indexes backing the range / ordered queries issued by api/database.select
+-- (home.getRange, moods.getAll, moods.getByMonth, journals.get, articles.getAll).
+
+create index if not exists home_status_user_date_idx
+    on home_status (user_id, date);
+
+create index if not exists daily_moods_user_date_idx
+    on daily_moods (user_id, date);
+
+create index if not exists journals_user_date_idx
+    on journals (user_id, date desc);
+
+create index if not exists articles_lang_published_updated_idx
+    on articles (language, is_published, updated_at desc);
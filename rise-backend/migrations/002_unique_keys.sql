@@ -0,0 +1,41 @@
+-- Unique keys used as upsert conflict targets (api/database.upsert).
+-- Duplicates created by the old select-then-insert race are removed first,
+-- keeping the most recent row.
+
+delete from home_status a
+    using home_status b
+    where a.user_id = b.user_id and a.date = b.date and a.id < b.id;
+
+delete from daily_moods a
+    using daily_moods b
+    where a.user_id = b.user_id and a.date = b.date and a.id < b.id;
+
+delete from app_locks a
+    using app_locks b
+    where a.user_id = b.user_id and a.id < b.id;
+
+delete from plant_progress a
+    using plant_progress b
+    where a.user_id = b.user_id and a.id < b.id;
+
+-- These replace the non-unique indexes from 001
+drop index if exists home_status_user_date_idx;
+drop index if exists daily_moods_user_date_idx;
+
+create unique index if not exists home_status_user_date_key
+    on home_status (user_id, date);
+
+create unique index if not exists daily_moods_user_date_key
+    on daily_moods (user_id, date);
+
+create unique index if not exists app_locks_user_key
+    on app_locks (user_id);
+
+create unique index if not exists plant_progress_user_key
+    on plant_progress (user_id);
+
+-- Columns omitted from partial upserts take these on insert
+alter table home_status alter column water_count set default 0;
+alter table home_status alter column water_goal set default 8;
+alter table home_status alter column detox_progress set default 0;
+alter table daily_moods alter column created_at set default now();
@@ -0,0 +1,6 @@
+-- Lets the habit rollover job (api/routes/habits.rollover_habits) find
+-- habits that still need a period reset without scanning the table.
+
+create index if not exists habits_pending_rollover_idx
+    on habits (id, last_updated)
+    where status <> 'active';
@@ -0,0 +1,23 @@
+-- Append-only log of streak events written by habits.updateStatus and
+-- habits.restoreStreak; streak_count / best_streak on habits are
+-- materialized from it (api/streaks.py, api/jobs/rebuild_streaks.py).
+
+create table if not exists habit_completions (
+    id bigserial primary key,
+    habit_id bigint not null references habits (id) on delete cascade,
+    user_id bigint not null,
+    status text not null,
+    -- extends the streak (good habit completed / bad habit resisted)
+    advanced boolean not null,
+    -- continues the previous run despite missed periods (streak restore)
+    bridges boolean not null default false,
+    -- day, week or month number depending on the habit's frequency
+    period_ordinal integer not null,
+    completed_at timestamptz not null default now()
+);
+
+create index if not exists habit_completions_habit_idx
+    on habit_completions (habit_id, period_ordinal, id);
+
+create index if not exists habit_completions_user_idx
+    on habit_completions (user_id, completed_at);
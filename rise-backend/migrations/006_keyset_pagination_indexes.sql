@@ -0,0 +1,13 @@
+-- Indexes matching the keyset pagination orderings (api/pagination.py):
+-- journals and moods by (date, id), articles by (updated_at, id).
+
+drop index if exists journals_user_date_idx;
+create index if not exists journals_user_date_id_idx
+    on journals (user_id, date desc, id desc);
+
+create index if not exists daily_moods_user_date_id_idx
+    on daily_moods (user_id, date desc, id desc);
+
+drop index if exists articles_lang_published_updated_idx;
+create index if not exists articles_lang_published_updated_id_idx
+    on articles (language, is_published, updated_at desc, id desc);
@@ -0,0 +1,18 @@
+-- Light list projection for journals.get?view=summary: excerpt and
+-- thumbnail are written by journals.add / journals.update
+-- (api/routes/journals.summary_fields); this backfills existing rows.
+
+alter table journals add column if not exists excerpt text;
+alter table journals add column if not exists thumbnail text;
+
+update journals
+set excerpt = case
+        when length(btrim(regexp_replace(coalesce(text, ''), '\s+', ' ', 'g'))) > 140
+        then rtrim(left(btrim(regexp_replace(coalesce(text, ''), '\s+', ' ', 'g')), 140)) || '…'
+        else btrim(regexp_replace(coalesce(text, ''), '\s+', ' ', 'g'))
+    end,
+    thumbnail = case
+        when jsonb_typeof(attached_images::jsonb) = 'array'
+        then attached_images::jsonb -> 0 ->> 'path'
+    end
+where excerpt is null;
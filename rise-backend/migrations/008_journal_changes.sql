@@ -0,0 +1,15 @@
+-- Delta sync for journals (/journals.changes): every write stamps
+-- updated_at, and journals.delete leaves a tombstone (deleted_at set,
+-- content cleared) instead of removing the row. The feed reads
+-- (user_id, updated_at, id) in order from the client's watermark.
+
+alter table journals add column if not exists updated_at timestamptz;
+alter table journals add column if not exists deleted_at timestamptz;
+
+update journals set updated_at = coalesce(created_at, now()) where updated_at is null;
+
+alter table journals alter column updated_at set default now();
+alter table journals alter column updated_at set not null;
+
+create index if not exists journals_user_updated_id_idx
+    on journals (user_id, updated_at, id);
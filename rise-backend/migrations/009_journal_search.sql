@@ -0,0 +1,66 @@
+-- Full-text search over a user's journal entries (/journals.search).
+--
+-- search_vector is kept by Postgres from title (weight A) and text (B). The
+-- 'simple' configuration does no stemming or stopword removal, since entries
+-- are written in whatever language the user speaks. btree_gin lets one GIN
+-- index cover both the user_id filter and the text match.
+
+alter table journals add column if not exists search_vector tsvector
+    generated always as (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(text, '')), 'B')
+    ) stored;
+
+create extension if not exists btree_gin;
+
+create index if not exists journals_user_search_idx
+    on journals using gin (user_id, search_vector);
+
+-- Ranked matches of p_query (web search syntax: words, "phrases", -not, or)
+-- among p_user_id's live entries, best first, with a highlighted snippet.
+-- Snippets are only built for the rows of the requested page.
+create or replace function search_journals(
+    p_user_id bigint,
+    p_query text,
+    p_limit integer default 20,
+    p_offset integer default 0
+) returns table (
+    id bigint,
+    date text,
+    "time" text,
+    mood text,
+    title text,
+    excerpt text,
+    thumbnail text,
+    rank real,
+    snippet text
+)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    with query as (
+        select websearch_to_tsquery('simple', p_query) as q
+    ), ranked as (
+        select j.*, ts_rank_cd(j.search_vector, query.q) as rank, query.q
+          from journals j, query
+         where j.user_id = p_user_id
+           and j.deleted_at is null
+           and j.search_vector @@ query.q
+         order by rank desc, j.date desc, j.id desc
+         limit p_limit offset p_offset
+    )
+    select r.id::bigint, r.date::text, r.time::text, r.mood::text, r.title::text,
+           r.excerpt::text, r.thumbnail::text, r.rank,
+           ts_headline('simple', coalesce(nullif(r.text, ''), r.title, ''), r.q,
+                       'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=8, MaxFragments=2, FragmentDelimiter=" … "')
+      from ranked r
+     order by r.rank desc, r.date desc, r.id desc;
+$$;
+
+-- p_user_id is caller supplied: only the backend may call it
+revoke execute on function search_journals(bigint, text, integer, integer)
+    from public, anon, authenticated;
+grant execute on function search_journals(bigint, text, integer, integer)
+    to service_role;
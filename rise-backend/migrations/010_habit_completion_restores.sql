@@ -0,0 +1,8 @@
+-- habits.restoreStreak sets the streak to the habit's best streak, which
+-- replaying the log cannot work out from the events before it. The restored
+-- value is logged with the event, and rebuilding streaks
+-- (api/jobs/rebuild_streaks.py) starts a new run of that length there.
+-- Restores logged before this column existed have it null and still only
+-- bridge the missed periods.
+
+alter table habit_completions add column if not exists restored_to integer;
@@ -0,0 +1,18 @@
+-- /journals.changes pages by updated_at, so it has to come from the
+-- database rather than the app servers' clocks: stamp it on every insert and
+-- update. The feed still holds its watermark back a few seconds
+-- (JOURNAL_CHANGES_SETTLE_SECONDS), since a transaction can commit after a
+-- row stamped later than it has already been read.
+
+create or replace function journals_stamp_updated_at() returns trigger
+language plpgsql as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists journals_stamp_updated_at on journals;
+create trigger journals_stamp_updated_at
+    before insert or update on journals
+    for each row execute function journals_stamp_updated_at();
@@ -0,0 +1,22 @@
+-- articles are listed and paged by (updated_at, id) and the catalog
+-- watermark is the newest updated_at (api/routes/articles.py), so it must
+-- never be null and must change on every edit, including edits made in the
+-- Supabase dashboard.
+
+update articles set updated_at = now() where updated_at is null;
+
+alter table articles alter column updated_at set default now();
+alter table articles alter column updated_at set not null;
+
+create or replace function articles_stamp_updated_at() returns trigger
+language plpgsql as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists articles_stamp_updated_at on articles;
+create trigger articles_stamp_updated_at
+    before update on articles
+    for each row execute function articles_stamp_updated_at();
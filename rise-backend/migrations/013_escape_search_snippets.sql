@@ -0,0 +1,53 @@
+-- search_journals snippets are HTML (<mark> around matches), but the entry
+-- text went into ts_headline unescaped, and ts_headline copies tags in its
+-- input to the output: a journal could put markup in its own snippet.
+-- The text is now escaped first, like highlight() in api/search.py; the
+-- grants of search_journals are kept by create or replace.
+
+create or replace function html_escape(p_text text) returns text
+language sql
+immutable
+as $$
+    select replace(replace(replace(replace(replace(p_text,
+        '&', '&amp;'), '<', '&lt;'), '>', '&gt;'), '"', '&quot;'), '''', '&#x27;');
+$$;
+
+create or replace function search_journals(
+    p_user_id bigint,
+    p_query text,
+    p_limit integer default 20,
+    p_offset integer default 0
+) returns table (
+    id bigint,
+    date text,
+    "time" text,
+    mood text,
+    title text,
+    excerpt text,
+    thumbnail text,
+    rank real,
+    snippet text
+)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    with query as (
+        select websearch_to_tsquery('simple', p_query) as q
+    ), ranked as (
+        select j.*, ts_rank_cd(j.search_vector, query.q) as rank, query.q
+          from journals j, query
+         where j.user_id = p_user_id
+           and j.deleted_at is null
+           and j.search_vector @@ query.q
+         order by rank desc, j.date desc, j.id desc
+         limit p_limit offset p_offset
+    )
+    select r.id::bigint, r.date::text, r.time::text, r.mood::text, r.title::text,
+           r.excerpt::text, r.thumbnail::text, r.rank,
+           ts_headline('simple', html_escape(coalesce(nullif(r.text, ''), r.title, '')), r.q,
+                       'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=8, MaxFragments=2, FragmentDelimiter=" … "')
+      from ranked r
+     order by r.rank desc, r.date desc, r.id desc;
+$$;
@@ -0,0 +1,31 @@
+-- Bulk write of the streak state sync.push replays (api/routes/sync.py).
+--
+-- Only the columns a status change owns are set, so edits made to the same
+-- habits meanwhile (title, frequency, reminders, ...) are kept; an upsert of
+-- whole rows would write back the values read before the replay.
+-- p_states is a json array of {id, status, streak_count, best_streak,
+-- is_task, last_updated, last_completed_date} objects.
+-- Returns the id and user_id of every habit written.
+
+create or replace function update_habit_states(p_states jsonb)
+returns table (id bigint, user_id bigint)
+language sql
+security definer
+set search_path = public
+as $$
+    update habits h
+       set status = s.status,
+           streak_count = s.streak_count,
+           best_streak = s.best_streak,
+           is_task = s.is_task,
+           last_updated = s.last_updated,
+           last_completed_date = s.last_completed_date
+      from jsonb_populate_recordset(null::habits, p_states) s
+     where h.id = s.id
+ returning h.id::bigint, h.user_id::bigint;
+$$;
+
+revoke execute on function update_habit_states(jsonb)
+    from public, anon, authenticated;
+grant execute on function update_habit_states(jsonb)
+    to service_role;
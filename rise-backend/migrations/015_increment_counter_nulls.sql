@@ -0,0 +1,51 @@
+-- increment_counter (003) left a null column null, since null + delta is
+-- null. A missing count is now treated as 0, as the memory backend and the
+-- callers of api/database.increment assume. "create or replace" keeps the
+-- grants from 003.
+
+create or replace function increment_counter(
+    p_table text,
+    p_column text,
+    p_match jsonb,
+    p_delta numeric,
+    p_floor numeric default null,
+    p_upsert boolean default false
+) returns numeric
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_where text;
+    v_cols text;
+    v_vals text;
+    v_result numeric;
+begin
+    select string_agg(format('%I = %L', key, value), ' and '),
+           string_agg(format('%I', key), ', '),
+           string_agg(format('%L', value), ', ')
+      into v_where, v_cols, v_vals
+      from jsonb_each_text(p_match);
+
+    if v_where is null then
+        raise exception 'increment_counter: p_match must not be empty';
+    end if;
+
+    -- greatest() ignores nulls, so a null p_floor means "no clamp"
+    if p_upsert then
+        execute format(
+            'insert into %1$I as t (%2$s, %3$I) values (%4$s, greatest($1, $2)) '
+            'on conflict (%2$s) do update set %3$I = greatest(coalesce(t.%3$I, 0) + $1, $2) '
+            'returning t.%3$I',
+            p_table, v_cols, p_column, v_vals
+        ) into v_result using p_delta, p_floor;
+    else
+        execute format(
+            'update %1$I set %2$I = greatest(coalesce(%2$I, 0) + $1, $2) where %3$s returning %2$I',
+            p_table, p_column, v_where
+        ) into v_result using p_delta, p_floor;
+    end if;
+
+    return v_result;
+end;
+$$;
@@ -0,0 +1,40 @@
+-- Bulk write of the journal edits sync.push replays (api/routes/sync.py).
+--
+-- p_changes is a json array of {id, user_id, text, title, mood, voice_path,
+-- background_image, font_family, text_color, font_size, attached_images,
+-- stickers, excerpt, thumbnail} objects, the columns journals.update sets
+-- (api/routes/journals.journal_changes). An entry is only changed when it
+-- belongs to user_id and is not deleted; updated_at is stamped by the
+-- trigger from 011.
+-- Returns the id and user_id of every entry written.
+
+create or replace function update_journal_entries(p_changes jsonb)
+returns table (id bigint, user_id bigint)
+language sql
+security definer
+set search_path = public
+as $$
+    update journals j
+       set text = s.text,
+           title = s.title,
+           mood = s.mood,
+           voice_path = s.voice_path,
+           background_image = s.background_image,
+           font_family = s.font_family,
+           text_color = s.text_color,
+           font_size = s.font_size,
+           attached_images = s.attached_images,
+           stickers = s.stickers,
+           excerpt = s.excerpt,
+           thumbnail = s.thumbnail
+      from jsonb_populate_recordset(null::journals, p_changes) s
+     where j.id = s.id
+       and j.user_id = s.user_id
+       and j.deleted_at is null
+ returning j.id::bigint, j.user_id::bigint;
+$$;
+
+revoke execute on function update_journal_entries(jsonb)
+    from public, anon, authenticated;
+grant execute on function update_journal_entries(jsonb)
+    to service_role;
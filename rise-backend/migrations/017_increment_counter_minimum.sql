@@ -0,0 +1,66 @@
+-- increment_counter gets p_min: when the new value would be below it the
+-- row is left unchanged and null is returned, so a balance can be spent
+-- without reading it first (habits.restoreStreak). The extra argument makes
+-- a new signature, so the old function is dropped and the grants from 003
+-- are made again.
+
+drop function if exists increment_counter(text, text, jsonb, numeric, numeric, boolean);
+
+create or replace function increment_counter(
+    p_table text,
+    p_column text,
+    p_match jsonb,
+    p_delta numeric,
+    p_floor numeric default null,
+    p_upsert boolean default false,
+    p_min numeric default null
+) returns numeric
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_where text;
+    v_cols text;
+    v_vals text;
+    v_result numeric;
+begin
+    select string_agg(format('%I = %L', key, value), ' and '),
+           string_agg(format('%I', key), ', '),
+           string_agg(format('%L', value), ', ')
+      into v_where, v_cols, v_vals
+      from jsonb_each_text(p_match);
+
+    if v_where is null then
+        raise exception 'increment_counter: p_match must not be empty';
+    end if;
+    if p_upsert and p_min is not null then
+        raise exception 'increment_counter: p_min cannot be combined with p_upsert';
+    end if;
+
+    -- greatest() ignores nulls, so a null p_floor means "no clamp"
+    if p_upsert then
+        execute format(
+            'insert into %1$I as t (%2$s, %3$I) values (%4$s, greatest($1, $2)) '
+            'on conflict (%2$s) do update set %3$I = greatest(coalesce(t.%3$I, 0) + $1, $2) '
+            'returning t.%3$I',
+            p_table, v_cols, p_column, v_vals
+        ) into v_result using p_delta, p_floor;
+    else
+        execute format(
+            'update %1$I set %2$I = greatest(coalesce(%2$I, 0) + $1, $2) '
+            'where %3$s and ($3 is null or greatest(coalesce(%2$I, 0) + $1, $2) >= $3) '
+            'returning %2$I',
+            p_table, p_column, v_where
+        ) into v_result using p_delta, p_floor, p_min;
+    end if;
+
+    return v_result;
+end;
+$$;
+
+-- Table and column names are caller supplied: only the backend may call it
+revoke execute on function increment_counter(text, text, jsonb, numeric, numeric, boolean, numeric)
+    from public, anon, authenticated;
+grant execute on function increment_counter(text, text, jsonb, numeric, numeric, boolean, numeric)
+    to service_role;
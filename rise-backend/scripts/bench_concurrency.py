@@ -0,0 +1,138 @@
+"""
+Throughput of one gunicorn worker by thread count, against the memory backend
+
+    python scripts/bench_concurrency.py [--threads 1,2,4,8,16] [--latency-ms 5]
+                                        [--seconds 5] [--path /habits.get?userId=1]
+
+For each thread count a single gthread worker is started with DB_BACKEND=memory
+and MEMORY_BACKEND_LATENCY_MS set, a user with a few habits is created, and
+twice as many keep-alive clients as threads request --path for --seconds.
+With a simulated round trip per query, requests/s should grow with the
+threads until the CPU (or the client) becomes the limit.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _request(conn, method, path, body=None):
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    if response.status >= 400:
+        raise RuntimeError(f"{method} {path}: {response.status} {data[:200]!r}")
+    return json.loads(data)
+
+def _start_server(port, threads, latency_ms):
+    env = {
+        **os.environ,
+        'DB_BACKEND': 'memory',
+        'MEMORY_BACKEND_LATENCY_MS': str(latency_ms),
+        'PORT': str(port),
+        'WEB_CONCURRENCY': '1',
+        'GUNICORN_WORKER_CLASS': 'gthread',
+        'GUNICORN_THREADS': str(threads),
+        # The defaults recycle the worker mid-run, which would drop its data
+        'GUNICORN_MAX_REQUESTS': '0',
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning',
+         'api.index:app'],
+        cwd=BACKEND_DIR, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("gunicorn did not start")
+
+def _seed(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    user = _request(conn, 'POST', '/user.register', {
+        'firstName': 'Bench', 'lastName': 'User', 'username': 'bench',
+        'email': 'bench@example.com', 'password': 'bench-password'
+    })['user']
+    for title in ('Drink water', 'Read', 'Walk', 'Meditate', 'Journal'):
+        _request(conn, 'POST', '/habits.add', {'userId': user['id'], 'title': title, 'frequency': 'daily'})
+    conn.close()
+
+def _client(port, path, stop_at, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        try:
+            _request(conn, 'GET', path)
+        except Exception:
+            errors.append(1)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+def run(threads, latency_ms, seconds, path):
+    """Requests/s and latency percentiles (ms) of one worker with threads threads"""
+    port = _free_port()
+    server = _start_server(port, threads, latency_ms)
+    try:
+        _seed(port)
+        latencies, errors = [], []
+        stop_at = time.monotonic() + seconds
+        clients = [
+            threading.Thread(target=_client, args=(port, path, stop_at, latencies, errors))
+            for _ in range(threads * 2)
+        ]
+        started = time.monotonic()
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join()
+        elapsed = time.monotonic() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+    return {
+        'threads': threads,
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(0.50),
+        'p95': percentile(0.95),
+        'errors': len(errors)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', default='1,2,4,8,16', help='comma-separated thread counts')
+    parser.add_argument('--latency-ms', type=float, default=5, help='simulated round trip per query')
+    parser.add_argument('--seconds', type=float, default=5, help='duration of each run')
+    parser.add_argument('--path', default='/habits.get?userId=1', help='endpoint to request')
+    args = parser.parse_args()
+
+    print(f"{args.path}, {args.latency_ms:g} ms per query, 1 gthread worker")
+    print(f"{'threads':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for threads in (int(t) for t in args.threads.split(',')):
+        r = run(threads, args.latency_ms, args.seconds, args.path)
+        print(f"{r['threads']:>7} {r['rps']:>9.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['errors']:>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Cache configuration: several workers must never cache without a shared L2
+
+    python scripts/check_cache_config.py
+
+Loads gunicorn.conf.py and then the app in fresh interpreters, for one and
+for several workers, with and without REDIS_URL, and fails when the app
+would cache in a per-process L2 while other workers serve the same data (a
+write would only be invalidated in the worker that made it). The REDIS_URL
+cases are skipped when the redis package is not installed.
+"""
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = (
+    "import json, runpy; runpy.run_path('gunicorn.conf.py'); "
+    "from api.database import cache; print(json.dumps(cache.stats()))"
+)
+
+# (workers, REDIS_URL, expected (enabled, shared))
+CASES = [
+    (1, None, (True, False)),
+    (3, None, (False, False)),
+    (1, 'redis://localhost:6379/0', (True, True)),
+    (3, 'redis://localhost:6379/0', (True, True)),
+]
+
+def cache_stats(workers, redis_url):
+    """cache.stats() of the app as a gunicorn worker would load it"""
+    env = {k: v for k, v in os.environ.items() if k not in ('REDIS_URL', 'CACHE_ENABLED')}
+    env.update({'DB_BACKEND': 'memory', 'WEB_CONCURRENCY': str(workers)})
+    if redis_url:
+        env['REDIS_URL'] = redis_url
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Loading the app failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    have_redis = importlib.util.find_spec('redis') is not None
+    failures = []
+    for workers, redis_url, expected in CASES:
+        label = f"{workers} worker(s), {'REDIS_URL' if redis_url else 'no REDIS_URL'}"
+        if redis_url and not have_redis:
+            print(f"{label:<32} skipped (redis package not installed)")
+            continue
+        stats = cache_stats(workers, redis_url)
+        got = (stats['enabled'], stats['shared'])
+        print(f"{label:<32} enabled={got[0]} shared={got[1]}")
+        if got != expected:
+            failures.append(f"{label}: enabled={got[0]} shared={got[1]}, expected "
+                            f"enabled={expected[0]} shared={expected[1]}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
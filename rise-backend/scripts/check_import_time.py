@@ -0,0 +1,74 @@
+"""
+Cold-start budget: how long importing the app takes, measured with -X importtime
+
+    python scripts/check_import_time.py [--budget-ms 300] [--runs 5] [--module api.index]
+
+Imports the module in fresh interpreters (DB_BACKEND=supabase, the deploy
+default) and fails when the best of --runs exceeds --budget-ms, or when a
+module that must stay lazy (the Supabase client stack, NumPy) was imported.
+Prints the slowest imports so a regression points at its cause.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use, never while importing the app
+LAZY_MODULES = ('supabase', 'postgrest', 'gotrue', 'httpx', 'numpy', 'asyncio')
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+def measure(module):
+    """[(name, self µs, cumulative µs, depth)] of one interpreter importing module"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR,
+        env={**os.environ, 'DB_BACKEND': os.getenv('DB_BACKEND', 'supabase')},
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            imports.append((name, int(own), int(cumulative), len(indent) // 2))
+    return imports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='api.index')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', '300')))
+    parser.add_argument('--runs', type=int, default=5, help='best of this many interpreters')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to print')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals = [next(c for name, _, c, _ in imports if name == args.module) / 1000 for imports in runs]
+    best = min(range(len(runs)), key=totals.__getitem__)
+    imports = runs[best]
+
+    print(f"import {args.module}: {totals[best]:.1f} ms (best of {args.runs}, budget {args.budget_ms:g} ms)")
+    print("Slowest imports (cumulative ms):")
+    for name, _, cumulative, _ in sorted(imports, key=lambda i: -i[2])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}  {name}")
+
+    failures = []
+    if totals[best] > args.budget_ms:
+        failures.append(f"{totals[best]:.1f} ms is over the {args.budget_ms:g} ms budget")
+    loaded = {name.split('.')[0] for name, _, _, _ in imports}
+    for module in LAZY_MODULES:
+        if module in loaded:
+            failures.append(f"{module} is imported at startup (should be loaded on first use)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
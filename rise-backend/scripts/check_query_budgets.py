@@ -0,0 +1,306 @@
+"""
+Round-trip budgets: data-layer calls per request, for every route
+
+    python scripts/check_query_budgets.py [--sizes 1,25] [--verbose]
+
+Runs the app on the memory backend. For every route and data size it seeds
+a fresh synthetic user with that many habits, journals, moods and daily
+statuses, calls the route once and counts the data calls it made (select,
+insert, upsert, update, delete, increment, rpc, as recorded by
+api/metrics.py, so dashboard and batch fan-out threads count too).
+
+A route fails when it makes more calls than its budget, or more calls with
+more data (one query per row), or checks an access token remotely
+(auth.get_user) instead of verifying it locally, and every route must
+declare a budget. Run before deploying; a new route needs an entry in CASES.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.update({
+    'DB_BACKEND': 'memory',
+    'MEMORY_BACKEND_LATENCY_MS': '0',
+    # Every articles request checks the catalog (the worst case)
+    'ARTICLE_CATALOG_CHECK': '0',
+    'ARTICLE_SNAPSHOT_DIR': tempfile.mkdtemp(prefix='rise-budgets-'),
+    'CRON_SECRET': 'budget-check',
+})
+os.environ.pop('METRICS_DIR', None)
+os.environ.pop('REDIS_URL', None)
+sys.path.insert(0, BACKEND_DIR)
+
+from api import metrics  # noqa: E402
+from api.database import insert, update  # noqa: E402
+from api.index import app  # noqa: E402
+from api.routes.habits import rollover_habits  # noqa: E402
+from api.routes.journals import new_journal  # noqa: E402
+
+# Routes that are not part of the API
+EXCLUDED = {'/', '/health', '/metrics', '/warmup', '/debug/supabase', '/static/<path:filename>'}
+
+_NOW = datetime.now(timezone.utc)
+TODAY = _NOW.date().isoformat()
+
+def _days_ago(days):
+    return (_NOW - timedelta(days=days)).isoformat()
+
+def _date(days_ago):
+    return (_NOW - timedelta(days=days_ago)).date().isoformat()
+
+def _auth(seed):
+    return {'Authorization': f'Bearer {seed.token}'}
+
+def _rollover(seed):
+    """Cron request with only this user's habits stale (earlier cases leave others behind)"""
+    rollover_habits()
+    update('habits', {'status': 'completed', 'last_updated': _days_ago(2)}, filters={'user_id': seed.user_id})
+    return {'headers': {'Authorization': f"Bearer {os.environ['CRON_SECRET']}"}}
+
+# (method, route, budget, request builder); the builder gets the seeded user
+# and returns the test client arguments (query_string, json, headers)
+CASES = [
+    # auth
+    ('POST', '/user.register', 4, lambda s: {'json': {
+        'firstName': 'New', 'lastName': 'User', 'username': f'new{s.user_id}',
+        'email': f'new{s.user_id}@example.com', 'password': 'budget-password'}}),
+    ('POST', '/user.login', 2, lambda s: {'json': {'email': s.email, 'password': s.password}}),
+    ('POST', '/user.logout', 0, lambda s: {'headers': _auth(s)}),
+    ('POST', '/user.refresh', 1, lambda s: {'json': {'refreshToken': s.refresh_token}}),
+    ('GET', '/user.profile', 2, lambda s: {'headers': _auth(s)}),
+    ('PUT', '/user.updateProfile', 4, lambda s: {'headers': _auth(s), 'json': {
+        'firstName': 'Renamed', 'username': f'renamed{s.user_id}'}}),
+    ('PUT', '/user.updatePassword', 0, lambda s: {'headers': _auth(s), 'json': {'password': 'new-password'}}),
+    ('PUT', '/user.updateStars', 1, lambda s: {'headers': _auth(s), 'json': {'stars': 5}}),
+    ('PUT', '/user.updatePoints', 1, lambda s: {'headers': _auth(s), 'json': {'totalPoints': 50}}),
+    ('POST', '/user.awardPoints', 2, lambda s: {'headers': _auth(s), 'json': {'points': 10}}),
+    # app lock
+    ('GET', '/lock.get', 1, lambda s: {'query_string': {'userId': s.user_id}}),
+    ('POST', '/lock.save', 1, lambda s: {'json': {'userId': s.user_id, 'lockType': 'pin', 'lockValue': '1234'}}),
+    ('DELETE', '/lock.remove', 1, lambda s: {'query_string': {'userId': s.user_id}}),
+    # plant
+    ('GET', '/plant.get', 2, lambda s: {'query_string': {'userId': s.user_id}}),
+    ('POST', '/plant.update', 2, lambda s: {'json': {
+        'userId': s.user_id, 'water': 3, 'sunlight': 2, 'stage': 1, 'points': 20, 'stars': 1}}),
+    ('POST', '/plant.reset', 1, lambda s: {'json': {'userId': s.user_id}}),
+    # journals
+    ('GET', '/journals.get', 1, lambda s: {'query_string': {'userId': s.user_id}}),
+    ('GET', '/journals.getOne', 1, lambda s: {'query_string': {'userId': s.user_id, 'id': s.journal_ids[0]}}),
+    ('POST', '/journals.add', 1, lambda s: {'json': {
+        'userId': s.user_id, 'date': TODAY, 'time': '09:00', 'mood': 'calm',
+        'title': 'Budget', 'text': 'A new entry'}}),
+    ('PUT', '/journals.update', 1, lambda s: {'json': {
+        'userId': s.user_id, 'id': s.journal_ids[0], 'title': 'Edited', 'text': 'Edited text'}}),
+    ('DELETE', '/journals.delete', 1, lambda s: {'query_string': {'userId': s.user_id, 'id': s.journal_ids[-1]}}),
+    ('GET', '/journals.changes', 1, lambda s: {'query_string': {'userId': s.user_id}}),
+    ('GET', '/journals.search', 1, lambda s: {'query_string': {'userId': s.user_id, 'q': 'morning walk'}}),
+    # habits
+    ('GET', '/habits.get', 1, lambda s: {'query_string': {'userId': s.user_id}}),
+    ('POST', '/habits.add', 1, lambda s: {'json': {'userId': s.user_id, 'title': 'New habit', 'frequency': 'daily'}}),
+    ('PUT', '/habits.update', 1, lambda s: {'json': {
+        'userId': s.user_id, 'habitKey': s.habit_titles[0], 'remindMe': True}}),
+    ('PUT', '/habits.updateStatus', 3, lambda s: {'json': {
+        'userId': s.user_id, 'title': s.habit_titles[0], 'status': 'completed'}}),
+    ('POST', '/habits.restoreStreak', 5, lambda s: {'json': {'userId': s.user_id, 'habitKey': s.habit_titles[0]}}),
+    ('POST', '/habits.checkReset', 2, lambda s: {'json': {'userId': s.user_id}}),
+    ('GET', '/habits.rollover', 2, _rollover),
+    ('POST', '/habits.rollover', 2, _rollover),
+    ('POST', '/habits.resetDaily', 1, lambda s: {'json': {'userId': s.user_id}}),
+    ('DELETE', '/habits.delete', 1, lambda s: {'query_string': {'userId': s.user_id, 'id': s.habit_ids[-1]}}),
+    ('GET', '/habits.getByTitle', 1, lambda s: {'query_string': {'userId': s.user_id, 'title': s.habit_titles[0]}}),
+    ('GET', '/habits.checkExists', 1, lambda s: {'query_string': {
+        'userId': s.user_id, 'title': s.habit_titles[0], 'frequency': 'daily'}}),
+    ('GET', '/habits.getCompleted', 1, lambda s: {'query_string': {'userId': s.user_id}}),
+    # moods
+    ('GET', '/moods.today', 1, lambda s: {'query_string': {'userId': s.user_id, 'date': TODAY}}),
+    ('POST', '/moods.save', 1, lambda s: {'json': {
+        'userId': s.user_id, 'date': TODAY, 'moodImage': 'sun.png', 'moodLabel': 'happy'}}),
+    ('DELETE', '/moods.delete', 1, lambda s: {'query_string': {'userId': s.user_id, 'date': TODAY}}),
+    ('GET', '/moods.getAll', 1, lambda s: {'query_string': {'userId': s.user_id}}),
+    ('GET', '/moods.getByMonth', 1, lambda s: {'query_string': {
+        'userId': s.user_id, 'month': _NOW.month, 'year': _NOW.year}}),
+    # home
+    ('GET', '/home.status', 1, lambda s: {'query_string': {'userId': s.user_id, 'date': TODAY}}),
+    ('POST', '/home.status', 1, lambda s: {'json': {
+        'userId': s.user_id, 'date': TODAY, 'status': {'waterCount': 3, 'waterGoal': 8}}}),
+    ('POST', '/home.incrementWater', 1, lambda s: {'json': {'userId': s.user_id, 'date': TODAY}}),
+    ('POST', '/home.decrementWater', 1, lambda s: {'json': {'userId': s.user_id, 'date': TODAY}}),
+    ('POST', '/home.updateDetox', 1, lambda s: {'json': {'userId': s.user_id, 'date': TODAY, 'detoxProgress': 0.5}}),
+    ('GET', '/home.getRange', 1, lambda s: {'query_string': {
+        'userId': s.user_id, 'startDate': _date(30), 'endDate': TODAY}}),
+    ('GET', '/home.dashboard', 6, lambda s: {'headers': _auth(s), 'query_string': {'date': TODAY}}),
+    # articles
+    ('GET', '/articles.getAll', 3, lambda s: {'query_string': {'lang': 'en'}}),
+    ('GET', '/articles.get', 3, lambda s: {'query_string': {'lang': 'en', 'slug': s.article_slug}}),
+    ('GET', '/articles.search', 3, lambda s: {'query_string': {'lang': 'en', 'q': 'sleep'}}),
+    # batch and offline sync
+    ('POST', '/batch', 3, lambda s: {'json': {'calls': [
+        {'method': 'GET', 'path': f'/habits.get?userId={s.user_id}'},
+        {'method': 'GET', 'path': f'/moods.today?{urlencode({"userId": s.user_id, "date": TODAY})}'},
+        {'method': 'POST', 'path': '/home.incrementWater', 'body': {'userId': s.user_id, 'date': TODAY}},
+    ]}}),
+    ('POST', '/sync.push', 8, lambda s: {'json': {'mutations': [
+        mutation
+        for i, (title, journal_id, edited_id) in enumerate(
+            zip(s.habit_titles, s.journal_ids, s.journal_ids[len(s.habit_titles):]))
+        for mutation in (
+            {'id': f'w{i}', 'type': 'home.incrementWater', 'body': {'userId': s.user_id, 'date': TODAY}},
+            {'id': f'm{i}', 'type': 'moods.save', 'body': {
+                'userId': s.user_id, 'date': _date(i), 'moodImage': 'rain.png', 'moodLabel': 'sad'}},
+            {'id': f'd{i}', 'type': 'journals.delete', 'body': {'userId': s.user_id, 'id': journal_id}},
+            {'id': f'e{i}', 'type': 'journals.update', 'body': {
+                'userId': s.user_id, 'id': edited_id, 'title': f'Edited {i}', 'text': 'Edited offline'}},
+            {'id': f'f{i}', 'type': 'journals.update', 'body': {
+                'userId': s.user_id, 'id': edited_id, 'title': f'Edited {i} again', 'text': 'Edited offline'}},
+            {'id': f'h{i}', 'type': 'habits.updateStatus',
+             'body': {'userId': s.user_id, 'title': title, 'status': 'completed'}},
+            {'id': f'j{i}', 'type': 'journals.add',
+             'body': {'userId': s.user_id, 'date': TODAY, 'time': '10:00', 'title': f'Offline {i}',
+                      'text': 'Written offline'}},
+        )
+    ]}}),
+]
+
+def _articles(size):
+    insert('articles', [
+        {
+            'slug': f'article-{size}-{i}', 'title': f'Sleep better, part {i}',
+            'summary': 'Small habits for better sleep', 'content': 'Keep a regular sleep schedule.',
+            'hero_image_url': None, 'language': 'en', 'is_published': True, 'updated_at': _days_ago(i)
+        }
+        for i in range(size)
+    ])
+    return f'article-{size}-0'
+
+def seed_user(client, size, article_slug):
+    """A registered user with size habits, moods and daily statuses, and 2 * size journals"""
+    n = seed_user.count = getattr(seed_user, 'count', 0) + 1
+    email, password = f'budget{n}@example.com', 'budget-password'
+    response = client.post('/user.register', json={
+        'firstName': 'Budget', 'lastName': str(n), 'username': f'budget{n}',
+        'email': email, 'password': password
+    })
+    if response.status_code != 201:
+        raise RuntimeError(f"Could not register a user: {response.get_json()}")
+    body = response.get_json()
+    user_id = body['user']['id']
+    update('users', {'total_points': 1000}, filters={'id': user_id})
+
+    habits = insert('habits', [
+        {
+            'user_id': user_id, 'title': f'Habit {i}', 'frequency': 'daily', 'habit_type': 'good',
+            'status': 'completed', 'points': 10, 'is_task': True, 'remind_me': False,
+            # Completed two days ago: stale for checkReset, restorable for restoreStreak
+            'streak_count': 3, 'best_streak': 1,
+            'last_completed_date': _days_ago(2), 'last_updated': _days_ago(2), 'created_at': _days_ago(30)
+        }
+        for i in range(size)
+    ])
+    # Two entries a day, so /sync.push can delete some and edit others
+    journals = insert('journals', [
+        new_journal({'userId': user_id, 'date': _date(i // 2), 'time': f'{8 + i % 2 * 12}:00', 'mood': 'calm',
+                     'title': f'Day {i // 2}', 'text': f'A walk before work, day {i // 2}'})
+        for i in range(2 * size)
+    ])
+    insert('daily_moods', [
+        {'user_id': user_id, 'date': _date(i), 'mood_image': 'sun.png', 'mood_label': 'happy',
+         'created_at': _days_ago(i), 'updated_at': _days_ago(i)}
+        for i in range(size)
+    ])
+    insert('home_status', [
+        {'user_id': user_id, 'date': _date(i), 'water_count': i % 8, 'water_goal': 8, 'detox_progress': 0.0}
+        for i in range(size)
+    ])
+    insert('plant_progress', {'user_id': user_id, 'water': 1, 'sunlight': 1, 'stage': 0})
+    insert('app_locks', {'user_id': user_id, 'lock_type': 'pin', 'lock_value': '0000'})
+
+    return SimpleNamespace(
+        user_id=user_id,
+        email=email,
+        password=password,
+        token=body['session']['access_token'],
+        refresh_token=body['session']['refresh_token'],
+        habit_ids=[h['id'] for h in habits],
+        habit_titles=[h['title'] for h in habits],
+        journal_ids=[j['id'] for j in journals],
+        article_slug=article_slug
+    )
+
+def _calls():
+    """Data, auth and remote token check calls recorded so far (all endpoints, all threads)"""
+    totals = {'db': 0, 'auth': 0, 'get_user': 0}
+    for name, labels, value in metrics.registry.snapshot()['counters']:
+        for kind in ('db', 'auth'):
+            if name == f'rise_{kind}_calls_total':
+                totals[kind] += int(value)
+        if name == 'rise_auth_calls_total' and ('operation', 'get_user') in labels:
+            totals['get_user'] += int(value)
+    return totals
+
+def measure(client, case, seed):
+    """(status, data calls, auth calls, remote token checks) of one request"""
+    method, rule, _, build = case
+    arguments = build(seed)
+    before = _calls()
+    response = client.open(rule, method=method, **arguments)
+    after = _calls()
+    return (response.status_code, *(after[kind] - before[kind] for kind in ('db', 'auth', 'get_user')))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1,25', help='comma-separated rows per table per user')
+    parser.add_argument('--verbose', action='store_true', help='print every route, not only failures')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    client = app.test_client()
+    failures = []
+
+    declared = {(rule, method) for method, rule, _, _ in CASES}
+    for rule in app.url_map.iter_rules():
+        if rule.rule in EXCLUDED:
+            continue
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            if (rule.rule, method) not in declared:
+                failures.append(f"{method} {rule.rule}: no budget declared")
+
+    article_slugs = {size: _articles(size) for size in sizes}
+    print(f"{'route':<32} {'budget':>6}  " + '  '.join(f'{f"n={size}":>10}' for size in sizes))
+    for case in CASES:
+        method, rule, budget, _ = case
+        results = []
+        for size in sizes:
+            seed = seed_user(client, size, article_slugs[size])
+            results.append(measure(client, case, seed))
+
+        problems = []
+        for size, (status, db_calls, _, remote_checks) in zip(sizes, results):
+            if status >= 500:
+                problems.append(f"status {status} at n={size}")
+            if remote_checks:
+                problems.append(f"token checked remotely at n={size} (local verification inconclusive)")
+            if db_calls > budget:
+                problems.append(f"{db_calls} calls at n={size} (budget {budget})")
+        if results[-1][1] > results[0][1]:
+            problems.append(f"calls grow with data: {results[0][1]} at n={sizes[0]}, "
+                            f"{results[-1][1]} at n={sizes[-1]}")
+        failures.extend(f"{method} {rule}: {problem}" for problem in problems)
+
+        if problems or args.verbose:
+            cells = '  '.join(f'{f"{db}+{auth}a ({status})" if auth else f"{db} ({status})":>10}'
+                              for status, db, auth, _ in results)
+            print(f"{method + ' ' + rule:<32} {budget:>6}  {cells}")
+
+    print(f"\n{len(CASES)} routes checked at sizes {', '.join(map(str, sizes))}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
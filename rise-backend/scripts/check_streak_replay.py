@@ -0,0 +1,106 @@
+"""
+Streak replay: the bulk rebuild must agree with the incremental streaks
+
+    python scripts/check_streak_replay.py [--habits 2000] [--events 40] [--seed 1]
+
+Generates random event logs (completions, skips and streak restores on
+random days), materializes each habit event by event with next_streak() as
+the routes do, rebuilds them all at once with compute_streaks() as
+api/jobs/rebuild_streaks.py does, and fails on any habit where the two
+disagree. Bad habits are mixed in: their streak survives periods without
+events and only breaks when the habit is done. A few hand-written logs
+(restores after a run, after a skip, on the same day as a completion, a bad
+habit left alone for days) are always checked.
+"""
+import argparse
+import os
+import random
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from api.streaks import breaks_when_idle, compute_streaks, next_streak  # noqa: E402
+
+NOW = 100
+
+# (habit_type, [(day, kind)]) logs: 'done' extends the streak (doing a good
+# habit, resisting a bad one), 'skip' breaks it, 'restore' sets it to the
+# best streak
+EXAMPLES = [
+    ('good', [(1, 'done'), (2, 'done'), (3, 'done'), (4, 'done'), (5, 'done'), (8, 'restore')]),
+    ('good', [(1, 'done'), (2, 'done'), (3, 'done'), (4, 'done'), (5, 'done'), (6, 'skip'), (8, 'restore')]),
+    ('good', [(1, 'done'), (2, 'done'), (5, 'restore'), (5, 'done'), (6, 'done')]),
+    ('good', [(1, 'skip'), (3, 'restore'), (3, 'done'), (4, 'done')]),
+    ('good', [(1, 'done'), (4, 'restore'), (5, 'skip'), (6, 'done'), (9, 'restore'), (10, 'done')]),
+    ('bad', [(1, 'done'), (2, 'done'), (5, 'done'), (9, 'done')]),
+    ('bad', [(1, 'done'), (4, 'skip'), (7, 'done'), (8, 'done')]),
+]
+
+def incremental(habit_type, events):
+    """(current, best, log) materialized event by event, with the logged rows"""
+    idle_breaks = breaks_when_idle(habit_type)
+    current, best, last_ordinal = 0, 0, None
+    log = []
+    for day, kind in events:
+        restored_to = best if kind == 'restore' else None
+        current, best = next_streak(current, best, last_ordinal, day, kind != 'skip', restored_to,
+                                    idle_breaks=idle_breaks)
+        last_ordinal = day
+        log.append((day, kind != 'skip', current if kind == 'restore' else None))
+    # The stored streak only counts while the last event is this period or
+    # the previous one, unless idle periods do not break it
+    if last_ordinal is None or (idle_breaks and last_ordinal < NOW - 1):
+        current = 0
+    return current, best, log
+
+def random_log(rng, count):
+    # Most logs end near NOW; some stop early so idle bad habits are covered
+    day, events = NOW - rng.choice([3, 3, 3, 5]) * count, []
+    for _ in range(count):
+        day += rng.choice([0, 1, 1, 1, 2, 3])
+        events.append((min(day, NOW), rng.choices(['done', 'skip', 'restore'], weights=[8, 2, 1])[0]))
+    return rng.choice(['good', 'good', 'bad']), events
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--habits', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=40, help='events per random habit')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    logs = EXAMPLES + [random_log(rng, rng.randint(1, args.events)) for _ in range(args.habits)]
+
+    expected = {}
+    columns = {'habit_ids': [], 'ordinals': [], 'advanced': [], 'bridges': [], 'restored_to': []}
+    for habit_id, (habit_type, events) in enumerate(logs, start=1):
+        current, best, log = incremental(habit_type, events)
+        expected[habit_id] = (current, best)
+        for day, advanced, restored_to in log:
+            columns['habit_ids'].append(habit_id)
+            columns['ordinals'].append(day)
+            columns['advanced'].append(advanced)
+            columns['bridges'].append(restored_to is not None)
+            columns['restored_to'].append(restored_to)
+
+    rebuilt = compute_streaks(
+        seq=list(range(len(columns['habit_ids']))),
+        now_ordinals={habit_id: NOW for habit_id in expected},
+        keep_idle={habit_id for habit_id, (habit_type, _) in enumerate(logs, start=1)
+                   if not breaks_when_idle(habit_type)},
+        **columns
+    )
+
+    failures = [
+        f"habit {habit_id} {logs[habit_id - 1]}: incremental {expected[habit_id]}, rebuilt {rebuilt.get(habit_id)}"
+        for habit_id in expected
+        if rebuilt.get(habit_id) != expected[habit_id]
+    ]
+    print(f"{len(logs)} habits replayed ({len(columns['habit_ids'])} events)")
+    for failure in failures[:20]:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()